@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics as default_metrics
+
+log = logging.getLogger("alerts")
+
+
+class AlertGate:
+    """One alert per bad-posture episode per device, and at most one per min_interval.
+
+    update() is called every frame with whether the device is over its
+    threshold; it returns True only on the frame an episode starts, unless the
+    previous alert for that device was less than min_interval ago.
+    """
+
+    def __init__(self, min_interval=300.0):
+        self.min_interval = min_interval
+        self.suppressed = 0
+        self.rate_limited = 0
+        self._active = set()
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, over_threshold):
+        with self._lock:
+            if not over_threshold:
+                self._active.discard(key)
+                return False
+            if key in self._active:
+                self.suppressed += 1
+                return False
+            self._active.add(key)
+            now = time.monotonic()
+            last = self._last.get(key)
+            if last is not None and now - last < self.min_interval:
+                self.rate_limited += 1
+                return False
+            self._last[key] = now
+            return True
+
+
+class AlertOutbox:
+    """Non-blocking webhook delivery for alerts.
+
+    submit() only appends to the in-memory outbox and returns. A background
+    sender POSTs each alert over a pooled session with connect/read timeouts,
+    retries failures with jittered exponential backoff, and keeps undelivered
+    alerts in a small JSON file (rewritten atomically, on the sender thread) so
+    they survive a restart. Every alert carries an alertId the receiver can use
+    to drop duplicate retries.
+    """
+
+    def __init__(self, url, path="alerts_pending.json", timeout=(3.05, 10.0), base_delay=2.0,
+                 max_delay=300.0, max_age=24 * 3600.0, metrics=None):
+        self.url = url
+        self.path = path
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_age = max_age
+        self.metrics = metrics if metrics is not None else default_metrics
+        self.delivered = 0
+        self.failures = 0
+        self.dropped = 0
+        self._pending = []
+        self._dirty = False
+        self._cond = threading.Condition()
+        self._closed = False
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._load()
+        self._thread = threading.Thread(target=self._run, name="alert-sender", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _load(self):
+        try:
+            with open(self.path) as file:
+                self._pending = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable alert outbox %s: %s", self.path, e)
+            return
+        if self._pending:
+            log.info("Resuming %d undelivered alert(s) from %s", len(self._pending), self.path)
+
+    def _persist(self):
+        # Sender thread only: snapshot under the condition, write outside it,
+        # so submit() never waits on the SD card.
+        with self._cond:
+            if not self._dirty:
+                return
+            snapshot = json.dumps(self._pending)
+            self._dirty = False
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".alerts-", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(snapshot)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning("Could not persist alert outbox: %s", e)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def submit(self, payload):
+        """Queue an alert for delivery; never blocks on the network."""
+        entry = {
+            "payload": {"alertId": uuid.uuid4().hex, **payload},
+            "created": time.time(),
+            "attempts": 0,
+            "next_attempt": 0.0,
+        }
+        with self._cond:
+            self._pending.append(entry)
+            self._dirty = True
+            self._cond.notify()
+
+    def _next_due(self):
+        now = time.time()
+        due = min(self._pending, key=lambda e: e["next_attempt"], default=None)
+        if due is None:
+            return None, None
+        return due, max(0.0, due["next_attempt"] - now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._dirty:
+                    entry, wait = self._next_due()
+                    if entry is not None and wait == 0.0:
+                        break
+                    self._cond.wait(wait)
+                if self._closed:
+                    return
+                entry, wait = self._next_due()
+            self._persist()
+            if entry is not None and wait == 0.0:
+                self._deliver(entry)
+
+    def _deliver(self, entry):
+        status = None
+        try:
+            with self.metrics.time("alert_post"):
+                response = self._session.post(self.url, json=entry["payload"], timeout=self.timeout)
+            status = response.status_code
+        except requests.RequestException as e:
+            log.warning("Alert delivery failed: %s", e)
+
+        with self._cond:
+            if status is not None and 200 <= status < 300:
+                self._pending.remove(entry)
+                self.delivered += 1
+                self.metrics.observe("alert_delivery", time.time() - entry["created"])
+                log.info("Alert %s delivered", entry["payload"]["alertId"])
+            elif status is not None and 400 <= status < 500 and status not in (408, 429):
+                # The endpoint rejected it; retrying won't help.
+                self._pending.remove(entry)
+                self.dropped += 1
+                log.warning("Alert rejected by API with status %s; dropping it", status)
+            elif time.time() - entry["created"] > self.max_age:
+                self._pending.remove(entry)
+                self.dropped += 1
+                log.warning("Alert %s expired undelivered", entry["payload"]["alertId"])
+            else:
+                self.failures += 1
+                entry["attempts"] += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** (entry["attempts"] - 1))
+                entry["next_attempt"] = time.time() + delay * random.uniform(0.5, 1.0)
+                if status is not None:
+                    log.warning("Alert delivery got status %s; retry %d in %.0f s",
+                                status, entry["attempts"], delay)
+            self._dirty = True
+
+    def close(self, timeout=2.0):
+        """Stop the sender; undelivered alerts stay on disk for next start."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._persist()
+        self._session.close()
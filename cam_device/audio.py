@@ -0,0 +1,193 @@
+import logging
+import subprocess
+import threading
+import time
+import wave
+
+import numpy as np
+
+from metrics import metrics as default_metrics
+
+log = logging.getLogger("audio")
+
+SAMPLE_RATE = 22050
+
+# severity -> (frequency Hz, beep seconds, beeps)
+SEVERITY_TONES = {
+    "info": (660, 0.12, 1),
+    "warning": (440, 0.2, 2),
+    "alert": (440, 0.5, 1),
+}
+SEVERITY_RANK = {name: rank for rank, name in enumerate(SEVERITY_TONES)}
+
+
+def render_tone(freq, duration, beeps=1, sample_rate=SAMPLE_RATE, volume=0.5, fade=0.01, gap=0.08):
+    """Mono S16_LE PCM for `beeps` sine beeps, with short fades to avoid clicks."""
+    t = np.arange(int(duration * sample_rate), dtype=np.float32) / sample_rate
+    beep = np.sin(2 * np.pi * freq * t) * volume
+    ramp = min(int(fade * sample_rate), len(beep) // 2)
+    if ramp:
+        envelope = np.linspace(0.0, 1.0, ramp, dtype=np.float32)
+        beep[:ramp] *= envelope
+        beep[-ramp:] *= envelope[::-1]
+    silence = np.zeros(int(gap * sample_rate), dtype=np.float32)
+    parts = [beep]
+    for _ in range(beeps - 1):
+        parts += [silence, beep]
+    return (np.concatenate(parts) * 32767).astype("<i2").tobytes()
+
+
+class NullSink:
+    """Discards audio; counts what would have played."""
+
+    def __init__(self):
+        self.writes = 0
+        self.bytes = 0
+
+    def write(self, pcm):
+        self.writes += 1
+        self.bytes += len(pcm)
+
+    def close(self):
+        pass
+
+
+class WavSink:
+    """Appends everything played to a WAV file (for tests and machines without sound)."""
+
+    def __init__(self, path, sample_rate=SAMPLE_RATE):
+        self.writes = 0
+        self._wav = wave.open(path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, pcm):
+        self.writes += 1
+        self._wav.writeframes(pcm)
+
+    def close(self):
+        self._wav.close()
+
+
+class AplaySink:
+    """One long-lived `aplay` reading raw PCM from a pipe, so the ALSA device
+    is opened once instead of forking a shell and SoX for every alert."""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, device=None):
+        self.writes = 0
+        cmd = ["aplay", "-q", "-t", "raw", "-f", "S16_LE", "-c", "1", "-r", str(sample_rate)]
+        if device:
+            cmd += ["-D", device]
+        self._proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    def write(self, pcm):
+        self.writes += 1
+        self._proc.stdin.write(pcm)
+        self._proc.stdin.flush()
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            log.warning("aplay did not exit; killing it")
+            self._proc.kill()
+            self._proc.wait()
+
+
+def open_sink(spec, sample_rate=SAMPLE_RATE):
+    """Sink from a spec: "null", "wav:<path>", "aplay" or "aplay:<alsa device>".
+
+    Falls back to the null sink if the audio device cannot be opened.
+    """
+    if not spec or spec == "null":
+        return NullSink()
+    if spec.startswith("wav:"):
+        return WavSink(spec[4:], sample_rate)
+    if spec == "aplay" or spec.startswith("aplay:"):
+        try:
+            return AplaySink(sample_rate, spec[6:] or None)
+        except OSError as e:
+            log.warning("No audio output (%s); alerts will be silent", e)
+            return NullSink()
+    raise ValueError(f"Unknown audio sink {spec!r}")
+
+
+class AudioEngine:
+    """Plays pre-rendered alert tones on a background worker.
+
+    play() returns immediately. While a tone is pending or playing, further
+    requests of the same or lower severity are coalesced into it; a higher
+    severity replaces a pending lower one. Time from play() to the tone
+    being handed to the sink is recorded as `audio_start`.
+    """
+
+    def __init__(self, sink, sample_rate=SAMPLE_RATE, metrics=None):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.metrics = metrics if metrics is not None else default_metrics
+        self.tones = {
+            name: render_tone(freq, duration, beeps, sample_rate)
+            for name, (freq, duration, beeps) in SEVERITY_TONES.items()
+        }
+        self.played = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._pending = None  # (severity, requested_at)
+        self._playing = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audio", daemon=True)
+        self._thread.start()
+
+    def play(self, severity="alert"):
+        if severity not in self.tones:
+            raise ValueError(f"Unknown severity {severity!r}")
+        rank = SEVERITY_RANK[severity]
+        with self._cond:
+            busy = [s for s in (self._pending and self._pending[0], self._playing) if s]
+            if any(SEVERITY_RANK[s] >= rank for s in busy):
+                self.coalesced += 1
+                return
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (severity, time.perf_counter())
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                severity, requested_at = self._pending
+                self._pending = None
+                self._playing = severity
+            pcm = self.tones[severity]
+            try:
+                self.metrics.observe("audio_start", time.perf_counter() - requested_at)
+                self.sink.write(pcm)
+                self.played += 1
+                # Pipes and files accept the bytes at once; hold the slot
+                # for as long as the tone sounds so repeats coalesce.
+                time.sleep(len(pcm) / 2 / self.sample_rate)
+            except Exception as e:
+                self.errors += 1
+                log.warning("Audio playback failed: %s", e)
+            finally:
+                with self._cond:
+                    self._playing = None
+
+    def close(self, timeout=2.0):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self.sink.close()
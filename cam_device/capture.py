@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+from metrics import metrics
+
+# A captured frame stamped with a monotonically increasing sequence number and
+# the time.monotonic() value at which cap.read() returned it.
+Frame = namedtuple("Frame", ["image", "seq", "captured_at"])
+
+
+class LatestFrameSlot:
+    """Single-slot mailbox that always holds the newest captured frame.
+
+    The capture stage overwrites the slot on every read; consumers only ever see
+    the most recent frame. Frames that are replaced before anyone took them are
+    counted as dropped. `listeners` are called (without the slot's lock held)
+    after every publish and on close, so one consumer can wait on many slots.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._taken = True
+        self._closed = False
+        self.seq = 0
+        self.dropped = 0
+        self.consumed = 0
+        self.listeners = []
+
+    def publish(self, image, captured_at=None):
+        if captured_at is None:
+            captured_at = time.monotonic()
+        with self._cond:
+            if not self._taken:
+                self.dropped += 1
+            self.seq += 1
+            self._frame = Frame(image, self.seq, captured_at)
+            self._taken = False
+            self._cond.notify_all()
+        for listener in self.listeners:
+            listener()
+
+    def take(self, timeout=None):
+        """Return the newest frame not yet taken, or None on timeout/close."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._taken and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if self._taken:
+                return None
+            self._taken = True
+            self.consumed += 1
+            self._cond.notify_all()
+            return self._frame
+
+    def wait_taken(self, timeout=None):
+        """Block until the current frame has been taken; False on timeout.
+
+        Lets a producer stay exactly one frame ahead of the consumer.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._taken or self._closed, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for listener in self.listeners:
+            listener()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class CaptureThread(threading.Thread):
+    """Continuously drains a cv2.VideoCapture into a LatestFrameSlot.
+
+    Most V4L2 backends ignore CAP_PROP_BUFFERSIZE, so instead of trusting the
+    driver to drop stale frames we read as fast as the camera delivers and keep
+    only the newest one.
+    """
+
+    def __init__(self, source, width=640, height=480, slot=None):
+        super().__init__(name="capture", daemon=True)
+        self.source = source
+        self.width = width
+        self.height = height
+        self.slot = slot if slot is not None else LatestFrameSlot()
+        self.captured = 0
+        self.read_failures = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        cap = cv2.VideoCapture(self.source)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        try:
+            while cap.isOpened() and not self._stop_event.is_set():
+                with metrics.time("capture_read"):
+                    ret, image = cap.read()
+                if not ret:
+                    self.read_failures += 1
+                    break
+                self.captured += 1
+                self.slot.publish(image, time.monotonic())
+        finally:
+            cap.release()
+            self.slot.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stats(self):
+        return {
+            "captured": self.captured,
+            "consumed": self.slot.consumed,
+            "dropped": self.slot.dropped,
+            "read_failures": self.read_failures,
+        }
@@ -0,0 +1,166 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from dotenv import dotenv_values
+
+log = logging.getLogger(__name__)
+
+# An immutable view of the configuration at one version.
+ConfigSnapshot = namedtuple("ConfigSnapshot", ["version", "values"])
+
+
+class ConfigStore:
+    """In-memory, versioned view of the device .env settings.
+
+    Updates are applied as a batch: every key is validated against `schema`
+    first, then a new snapshot is published in one reference swap, so readers
+    never see half of a calibration. The file is rewritten in the background,
+    at most once per `debounce` seconds, with a single write-and-rename.
+    """
+
+    def __init__(self, path=".env", schema=None, debounce=1.0):
+        self.path = path
+        self.schema = dict(schema or {})
+        self.debounce = debounce
+        self._snapshot = ConfigSnapshot(0, MappingProxyType({}))
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._closed = False
+        self._writer = None
+        self._updated_keys = set()
+        self.writes = 0
+
+    # ---- reading ----
+    def load(self):
+        values = {}
+        if os.path.exists(self.path):
+            for key, raw in dotenv_values(self.path).items():
+                if raw is None:
+                    continue
+                try:
+                    values[key] = self._coerce(key, raw)
+                except ValueError:
+                    log.warning("Ignoring invalid config value %s=%r", key, raw)
+        with self._lock:
+            self._snapshot = ConfigSnapshot(self._snapshot.version + 1, MappingProxyType(values))
+        return self._snapshot
+
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def get(self, key, default=None):
+        values = self._snapshot.values
+        if key in values:
+            return values[key]
+        raw = os.environ.get(key)
+        if raw is None:
+            return default
+        try:
+            return self._coerce(key, raw)
+        except ValueError:
+            return default
+
+    # ---- writing ----
+    def update(self, changes):
+        """Apply a batch of key/value changes atomically and schedule a save.
+
+        Raises ValueError (and applies nothing) if any value fails its type.
+        """
+        coerced = {key: self._coerce(key, value) for key, value in changes.items()}
+        if not coerced:
+            return self._snapshot
+        with self._lock:
+            values = dict(self._snapshot.values)
+            values.update(coerced)
+            self._snapshot = ConfigSnapshot(self._snapshot.version + 1, MappingProxyType(values))
+            # Keep os.getenv() callers (and child processes) in agreement.
+            for key, value in coerced.items():
+                os.environ[key] = str(value)
+            self._updated_keys.update(coerced)
+            self._start_writer()
+        self._dirty.set()
+        return self._snapshot
+
+    def flush(self):
+        """Write the current snapshot to disk now, if anything changed."""
+        if self._dirty.is_set():
+            self._dirty.clear()
+            self._write(self._snapshot)
+
+    def close(self):
+        pending = self._dirty.is_set()
+        self._closed = True
+        self._dirty.set()  # Wake the writer so it can exit.
+        if self._writer is not None:
+            self._writer.join(timeout=self.debounce + 5)
+        if pending:
+            self._write(self._snapshot)
+
+    # ---- internals ----
+    def _coerce(self, key, value):
+        kind = self.schema.get(key)
+        if kind is None or isinstance(value, kind):
+            return value
+        return kind(value)
+
+    def _start_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._writer_loop, name="config-writer", daemon=True
+            )
+            self._writer.start()
+
+    def _writer_loop(self):
+        while not self._closed:
+            self._dirty.wait()
+            if self._closed:
+                break
+            # Let a burst of updates settle, then write the latest snapshot once.
+            time.sleep(self.debounce)
+            self._dirty.clear()
+            try:
+                self._write(self._snapshot)
+            except OSError as e:
+                log.error("Error saving config: %s", e)
+
+    def _write(self, snapshot):
+        # Only keys changed through update() are rewritten; everything else in
+        # the file (comments, quoting, unknown keys) is kept byte-for-byte.
+        with self._lock:
+            keys = set(self._updated_keys)
+        pending = {key: str(snapshot.values[key]) for key in keys if key in snapshot.values}
+        lines = []
+        if os.path.exists(self.path):
+            with open(self.path, "r") as file:
+                for line in file:
+                    key = line.split("=", 1)[0].strip()
+                    if "=" in line and key in pending:
+                        line = f"{key}={pending.pop(key)}\n"
+                    lines.append(line)
+        if lines and not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+        lines.extend(f"{key}={value}\n" for key, value in pending.items())
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".env.", dir=directory)
+        try:
+            if os.path.exists(self.path):
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+            with os.fdopen(fd, "w") as file:
+                file.writelines(lines)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.writes += 1
@@ -0,0 +1,60 @@
+import math
+from multiprocessing import shared_memory
+
+import numpy as np
+
+ALIGN = 64
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class SharedFrameRing:
+    """Fixed slots of frame + segmentation mask in one shared-memory block.
+
+    Each slot holds a uint8 (H, W, 3) frame and a float32 (H, W) mask. Slots
+    are addressed by index; who owns a slot at any moment is decided by the
+    descriptors the processes pass each other, so the pixels themselves never
+    cross a pipe. Create the ring in the parent, hand spec() to children and
+    attach() there.
+    """
+
+    def __init__(self, slots=4, shape=(480, 640, 3), name=None):
+        self.slots = slots
+        self.shape = tuple(shape)
+        h, w = self.shape[:2]
+        self._frame_bytes = _aligned(math.prod(self.shape))
+        self._mask_bytes = _aligned(h * w * 4)
+        size = slots * (self._frame_bytes + self._mask_bytes)
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.frames = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=i * self._frame_bytes)
+            for i in range(slots)
+        ]
+        masks_at = slots * self._frame_bytes
+        self.masks = [
+            np.ndarray((h, w), dtype=np.float32, buffer=self.shm.buf,
+                       offset=masks_at + i * self._mask_bytes)
+            for i in range(slots)
+        ]
+
+    def spec(self):
+        return self.shm.name, self.slots, self.shape
+
+    @classmethod
+    def attach(cls, spec):
+        name, slots, shape = spec
+        return cls(slots, shape, name=name)
+
+    def close(self):
+        # Views must go before the mapping can be released.
+        self.frames = []
+        self.masks = []
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
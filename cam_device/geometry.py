@@ -0,0 +1,151 @@
+import numpy as np
+
+
+# ------------------ Ray / Contour Intersection ------------------
+def cross2d(a, b):
+    # z component of the cross product of 2D vectors; broadcasts over rows.
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def ray_segment_intersection(ray_origin, ray_direction, pt1, pt2):
+    """Intersect a ray with a single segment. Returns (point, t) or None."""
+    segment_vec = pt2 - pt1
+    cross_val = cross2d(ray_direction, segment_vec)
+    if abs(cross_val) < 1e-6:
+        return None
+    diff = pt1 - ray_origin
+    t = cross2d(diff, segment_vec) / cross_val
+    s = cross2d(diff, ray_direction) / cross_val
+    if t >= 0 and 0 <= s <= 1:
+        return ray_origin + t * ray_direction, t
+    return None
+
+
+def contour_segments(contours):
+    """Stack the closed edges of every contour into (N, 2) start/end arrays."""
+    starts, ends = [], []
+    for contour in contours:
+        points = contour.reshape(-1, 2).astype(np.float32)
+        if len(points) == 0:
+            continue
+        starts.append(points)
+        ends.append(np.roll(points, -1, axis=0))  # Wrap-around for cyclic processing.
+    if not starts:
+        empty = np.empty((0, 2), dtype=np.float32)
+        return empty, empty
+    return np.concatenate(starts), np.concatenate(ends)
+
+
+def ray_contour_intersection(ray_origin, ray_direction, contours):
+    """Nearest hit of a ray against all edges of all contours at once.
+
+    Same arithmetic and tie-breaking as calling ray_segment_intersection for
+    every edge and keeping the smallest t, but evaluated as one batch.
+    Returns (point, t) or (None, inf).
+    """
+    pt1, pt2 = contour_segments(contours)
+    if len(pt1) == 0:
+        return None, np.inf
+
+    ray_origin = np.asarray(ray_origin, dtype=np.float32)
+    ray_direction = np.asarray(ray_direction, dtype=np.float32)
+
+    segment_vec = pt2 - pt1
+    cross_val = cross2d(ray_direction, segment_vec)
+    parallel = np.abs(cross_val) < 1e-6
+    safe_cross = np.where(parallel, np.float32(1), cross_val)
+
+    diff = pt1 - ray_origin
+    t = cross2d(diff, segment_vec) / safe_cross
+    s = cross2d(diff, ray_direction) / safe_cross
+    hit = ~parallel & (t >= 0) & (s >= 0) & (s <= 1)
+    if not hit.any():
+        return None, np.inf
+
+    t = np.where(hit, t, np.inf)
+    best = int(np.argmin(t))
+    best_t = t[best]
+    return ray_origin + best_t * ray_direction, best_t
+
+
+# ------------------ Landmarks and Joint Angles ------------------
+# MediaPipe PoseLandmark indices, mirrored here so this module stays importable
+# without mediapipe (benchmarks, replay tooling).
+NOSE = 0
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+NUM_LANDMARKS = 33
+
+# Virtual points appended after the 33 real landmarks by joint_points().
+SHOULDER_MID = NUM_LANDMARKS
+HIP_MID = NUM_LANDMARKS + 1
+
+# One row per angle: name, (p1, vertex, p3) landmark indices, debug BGR colour.
+# The angle is measured at the vertex between vertex->p1 and vertex->p3.
+JOINT_TRIPLETS = (
+    ("neckAngle", (NOSE, SHOULDER_MID, HIP_MID), (0, 255, 0)),
+    ("hipAngleL", (SHOULDER_MID, HIP_MID, LEFT_KNEE), (0, 255, 255)),
+    ("hipAngleR", (SHOULDER_MID, HIP_MID, RIGHT_KNEE), (0, 255, 255)),
+    ("backAngle", (LEFT_KNEE, LEFT_HIP, LEFT_SHOULDER), (255, 255, 0)),
+    ("armAngleL", (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST), (0, 0, 255)),
+    ("armAngleR", (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST), (255, 0, 255)),
+    ("kneeAngleL", (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE), (255, 165, 0)),
+    ("kneeAngleR", (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE), (255, 165, 0)),
+)
+JOINT_NAMES = tuple(name for name, _, _ in JOINT_TRIPLETS)
+JOINT_SLOT = {name: i for i, name in enumerate(JOINT_NAMES)}
+JOINT_INDEX = np.array([idx for _, idx, _ in JOINT_TRIPLETS], dtype=np.intp)
+
+
+def landmarks_to_array(landmarks, out=None):
+    """Convert MediaPipe landmarks to a float32 (33, 4) array of x, y, z, visibility."""
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    out[:] = [(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks]
+    return out
+
+
+def joint_points(landmark_array, width, height):
+    """Pixel-space (x, y, visibility) rows for all landmarks plus the virtual midpoints.
+
+    Midpoint visibility is the weaker of its two endpoints.
+    """
+    points = np.empty((NUM_LANDMARKS + 2, 3), dtype=np.float32)
+    points[:NUM_LANDMARKS, 0] = landmark_array[:, 0] * width
+    points[:NUM_LANDMARKS, 1] = landmark_array[:, 1] * height
+    points[:NUM_LANDMARKS, 2] = landmark_array[:, 3]
+    for mid, a, b in (
+        (SHOULDER_MID, LEFT_SHOULDER, RIGHT_SHOULDER),
+        (HIP_MID, LEFT_HIP, RIGHT_HIP),
+    ):
+        points[mid, :2] = (points[a, :2] + points[b, :2]) / 2
+        points[mid, 2] = min(points[a, 2], points[b, 2])
+    return points
+
+
+def compute_joint_angles(points, triplets=JOINT_INDEX, min_visibility=0.5):
+    """Evaluate every joint triplet in one pass.
+
+    Returns (angles_deg, confidence, valid) arrays with one entry per triplet.
+    A triplet is valid only when all three points are more visible than
+    min_visibility; confidence is the weakest of the three visibilities.
+    Degenerate (zero-length) limbs give an angle of 0, as before.
+    """
+    tri = points[triplets]  # (K, 3, 3)
+    v1 = tri[:, 0, :2] - tri[:, 1, :2]
+    v2 = tri[:, 2, :2] - tri[:, 1, :2]
+    norm1 = np.linalg.norm(v1, axis=1)
+    norm2 = np.linalg.norm(v2, axis=1)
+    degenerate = (norm1 < 1e-6) | (norm2 < 1e-6)
+    denom = np.where(degenerate, np.float32(1), norm1 * norm2)
+    cosine = np.clip(np.einsum("ij,ij->i", v1, v2) / denom, -1.0, 1.0)
+    angles = np.where(degenerate, np.float32(0), np.degrees(np.arccos(cosine)))
+
+    visibility = tri[:, :, 2]
+    valid = (visibility > min_visibility).all(axis=1)
+    confidence = visibility.min(axis=1)
+    return angles, confidence, valid
@@ -0,0 +1,363 @@
+"""On-device posture history.
+
+Every analysed sample is kept as one fixed-width 54-byte little-endian record:
+
+    offset  size  field
+    0       8     timestamp, unix seconds (float64)
+    8       2     status bits, as wire_format.pack_status
+    10      2     trust (float16)
+    12      28    7 x value (float32) in METRIC_KEYS order; missing is NaN
+    40      14    7 x confidence (float16)
+
+Records go into one append-only file per time segment (an hour by default)
+named after the segment's start, behind a 16-byte header. append() only
+copies into an in-memory batch; a writer thread appends whole batches, so the
+SD card sees a few large writes a minute instead of one per frame. Old
+segments are compacted to one averaged record per `compact_resolution`
+seconds and segments past the retention window are deleted. A torn tail
+from a crash is ignored on read, since only whole records are counted.
+"""
+import argparse
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+from wire_format import METRIC_KEYS, OVERALL_SHIFT, iso_timestamp, pack_status, unpack_status
+
+log = logging.getLogger("history")
+
+MAGIC = b"POGOHIST"
+VERSION = 1
+FLAG_COMPACTED = 1
+HEADER = struct.Struct("<8sBBHI")  # magic, version, flags, record size, resolution (s)
+SUFFIX = ".pgh"
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("ts", "<f8"),
+        ("status", "<u2"),
+        ("trust", "<f2"),
+        ("value", "<f4", (len(METRIC_KEYS),)),
+        ("confidence", "<f2", (len(METRIC_KEYS),)),
+    ]
+)
+
+
+def _number(value):
+    return np.nan if value is None else value
+
+
+def record_to_sample(record):
+    """A stored record in the posture update dict shape."""
+    sample = {
+        "timestamp": iso_timestamp(float(record["ts"])),
+        "trust": float(record["trust"]),
+    }
+    for i, key in enumerate(METRIC_KEYS):
+        value, conf = float(record["value"][i]), float(record["confidence"][i])
+        sample[key] = {
+            "value": None if np.isnan(value) else value,
+            "confidence": None if np.isnan(conf) else conf,
+        }
+    sample["posture"] = unpack_status(int(record["status"]))
+    return sample
+
+
+def compact(records, resolution):
+    """One record per `resolution` seconds: mean values, latest status."""
+    if len(records) == 0:
+        return records
+    buckets = np.floor(records["ts"] / resolution)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(records)] - 1
+    out = np.empty(len(starts), dtype=RECORD_DTYPE)
+    out["ts"] = records["ts"][starts]
+    out["status"] = records["status"][ends]
+    with np.errstate(invalid="ignore"):
+        for field in ("trust", "value", "confidence"):
+            column = records[field].astype(np.float32)
+            valid = ~np.isnan(column)
+            sums = np.add.reduceat(np.where(valid, column, 0.0), starts, axis=0)
+            n = np.add.reduceat(valid, starts, axis=0)
+            out[field] = np.where(n > 0, sums / np.maximum(n, 1), np.nan)
+    return out
+
+
+class HistoryStore:
+    """Append-optimised, time-segmented store of posture samples.
+
+    With writer=False the store is a read-only view for scans: no writer
+    thread, no maintenance, so it is safe to open next to a running device.
+    """
+
+    def __init__(self, directory="history", segment_seconds=3600, retention=30 * 86400.0,
+                 compact_after=86400.0, compact_resolution=1, flush_interval=30.0,
+                 batch_size=4096, max_pending=16, writer=True):
+        self.directory = directory
+        self.segment_seconds = int(segment_seconds)
+        self.retention = retention
+        self.compact_after = compact_after
+        self.compact_resolution = int(compact_resolution)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.disk_bytes = 0
+        self.writer = writer
+        self._batch = np.empty(batch_size, dtype=RECORD_DTYPE)
+        self._fill = 0
+        self._full = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._last_maintenance = 0.0
+        self._thread = None
+        if writer:
+            os.makedirs(directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+
+    # ------------------ Writing ------------------
+
+    def append(self, sample, timestamp=None):
+        """Buffer one posture sample (the update dict shape); never touches disk."""
+        if not self.writer:
+            raise RuntimeError("history store opened read-only")
+        posture = sample.get("posture")
+        with self._lock:
+            row = self._batch[self._fill]
+            row["ts"] = time.time() if timestamp is None else timestamp
+            row["status"] = pack_status(posture)
+            row["trust"] = _number(sample.get("trust"))
+            for i, key in enumerate(METRIC_KEYS):
+                metric = sample.get(key) or {}
+                row["value"][i] = _number(metric.get("value"))
+                row["confidence"][i] = _number(metric.get("confidence"))
+            self._fill += 1
+            self.appended += 1
+            if self._fill == self.batch_size:
+                self._swap()
+
+    def _swap(self):
+        # Called with the lock held.
+        if len(self._full) >= self.max_pending:
+            # The card is not keeping up; shed the oldest batch rather than grow.
+            self.dropped += len(self._full.pop(0))
+        self._full.append(self._batch[: self._fill])
+        self._batch = np.empty(self.batch_size, dtype=RECORD_DTYPE)
+        self._fill = 0
+        self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if time.time() - self._last_maintenance > 60.0:
+                self.maintain()
+
+    def flush(self):
+        """Write everything buffered so far."""
+        with self._lock:
+            if self._fill:
+                self._swap()
+            batches, self._full = self._full, []
+        with self._write_lock:
+            for batch in batches:
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    self.write_errors += 1
+                    self.dropped += len(batch)
+                    log.warning("Could not write %d history records: %s", len(batch), e)
+
+    def _path(self, start):
+        return os.path.join(self.directory, f"{start:012d}{SUFFIX}")
+
+    def _write(self, batch):
+        starts = np.floor(batch["ts"] / self.segment_seconds).astype(np.int64) * self.segment_seconds
+        for start in np.unique(starts):
+            rows = batch[starts == start]
+            path = self._path(int(start))
+            with open(path, "ab") as file:
+                size = file.tell()
+                if size == 0:
+                    file.write(HEADER.pack(MAGIC, VERSION, 0, RECORD_DTYPE.itemsize, 0))
+                    self.disk_bytes += HEADER.size
+                elif (size - HEADER.size) % RECORD_DTYPE.itemsize:
+                    # Drop a record torn by a crash so new ones stay aligned.
+                    file.truncate(size - (size - HEADER.size) % RECORD_DTYPE.itemsize)
+                file.write(rows.tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+            self.written += len(rows)
+            self.disk_bytes += rows.nbytes
+
+    # ------------------ Segments ------------------
+
+    def segments(self):
+        """(start, path) of every segment on disk, oldest first."""
+        found = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return found
+        for name in names:
+            if name.endswith(SUFFIX) and name[: -len(SUFFIX)].isdigit():
+                found.append((int(name[: -len(SUFFIX)]), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    @staticmethod
+    def _read_header(file):
+        magic, version, flags, size, resolution = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or size != RECORD_DTYPE.itemsize:
+            raise ValueError("not a posture history segment")
+        return flags, resolution
+
+    def _read_segment(self, path):
+        with open(path, "rb") as file:
+            self._read_header(file)
+            # Only whole records count, so a torn final write is ignored.
+            count = (os.fstat(file.fileno()).st_size - HEADER.size) // RECORD_DTYPE.itemsize
+            return np.fromfile(file, dtype=RECORD_DTYPE, count=count)
+
+    def maintain(self, now=None):
+        """Delete segments past retention and compact ones older than compact_after."""
+        if not self.writer:
+            raise RuntimeError("history store opened read-only")
+        now = time.time() if now is None else now
+        self._last_maintenance = now
+        with self._write_lock:
+            total = 0
+            for start, path in self.segments():
+                end = start + self.segment_seconds
+                try:
+                    if self.retention and end < now - self.retention:
+                        os.unlink(path)
+                        log.info("Removed expired history segment %s", path)
+                        continue
+                    if self.compact_resolution > 0 and end < now - self.compact_after:
+                        self._compact_segment(path)
+                    total += os.path.getsize(path)
+                except (OSError, ValueError) as e:
+                    log.warning("History maintenance skipped %s: %s", path, e)
+            self.disk_bytes = total
+
+    def _compact_segment(self, path):
+        with open(path, "rb") as file:
+            flags, _ = self._read_header(file)
+        if flags & FLAG_COMPACTED:
+            return
+        records = compact(self._read_segment(path), self.compact_resolution)
+        fd, tmp_path = tempfile.mkstemp(prefix=".history-", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(HEADER.pack(MAGIC, VERSION, FLAG_COMPACTED, RECORD_DTYPE.itemsize,
+                                       self.compact_resolution))
+                file.write(records.tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    # ------------------ Reading ------------------
+
+    def scan(self, start=None, end=None):
+        """Records with start <= ts < end as a structured array, oldest first.
+
+        Only segments overlapping the range are read, each with one
+        np.fromfile and a binary search; samples still buffered are included.
+        """
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+        with self._lock:
+            pending = self._full + [self._batch[: self._fill].copy()]
+        parts = []
+        with self._write_lock:
+            for seg_start, path in self.segments():
+                if seg_start + self.segment_seconds <= start or seg_start >= end:
+                    continue
+                try:
+                    parts.append(self._slice(self._read_segment(path), start, end))
+                except (OSError, ValueError) as e:
+                    log.warning("Skipping unreadable history segment %s: %s", path, e)
+        parts += [self._slice(batch, start, end) for batch in pending]
+        if not parts:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.concatenate(parts)
+
+    @staticmethod
+    def _slice(records, start, end):
+        ts = records["ts"]
+        return records[np.searchsorted(ts, start, "left"):np.searchsorted(ts, end, "left")]
+
+    def samples(self, start=None, end=None):
+        return [record_to_sample(record) for record in self.scan(start, end)]
+
+    def stats(self):
+        with self._lock:
+            buffered = self._fill + sum(len(batch) for batch in self._full)
+        return {
+            "appended": self.appended,
+            "written": self.written,
+            "buffered": buffered,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "disk_bytes": self.disk_bytes,
+        }
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+def _parse_time(text):
+    if text is None:
+        return None
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text[-1:] in units and text[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(text[:-1]) * units[text[-1]]
+    return datetime.fromisoformat(text).timestamp()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise the on-device posture history")
+    parser.add_argument("--dir", default="history", help="history directory")
+    parser.add_argument("--since", default="1h", help="start: ISO time or age like 30m, 6h, 2d")
+    parser.add_argument("--until", help="end: ISO time or age (default: now)")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.dir, writer=False)
+    records = store.scan(_parse_time(args.since), _parse_time(args.until))
+    store.close()
+    print(f"{len(records)} samples")
+    if len(records):
+        overall = (records["status"] >> OVERALL_SHIFT) & 0b111
+        for code in np.unique(overall):
+            name = unpack_status(int(code) << OVERALL_SHIFT)["overall"]
+            print(f"  {name:8s} {np.mean(overall == code) * 100:5.1f}%")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            means = np.nanmean(records["value"].astype(np.float32), axis=0)
+        for key, mean in zip(METRIC_KEYS, means):
+            print(f"  {key:14s} mean {mean:8.2f}")
@@ -0,0 +1,214 @@
+"""WebSocket link management: reconnect backoff, heartbeats and RTT.
+
+LinkManager owns the connect/reconnect loop for the server link. Reconnects
+wait an exponentially growing, fully jittered delay, so a fleet of devices
+spreads out after a server restart instead of arriving together. While
+connected it pings every `ping_interval` seconds and times each pong; a pong
+that has not arrived within `ping_timeout` means the peer is gone (a
+half-open TCP connection looks idle, not closed), so the socket is aborted
+and the session ends within ping_interval + ping_timeout of the peer going
+silent.
+
+The link state and recent RTT percentiles are available to the sender,
+which uses send_delay() to back off on a slow link and let the telemetry
+queue coalesce instead.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+import websockets
+
+from metrics import metrics as default_metrics
+
+log = logging.getLogger("link")
+
+DOWN = "down"
+CONNECTING = "connecting"
+UP = "up"
+DEGRADED = "degraded"
+
+
+class Backoff:
+    """Capped exponential backoff with full jitter: uniform(0, min(cap, base * 2**n))."""
+
+    def __init__(self, base=1.0, cap=60.0, rng=random):
+        self.base = base
+        self.cap = cap
+        self.attempt = 0
+        self._rng = rng
+
+    def next_delay(self):
+        ceiling = min(self.cap, self.base * 2 ** min(self.attempt, 30))
+        self.attempt += 1
+        return self._rng.uniform(0.0, ceiling)
+
+    def reset(self):
+        self.attempt = 0
+
+
+class LinkManager:
+    """Keeps one WebSocket session to `url` alive and measures it.
+
+    `session(ws)` is a coroutine run for each connection; when it returns or
+    the connection drops, the manager backs off and reconnects until
+    `should_stop()` is true. The backoff only resets once a connection has
+    stayed up for `stable_after` seconds, so a server that accepts and then
+    immediately drops connections is not hammered.
+    """
+
+    def __init__(self, url, session, should_stop=lambda: False, ping_interval=10.0,
+                 ping_timeout=5.0, degraded_rtt=0.5, open_timeout=10.0, stable_after=30.0,
+                 backoff=None, window=64, metrics=None):
+        self.url = url
+        self.session = session
+        self.should_stop = should_stop
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.degraded_rtt = degraded_rtt
+        self.open_timeout = open_timeout
+        self.stable_after = stable_after
+        self.backoff = backoff if backoff is not None else Backoff()
+        self.metrics = metrics if metrics is not None else default_metrics
+        self.state = DOWN
+        self.connects = 0
+        self.disconnects = 0
+        self.dead_peers = 0
+        self.pings = 0
+        self.missed_pongs = 0
+        self.last_error = None
+        self._rtts = deque(maxlen=window)
+        self._connected_at = None
+
+    # ------------------ Measurements ------------------
+
+    def rtt(self, q=0.5):
+        """Quantile of the recent ping round trips, in seconds (0.0 if none yet)."""
+        samples = sorted(self._rtts)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    @property
+    def uptime(self):
+        return time.monotonic() - self._connected_at if self._connected_at is not None else 0.0
+
+    def send_delay(self):
+        """Pause the sender should take between batches on this link.
+
+        Zero while healthy; on a degraded link, about one p95 round trip
+        (capped at a second), during which queued updates coalesce.
+        """
+        if self.state != DEGRADED:
+            return 0.0
+        return min(1.0, self.rtt(0.95))
+
+    def _update_state(self):
+        if self.state in (UP, DEGRADED):
+            self.state = DEGRADED if self.rtt(0.95) > self.degraded_rtt else UP
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "uptime_s": round(self.uptime, 1),
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "dead_peers": self.dead_peers,
+            "pings": self.pings,
+            "missed_pongs": self.missed_pongs,
+            "rtt_p50_ms": round(self.rtt(0.5) * 1000, 1),
+            "rtt_p95_ms": round(self.rtt(0.95) * 1000, 1),
+            "rtt_p99_ms": round(self.rtt(0.99) * 1000, 1),
+            "backoff_attempt": self.backoff.attempt,
+            "last_error": self.last_error,
+        }
+
+    def register_metrics(self, registry):
+        registry.gauge("pogo_link_up", lambda: 1 if self.state in (UP, DEGRADED) else 0,
+                       "Whether the server link is connected.")
+        registry.gauge("pogo_link_degraded", lambda: 1 if self.state == DEGRADED else 0,
+                       "Whether the link's recent p95 RTT is over the degraded threshold.")
+        registry.gauge("pogo_link_connects_total", lambda: self.connects,
+                       "Successful server connections.")
+        registry.gauge("pogo_link_dead_peers_total", lambda: self.dead_peers,
+                       "Connections aborted after a missed pong.")
+        for q in (0.5, 0.95, 0.99):
+            registry.gauge("pogo_link_rtt_seconds", lambda q=q: self.rtt(q),
+                           "Recent ping round-trip time.", {"quantile": str(q)})
+
+    # ------------------ Connection loop ------------------
+
+    async def run(self):
+        while not self.should_stop():
+            self.state = CONNECTING
+            try:
+                async with websockets.connect(
+                    self.url, ping_interval=None, open_timeout=self.open_timeout, close_timeout=2
+                ) as ws:
+                    await self._connected(ws)
+            except Exception as e:
+                self.last_error = str(e) or type(e).__name__
+                log.warning("Link to %s failed: %s", self.url, self.last_error)
+            finally:
+                if self._connected_at is not None:
+                    self.disconnects += 1
+                    if self.uptime >= self.stable_after:
+                        self.backoff.reset()
+                    self._connected_at = None
+                self.state = DOWN
+            if self.should_stop():
+                break
+            delay = self.backoff.next_delay()
+            log.info("Reconnecting in %.1f s (attempt %d)", delay, self.backoff.attempt)
+            await self._sleep(delay)
+
+    async def _connected(self, ws):
+        self.connects += 1
+        self._connected_at = time.monotonic()
+        self._rtts.clear()
+        self.state = UP
+        log.info("Connected to %s", self.url)
+        session = asyncio.create_task(self.session(ws))
+        heartbeat = asyncio.create_task(self._heartbeat(ws))
+        try:
+            await asyncio.wait((session, heartbeat), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (session, heartbeat):
+                task.cancel()
+            await asyncio.gather(session, heartbeat, return_exceptions=True)
+        if session.done() and not session.cancelled() and session.exception() is not None:
+            raise session.exception()
+
+    async def _heartbeat(self, ws):
+        while not self.should_stop():
+            await self._sleep(self.ping_interval)
+            start = time.perf_counter()
+            try:
+                pong = await ws.ping()
+                await asyncio.wait_for(pong, self.ping_timeout)
+            except asyncio.TimeoutError:
+                self.missed_pongs += 1
+                self.dead_peers += 1
+                self.last_error = f"no pong within {self.ping_timeout:g} s"
+                log.warning("Link to %s is dead (%s); dropping it", self.url, self.last_error)
+                ws.transport.abort()
+                return
+            except websockets.exceptions.ConnectionClosed:
+                return
+            rtt = time.perf_counter() - start
+            self.pings += 1
+            self._rtts.append(rtt)
+            self.metrics.observe("ws_rtt", rtt)
+            self._update_state()
+
+    async def _sleep(self, seconds):
+        # Sleep in short steps so a stop request is noticed promptly.
+        deadline = time.monotonic() + seconds
+        while not self.should_stop():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, 0.5))
+
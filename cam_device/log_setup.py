@@ -0,0 +1,116 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """Let each (logger, message template) through at most once per interval.
+
+    Only records below `max_level` are limited, so warnings and errors are
+    never hidden. Templates are compared before formatting, which keeps the
+    check cheap for per-frame messages with changing arguments.
+    """
+
+    def __init__(self, interval, max_level=logging.WARNING):
+        super().__init__()
+        self.interval = interval
+        self.max_level = max_level
+        self._last = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno >= self.max_level:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                self.suppressed += 1
+                return False
+            self._last[key] = now
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves the formatting to the listener thread.
+
+    The stock prepare() formats every record on the emitting thread. Here
+    a record whose arguments are all immutable is queued as is, so only the
+    listener pays for %-formatting; anything else (a dict that the caller
+    may go on to mutate, an exception) is resolved now.
+    """
+
+    def prepare(self, record):
+        if record.exc_info or record.stack_info or not _immutable(record.args):
+            return super().prepare(record)
+        return record
+
+
+def _immutable(args):
+    if args is None or isinstance(args, (str, bytes, int, float, bool)):
+        return True
+    return isinstance(args, tuple) and all(_immutable(arg) for arg in args)
+
+
+def parse_level(level):
+    """Numeric logging level for a name ("debug") or number; None if unknown."""
+    if isinstance(level, int):
+        return level
+    text = str(level).strip().upper()
+    if text.isdigit():
+        return int(text)
+    value = logging.getLevelName(text)
+    return value if isinstance(value, int) else None
+
+
+_listener = None
+
+
+def setup_logging(level="INFO", rate_limit=0.0, stream=None):
+    """Route all logging through a queue drained by a background thread.
+
+    The capture/inference threads only pay for an enqueue; formatting and the
+    write to stdout/journald happen on the listener thread (see
+    DeferredQueueHandler). Records below `level` are rejected by the logger
+    itself before any formatting; an unknown level falls back to INFO.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    records = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(records)
+    if rate_limit and rate_limit > 0:
+        queue_handler.addFilter(RateLimitFilter(rate_limit))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    numeric_level = parse_level(level)
+    root.setLevel(logging.INFO if numeric_level is None else numeric_level)
+
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    if numeric_level is None:
+        logging.getLogger("log_setup").warning("Unknown log level %r; using INFO", level)
+    return _listener
+
+
+def shutdown_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # Drains whatever is still queued
+        _listener = None
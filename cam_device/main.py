@@ -1,17 +1,50 @@
-import os
 import json
+import argparse
+import signal
 import asyncio
 import cv2
-import numpy as np
-import mediapipe as mp
-import math
-from datetime import datetime
+from collections import namedtuple
 import time
 import threading
+import logging
+import queue
 from dotenv import load_dotenv
 import websockets
-from queue import Queue
-import requests
+
+from alerts import AlertGate, AlertOutbox
+from audio import AudioEngine, open_sink
+from config_store import ConfigStore
+from history import HistoryStore
+from link import LinkManager
+from log_setup import setup_logging
+from metrics import metrics, serve_metrics
+from model_select import ModelSelector
+from multicam import MultiCameraRunner, build_cameras, parse_cameras
+from multiperson import MultiPersonEngine
+from multiproc import STAT_NO_SLOT, STAT_STALE, MultiProcessPipeline
+from netcam import open_capture
+from pipeline import FRAME_SIZE, PosturePipeline, build_pose_graph, posture_metrics
+from posture_rules import (
+    THRESHOLD_DEFAULTS,
+    classify_posture_metrics_seated,
+    reload_threshold_table,
+    step_temperature,
+)
+from roi import RoiTracker
+from rollup import DEFAULT_GRANULARITIES, RollupAggregator, parse_granularities
+from segmentation import silhouette_from_config
+from spool import DiskSpool
+from scheduler import FrameScheduler, MotionGate
+from telemetry import TelemetryQueue
+from wire_format import (
+    ENCODING_JSON,
+    SUPPORTED_ENCODINGS,
+    encode_message,
+    iso_timestamp,
+)
+
+log = logging.getLogger("detection")
+ws_log = logging.getLogger("websocket")
 
 # ------------------ Global Data and Locks ------------------
 posture_data = {
@@ -35,8 +68,11 @@ classification_lock = threading.Lock()
 
 temperature = 0
 
-message_queue = Queue()
+# Pending posture updates coalesce (latest wins), so this never holds more
+# than one update plus whatever else is in flight.
+message_queue = TelemetryQueue(maxsize=64)
 ws_lock = threading.Lock()
+# Lock order: device_id_lock, then posture_data_lock, then classification_lock.
 device_id_lock = threading.Lock()
 
 VIDEO_SOURCE = 0
@@ -49,273 +85,357 @@ brk = False  # Global flag to stop
 
 ws = None
 device_id = None
+wire_encoding = ENCODING_JSON
+
+CONFIG_SCHEMA = {
+    **{key: float for key in THRESHOLD_DEFAULTS},
+    "T_INC_RATE": float,
+    "T_DEC_RATE": float,
+    "THRESHOLD": float,
+    "LOG_RATE_LIMIT": float,
+    "METRICS_PORT": int,
+    "IDLE_PERIOD": float,
+    "IDLE_AFTER": float,
+    "IDLE_REFRESH": float,
+    "MOTION_THRESHOLD": float,
+    "ROI_TRACKING": int,
+    "SEGMENTER": str,
+    "SEGMENT_EVERY": int,
+    "SEGMENT_SCALE": float,
+    "MODEL_COMPLEXITY": int,
+    "POSE_LATENCY_BUDGET": float,
+    "MULTI_PERSON": int,
+    "PERSON_WORKERS": int,
+    "INFERENCE_WORKERS": int,
+    "MULTI_PROCESS": int,
+    "ALERT_MIN_INTERVAL": float,
+    "ALERT_SOUND": str,
+    "HISTORY_DIR": str,
+    "HISTORY_RETENTION_DAYS": float,
+    "ROLLUP_GRANULARITIES": str,
+    "LIVE_STREAM": int,
+    "SPOOL_DIR": str,
+    "SPOOL_MAX_MB": float,
+    "SPOOL_MAX_AGE_HOURS": float,
+    "SPOOL_REPLAY_RATE": float,
+    "WS_PING_INTERVAL": float,
+    "WS_PING_TIMEOUT": float,
+    "HELLO_TIMEOUT": float,
+}
+config = ConfigStore(".env", schema=CONFIG_SCHEMA)
+
+metrics.gauge("pogo_outbound_depth", lambda: len(message_queue), "Queued outbound messages.")
+metrics.gauge(
+    "pogo_outbound_dropped_total",
+    lambda: message_queue.dropped,
+    "Outbound messages dropped because the queue was full.",
+)
+metrics.gauge(
+    "pogo_outbound_last_age_seconds",
+    lambda: message_queue.last_age,
+    "Age of the most recently sent message when it left the queue.",
+)
+metrics.gauge("pogo_temperature", lambda: temperature, "Bad-posture temperature.")
+
+# One alert per bad-posture episode per device; webhook delivery runs on its
+# own thread (created at startup when API_URL is set).
+alert_gate = AlertGate()
+metrics.gauge("pogo_alerts_suppressed_total", lambda: alert_gate.suppressed,
+              "Over-threshold frames that did not re-fire an ongoing alert.")
+metrics.gauge("pogo_alerts_rate_limited_total", lambda: alert_gate.rate_limited,
+              "Alert episodes suppressed by the per-device minimum interval.")
+alert_outbox = None
+# Pre-rendered tones played off-thread; opened at startup from ALERT_SOUND.
+alert_audio = None
+# Local posture history (HISTORY_DIR); opened at startup.
+history = None
+# Per-frame "update" messages are only streamed in live mode (LIVE_STREAM, or
+# {"action": "live", "enabled": true} from the server); closed rollup buckets
+# are always sent.
+live_stream = threading.Event()
+
+
+# Messages that must survive an outage or restart (rollups) are spooled to
+# SPOOL_DIR and replayed in order until the server acknowledges them.
+spool = None
+# Whether the connected server sends spool_ack messages; None until its
+# hello_response says, and nothing is replayed before then. A server that
+# never answers the hello within HELLO_TIMEOUT is taken not to ack.
+spool_acks = None
+
+
+# Server link (reconnects, heartbeats, RTT); created at startup when streaming.
+link = None
+
+
+def queue_durable(message):
+    if spool is not None:
+        spool.append(message)
+    else:
+        message_queue.put(message)
 
 
-# ------------------ Utility ------------------
-class FakeLandmark:
-    def __init__(self, x, y, visibility):
-        self.x = x
-        self.y = y
-        self.visibility = visibility
+def rollup_granularities():
+    return parse_granularities(
+        config.get("ROLLUP_GRANULARITIES", ",".join(map(str, DEFAULT_GRANULARITIES)))
+    )
 
 
+# ------------------ Utility ------------------
 def get_posture_status(trust, smoothed_curvature):
     return posture_data["posture"]
 
 
 # ------------------ WebSocket Communication ------------------
 async def send_queued_messages(ws_connection):
-    """Send messages from the queue asynchronously"""
+    """Send queued messages as soon as they arrive, a batch at a time.
+
+    Live messages go first; spooled ones are replayed in between at no more
+    than SPOOL_REPLAY_RATE per second.
+    """
+    global spool_acks
+    loop = asyncio.get_running_loop()
+    message_queue.bind(loop)
+    if spool is not None:
+        spool.rewind()
+    hello_timeout = config.get("HELLO_TIMEOUT", 5.0)
+    hello_deadline = time.monotonic() + hello_timeout
+    seq = 0
     while not brk:
-        try:
-            if not message_queue.empty():
-                message = message_queue.get()
-                await ws_connection.send(message)
-                print("Message sent to server")
-            await asyncio.sleep(0.1)  # Prevent tight loop
-        except Exception as e:
-            print(f"Error sending message: {e}")
-            break
-
-
-def update_env(key, value, env_file=".env"):
-    lines = []
-    if os.path.exists(env_file):
-        with open(env_file, "r") as file:
-            lines = file.readlines()
-    key_found = False
-    for i, line in enumerate(lines):
-        if line.startswith(f"{key}="):
-            lines[i] = f"{key}={value}\n"
-            key_found = True
-            break
-    if not key_found:
-        lines.append(f"{key}={value}\n")
-    with open(env_file, "w") as file:
-        file.writelines(lines)
-    load_dotenv(override=True)
+        if spool_acks is None and time.monotonic() >= hello_deadline:
+            spool_acks = False
+            ws_log.info("No hello_response within %.0f s; replaying the spool without acks", hello_timeout)
+        backlog = spool is not None and spool_acks is not None and spool.backlog
+        batch = await message_queue.get_batch(max_items=16, timeout=0.1 if backlog else 0.5)
+        for i, item in enumerate(batch):
+            try:
+                payload = item.payload
+                if isinstance(payload, dict):
+                    # Serialise here, once, in whatever the link negotiated.
+                    seq += 1
+                    with metrics.time("encode"):
+                        payload = encode_message(payload, wire_encoding, seq)
+                await ws_connection.send(payload)
+            except (Exception, asyncio.CancelledError) as e:
+                message_queue.mark_sent(batch[:i])
+                message_queue.requeue(batch[i:])  # Retry after reconnecting
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                ws_log.warning("Error sending message: %s", e)
+                return
+        if batch:
+            message_queue.mark_sent(batch)
+            ws_log.debug("Sent %d message(s) to server", len(batch))
+            # On a slow link, pause and let the queue coalesce updates.
+            delay = link.send_delay() if link is not None else 0.0
+            if delay:
+                await asyncio.sleep(delay)
+        if backlog:
+            budget = spool.replay_budget()
+            # Reading segments is file I/O; keep it off the event loop.
+            records = await loop.run_in_executor(None, spool.read, min(budget, 16)) if budget else ()
+            for spool_seq, payload in records:
+                try:
+                    await ws_connection.send(payload)
+                except Exception as e:
+                    ws_log.warning("Error replaying spooled message %d: %s", spool_seq, e)
+                    return  # Replay restarts from the last ack after reconnecting
+                if spool_acks is False:
+                    # The server said it can't ack; a completed send is the best we know.
+                    spool.ack(spool_seq)
+
+
+def hello_message(current_device_id):
+    # Offer the compact encoding first; servers that don't know it never
+    # answer the hello and the link stays on JSON.
+    if config.get("WIRE_FORMAT", "binary") == ENCODING_JSON:
+        encodings = [ENCODING_JSON]
+    else:
+        encodings = list(SUPPORTED_ENCODINGS)
+    return json.dumps({"action": "hello", "deviceId": current_device_id, "encodings": encodings})
 
 
 async def receive_updates(ws_connection):
-    global device_id
+    global device_id, wire_encoding, spool_acks
     while not brk:
         try:
             response = await ws_connection.recv()
             data = json.loads(response)
-            print(f"Received: {data}")
+            ws_log.debug("Received: %s", data)
+
+            if data.get("action") == "hello_response":
+                encoding = data.get("encoding")
+                wire_encoding = (
+                    encoding if encoding in SUPPORTED_ENCODINGS else ENCODING_JSON
+                )
+                ws_log.info("Using %s encoding for updates", wire_encoding)
+                spool_acks = bool(data.get("spoolAck"))
+
+            if data.get("action") == "spool_ack" and spool is not None:
+                spool.ack(int(data["seq"]))
+
+            if data.get("action") == "live":
+                if data.get("enabled"):
+                    live_stream.set()
+                else:
+                    live_stream.clear()
+                ws_log.info("Live streaming %s", "on" if live_stream.is_set() else "off")
+
+            # Remote calibration, for devices without a keyboard/display.
+            if data.get("action") == "calibrate":
+                request_calibration()
 
             # Update device ID if present.
             if "device_id" in data:
                 with device_id_lock:
                     device_id = data["device_id"]
-                    print(f"Received Device ID: {device_id}")
-                    update_env("DEVICE_ID", device_id)
+                    ws_log.info("Received Device ID: %s", device_id)
+                    config.update({"DEVICE_ID": device_id})
+                # Binary updates don't carry the id, so re-announce it.
+                await ws_connection.send(hello_message(data["device_id"]))
 
             # Update threshold parameters if present.
             if "thresholds" in data and isinstance(data["thresholds"], dict):
                 thresholds = data["thresholds"]
                 for key, value in thresholds.items():
-                    print(f"Updating threshold {key} to {value}")
-                    update_env(
-                        key, value
-                    )  # Always update the threshold value in the .env file
+                    ws_log.info("Updating threshold %s to %s", key, value)
+                try:
+                    # One batch per message: one snapshot, one table compile,
+                    # and at most one (debounced) .env write.
+                    config.update(thresholds)
+                    reload_threshold_table(config.get)
+                except ValueError as e:
+                    ws_log.warning("Rejected thresholds %s: %s", thresholds, e)
 
         except websockets.exceptions.ConnectionClosed:
-            print("Connection closed in receive_updates")
+            ws_log.info("Connection closed in receive_updates")
             break
         except Exception as e:
-            print(f"Error receiving: {e}")
+            ws_log.warning("Error receiving: %s", e)
             break
 
 
-async def main_ws_func(ws_server):
-    """Main WebSocket connection handler with reconnection logic"""
-    global ws, brk, device_id
-    while not brk:
+async def ws_session(ws_connection):
+    """One connected session: handshake, then send and receive until either stops.
+
+    Reconnect backoff and heartbeats are the LinkManager's job.
+    """
+    global ws, wire_encoding, spool_acks
+    with ws_lock:
+        ws = ws_connection
+    try:
+        # Negotiate the update encoding; JSON until the server answers.
+        wire_encoding = ENCODING_JSON
+        spool_acks = None
+        # device_id_lock is a threading lock; never hold it across an await.
+        with device_id_lock:
+            current_device_id = device_id
+        await ws_connection.send(hello_message(current_device_id))
+
+        # Request device ID if needed
+        if current_device_id is None:
+            request_msg = json.dumps({"action": "request_device_id"})
+            await ws_connection.send(request_msg)
+
+        # Start concurrent tasks; a closed socket ends the receiver first.
+        tasks = {
+            asyncio.create_task(send_queued_messages(ws_connection)),
+            asyncio.create_task(receive_updates(ws_connection)),
+        }
         try:
-            async with websockets.connect(ws_server) as ws_connection:
-                print("Connected to WebSocket server")
-                with ws_lock:
-                    ws = ws_connection
-
-                # Request device ID if needed
-                with device_id_lock:
-                    if device_id is None:
-                        request_msg = json.dumps({"action": "request_device_id"})
-                        await ws_connection.send(request_msg)
-
-                # Start concurrent tasks
-                sender = asyncio.create_task(send_queued_messages(ws_connection))
-                receiver = asyncio.create_task(receive_updates(ws_connection))
-                await asyncio.gather(sender, receiver)
-
-        except Exception as e:
-            print(f"WebSocket error: {e}")
-            await asyncio.sleep(5)
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
         finally:
-            with ws_lock:
-                ws = None
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        with ws_lock:
+            ws = None
 
 
-def run_main_ws_func(ws_server):
+def run_main_ws_func(link_manager):
     # wrapper
-    asyncio.run(main_ws_func(ws_server))
-
-
-# ------------------ Posture Detection ------------------
-smoothed_curvature = None
-alpha = 0.1
-
-
-# ISO11226 based classification for seated posture
-def classify_posture_metrics_seated(metrics):
-    TRUNK_ACCEPTABLE_THRESHOLD = float(os.getenv("TRUNK_ACCEPTABLE_THRESHOLD", "0.15"))
-    TRUNK_WARNING_THRESHOLD = float(os.getenv("TRUNK_WARNING_THRESHOLD", "0.30"))
-
-    NECK_DEVIATION_ACCEPTABLE = float(os.getenv("NECK_DEVIATION_ACCEPTABLE", "5"))
-    NECK_DEVIATION_WARNING = float(os.getenv("NECK_DEVIATION_WARNING", "15"))
-
-    ARM_ACCEPTABLE_MIN = float(os.getenv("ARM_ACCEPTABLE_MIN", "80"))
-    ARM_ACCEPTABLE_MAX = float(os.getenv("ARM_ACCEPTABLE_MAX", "110"))
-    ARM_WARNING_LOWER = float(os.getenv("ARM_WARNING_LOWER", "70"))
-    ARM_WARNING_UPPER = float(os.getenv("ARM_WARNING_UPPER", "120"))
+    asyncio.run(link_manager.run())
+
+
+# ------------------ Runtime Profiles ------------------
+# debug_view: overlays, preview window and keyboard ('c' calibrate, 'q' quit).
+# stream: connect to WS_SERVER and publish updates.
+# loop_delay: target frame period (None = LOOP_DELAY).
+# motion_gating: drop to IDLE_PERIOD and reuse the last result on a static scene.
+# sound: play alert tones through ALERT_SOUND.
+RuntimeProfile = namedtuple(
+    "RuntimeProfile", ["name", "debug_view", "stream", "loop_delay", "motion_gating", "sound"]
+)
+
+PROFILES = {
+    "headless": RuntimeProfile("headless", False, True, None, True, True),
+    "debug": RuntimeProfile("debug", True, True, None, True, True),
+    "benchmark": RuntimeProfile("benchmark", False, False, 0.0, False, False),
+}
+DEFAULT_PROFILE = "debug"
 
-    HIP_ACCEPTABLE_MIN = float(os.getenv("HIP_ACCEPTABLE_MIN", "80"))
-    HIP_ACCEPTABLE_MAX = float(os.getenv("HIP_ACCEPTABLE_MAX", "100"))
-    HIP_WARNING_LOWER = float(os.getenv("HIP_WARNING_LOWER", "70"))
-    HIP_WARNING_UPPER = float(os.getenv("HIP_WARNING_UPPER", "110"))
+# Set by the 'c' key, SIGUSR1 or a {"action": "calibrate"} server message.
+calibration_requested = threading.Event()
 
-    KNEE_ACCEPTABLE_MIN = float(os.getenv("KNEE_ACCEPTABLE_MIN", "90"))
-    KNEE_ACCEPTABLE_MAX = float(os.getenv("KNEE_ACCEPTABLE_MAX", "135"))
-    KNEE_WARNING_LOWER = float(os.getenv("KNEE_WARNING_LOWER", "85"))
-    KNEE_WARNING_UPPER = float(os.getenv("KNEE_WARNING_UPPER", "140"))
 
-    classification = {}
+def request_calibration(*_):
+    calibration_requested.set()
 
-    # --- Trunk Posture (Back Curvature) ---
-    back_data = metrics.get("backCurvature", {})
-    back_value = back_data.get("value", 0)
-    back_conf = back_data.get("confidence", 0)
-    if back_conf < 0.5:
-        classification["trunk"] = "unknown"
-    else:
-        if back_value < TRUNK_ACCEPTABLE_THRESHOLD:
-            classification["trunk"] = "acceptable"
-        elif TRUNK_ACCEPTABLE_THRESHOLD <= back_value <= TRUNK_WARNING_THRESHOLD:
-            classification["trunk"] = "warning"
-        else:
-            classification["trunk"] = "not recommended"
-
-    # --- Neck Posture ---
-    neck_data = metrics.get("neckAngle", {})
-    neck_value = neck_data.get("value", 0)
-    neck_conf = neck_data.get("confidence", 0)
-    if neck_conf < 0.5:
-        classification["neck"] = "unknown"
-    else:
-        deviation = abs(neck_value - 180)
-        if deviation < NECK_DEVIATION_ACCEPTABLE:
-            classification["neck"] = "acceptable"
-        elif NECK_DEVIATION_ACCEPTABLE <= deviation < NECK_DEVIATION_WARNING:
-            classification["neck"] = "warning"
-        else:
-            classification["neck"] = "not recommended"
-
-    # --- Upper Extremity (Arm) Posture ---
-    # Left Arm
-    armL_data = metrics.get("armAngleL", {})
-    armL_value = armL_data.get("value", 0)
-    armL_conf = armL_data.get("confidence", 0)
-    if armL_conf < 0.5:
-        classification["arm_left"] = "unknown"
-    else:
-        if ARM_ACCEPTABLE_MIN <= armL_value <= ARM_ACCEPTABLE_MAX:
-            classification["arm_left"] = "acceptable"
-        elif (ARM_WARNING_LOWER <= armL_value < ARM_ACCEPTABLE_MIN) or (
-            ARM_ACCEPTABLE_MAX < armL_value <= ARM_WARNING_UPPER
-        ):
-            classification["arm_left"] = "warning"
-        else:
-            classification["arm_left"] = "not recommended"
-
-    # Right Arm
-    armR_data = metrics.get("armAngleR", {})
-    armR_value = armR_data.get("value", 0)
-    armR_conf = armR_data.get("confidence", 0)
-    if armR_conf < 0.5:
-        classification["arm_right"] = "unknown"
-    else:
-        if ARM_ACCEPTABLE_MIN <= armR_value <= ARM_ACCEPTABLE_MAX:
-            classification["arm_right"] = "acceptable"
-        elif (ARM_WARNING_LOWER <= armR_value < ARM_ACCEPTABLE_MIN) or (
-            ARM_ACCEPTABLE_MAX < armR_value <= ARM_WARNING_UPPER
-        ):
-            classification["arm_right"] = "warning"
-        else:
-            classification["arm_right"] = "not recommended"
-
-    # --- Hip Posture ---
-    hip_data = metrics.get("hipAngle", {})
-    hip_value = hip_data.get("value", None)
-    hip_conf = hip_data.get("confidence", 0)
-    if hip_value is None or hip_conf < 0.5:
-        classification["hip"] = "unknown"
-    else:
-        if HIP_ACCEPTABLE_MIN <= hip_value <= HIP_ACCEPTABLE_MAX:
-            classification["hip"] = "acceptable"
-        elif (HIP_WARNING_LOWER <= hip_value < HIP_ACCEPTABLE_MIN) or (
-            HIP_ACCEPTABLE_MAX < hip_value <= HIP_WARNING_UPPER
-        ):
-            classification["hip"] = "warning"
-        else:
-            classification["hip"] = "not recommended"
-
-    # --- Knee Posture ---
-    kneeL_data = metrics.get("kneeAngleL", {})
-    kneeL_value = kneeL_data.get("value", 0)
-    kneeL_conf = kneeL_data.get("confidence", 0)
-    kneeR_data = metrics.get("kneeAngleR", {})
-    kneeR_value = kneeR_data.get("value", 0)
-    kneeR_conf = kneeR_data.get("confidence", 0)
-    if kneeL_conf < 0.5 or kneeR_conf < 0.5:
-        classification["knee"] = "unknown"
-    else:
-        avg_knee = (kneeL_value + kneeR_value) / 2
-        if KNEE_ACCEPTABLE_MIN <= avg_knee <= KNEE_ACCEPTABLE_MAX:
-            classification["knee"] = "acceptable"
-        elif (KNEE_WARNING_LOWER <= avg_knee < KNEE_ACCEPTABLE_MIN) or (
-            KNEE_ACCEPTABLE_MAX < avg_knee <= KNEE_WARNING_UPPER
-        ):
-            classification["knee"] = "warning"
-        else:
-            classification["knee"] = "not recommended"
-
-    # --- Overall Posture Classification ---
-    segments = []
-    for seg in ["trunk", "neck", "arm_left", "arm_right", "hip", "knee"]:
-        status = classification.get(seg)
-        if status != "unknown":
-            segments.append(status)
-
-    if not segments:
-        overall = "unknown"
-    elif any(s == "warning" for s in segments):
-        overall = "WARNING"
-    elif sum(1 for s in segments if s == "acceptable") > (len(segments) / 2):
-        overall = "GOOD"
-    else:
-        overall = "MEH"
 
-    classification["overall"] = overall
+def build_pipeline(debug_view, registry=metrics, analyse_only=False, own_pose=True):
+    """A PosturePipeline configured from .env (ROI, silhouette, pose model).
 
-    return classification
+    analyse_only leaves out the pose graph and ROI tracker, for when pose
+    inference runs in another process. own_pose=False keeps the ROI tracker
+    but leaves the graph to be lent in per frame (see MultiCameraRunner).
+    """
+    roi = RoiTracker() if config.get("ROI_TRACKING", 1) and not analyse_only else None
+    # Silhouette for curvature: "selfie" (default) runs a separate lighter
+    # segmenter only when a refresh is due and leaves segmentation out of the
+    # pose graph; "pose" has the graph produce a mask on every frame.
+    silhouette = silhouette_from_config(config.get)
+    return PosturePipeline(
+        pose=None if own_pose and not analyse_only else False,
+        debug_view=debug_view,
+        metrics=registry,
+        roi=roi,
+        silhouette=silhouette,
+        model_complexity=config.get("MODEL_COMPLEXITY", 1),
+    )
 
 
-def posture_detection(stream=True, debug_view=True):
-    global smoothed_curvature, brk
-    mp_pose = mp.solutions.pose
-    mp_drawing = mp.solutions.drawing_utils
-    pose = mp_pose.Pose(static_image_mode=False, enable_segmentation=True)
+# ------------------ Posture Detection ------------------
+def posture_detection(profile=PROFILES[DEFAULT_PROFILE], multi_process=False):
+    debug_view = profile.debug_view
+    loop_delay = LOOP_DELAY if profile.loop_delay is None else profile.loop_delay
+    pipeline = build_pipeline(debug_view, analyse_only=multi_process)
+    roi, silhouette = pipeline.roi, pipeline.silhouette
+    # Pick the pose model from a per-frame latency budget (default: the frame
+    # period). With no budget, e.g. the benchmark profile, or when pose runs
+    # in its own process, MODEL_COMPLEXITY is used as-is.
+    latency_budget = config.get("POSE_LATENCY_BUDGET", loop_delay)
+    selector = (
+        ModelSelector(latency_budget) if latency_budget > 0 and not multi_process else None
+    )
+    metrics.gauge("pogo_pose_model_complexity", lambda: pipeline.model_complexity,
+                  "Pose model in use (0 lite, 1 full, 2 heavy).")
+    if selector is not None:
+        metrics.gauge("pogo_pose_model_step_downs_total", lambda: selector.step_downs,
+                      "Times the pose model was downgraded for blowing the latency budget.")
+    metrics.gauge("pogo_silhouette_updates_total", lambda: silhouette.updates,
+                  "Frames whose back contour was re-extracted.")
+    metrics.gauge("pogo_silhouette_reused_total", lambda: silhouette.reused,
+                  "Frames that reused the previous back contour.")
+    if roi is not None:
+        metrics.gauge("pogo_roi_crops_total", lambda: roi.crops,
+                      "Frames whose pose ran on the tracked crop.")
+        metrics.gauge("pogo_roi_fallbacks_total", lambda: roi.fallbacks,
+                      "Crops that lost the person and were redone on the full frame.")
+    # Fed from the detection loop; closed buckets are spooled after the locks are released.
+    rollups = RollupAggregator(rollup_granularities())
+    metrics.gauge("pogo_rollups_sent_total", lambda: rollups.emitted,
+                  "Closed rollup buckets queued for upload.")
 
     # Helper functions defined once.
 
@@ -364,528 +484,224 @@ def posture_detection(stream=True, debug_view=True):
         return new_thresholds
 
 
-    def duration_Analysis():
+    def duration_Analysis(dt=LOOP_DELAY):
+        # dt is the real time covered by this frame, so the temperature rises
+        # at the same rate per second whether we run at full or idle rate.
         global temperature
-        t_inc_rate = float(os.getenv("T_INC_RATE", "0.1")) * LOOP_DELAY
-        t_dec_rate = float(os.getenv("T_DEC_RATE", "0.05")) * LOOP_DELAY
-        threshold = float(os.getenv("THRESHOLD", "1.0")) * LOOP_DELAY
+        threshold = config.get("THRESHOLD", 1.0) * LOOP_DELAY
 
+        with device_id_lock:
+            current_device_id = device_id
         with posture_data_lock:
-            if posture_data["posture"]["overall"] == "BAD":
-                temperature += t_inc_rate
-            else:
-                temperature -= t_dec_rate
-
-            temperature = max(0, temperature)  # Ensure temperature doesn't go below 0
-
-            if temperature > threshold:
-                alert()
-
-    def alert():
-        print("ALERT: Bad posture detected for an extended period!")
-        # Play a pinging sound
-        duration = 0.5  # seconds
-        freq = 440  # Hz
-        os.system("play -nq -t alsa synth {} sine {}".format(duration, freq))
-        # Send a POST request to the API
-        api_url = os.getenv("API_URL")
-
-        if api_url: # optional
-            try:
-                headers = {"Content-Type": "application/json"}
-                payload = {
-                    "deviceId": device_id,
-                    "timestamp": datetime.now().isoformat(),
-                    "posture": posture_data["posture"],
+            temperature = step_temperature(
+                temperature,
+                posture_data["posture"]["overall"],
+                dt,
+                config.get("T_INC_RATE", 0.1),
+                config.get("T_DEC_RATE", 0.05),
+            )
+            posture = posture_data["posture"]
+        if alert_gate.update(current_device_id, temperature > threshold):
+            alert(current_device_id, posture)
+
+    def alert(current_device_id, posture):
+        log.warning("ALERT: Bad posture detected for an extended period!")
+        rollups.alert()
+        # Queue the ping; the audio worker plays it without blocking this thread.
+        if alert_audio is not None:
+            alert_audio.play("alert")
+        # Hand the alert to the outbox; delivery to API_URL happens off-thread.
+        if alert_outbox is not None:
+            alert_outbox.submit(
+                {
+                    "deviceId": current_device_id,
+                    "timestamp": iso_timestamp(),
+                    "posture": posture,
                     "temperature": temperature,
                 }
-                response = requests.post(api_url, headers=headers, json=payload)
-                if response.status_code == 200:
-                    print("Successfully sent alert to API")
-                else:
-                    print(
-                        f"Failed to send alert to API: {response.status_code} {response.text}"
-                    )
-            except Exception as e:
-                print(f"Error sending alert to API: {e}")
-
-    def get_midpoint(point1, point2):
-        return ((point1[0] + point2[0]) // 2, (point1[1] + point2[1]) // 2)
-
-    def draw_bold_line(frame, point1, point2, color, thickness):
-        if debug_view:
-            cv2.line(frame, point1, point2, color, thickness)
-
-    def draw_text_with_outline(frame, text, position, scale, color, thickness=2):
-        if debug_view:
-            cv2.putText(
-                frame,
-                text,
-                position,
-                cv2.FONT_HERSHEY_SIMPLEX,
-                scale,
-                (0, 0, 0),
-                thickness + 2,
-            )
-            cv2.putText(
-                frame, text, position, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness
             )
 
-    def calculate_angle(p1, p2, p3):
-        # Compute the angle at p2 between vectors p2->p1 and p2->p3.
-        v1 = np.array([p1[0] - p2[0], p1[1] - p2[1]], dtype=np.float32)
-        v2 = np.array([p3[0] - p2[0], p3[1] - p2[1]], dtype=np.float32)
-        norm1 = np.linalg.norm(v1)
-        norm2 = np.linalg.norm(v2)
-        if norm1 < 1e-6 or norm2 < 1e-6:
-            return 0
-        dot = np.dot(v1, v2)
-        angle_rad = np.arccos(np.clip(dot / (norm1 * norm2), -1.0, 1.0))
-        return np.degrees(angle_rad)
-
-    def safe_draw_and_compute_angle(frame, l1, l2, l3, color, get_coords):
-        if l1.visibility > 0.5 and l2.visibility > 0.5 and l3.visibility > 0.5:
-            p1 = get_coords(l1)
-            p2 = get_coords(l2)
-            p3 = get_coords(l3)
-            angle = calculate_angle(p1, p2, p3)
-            conf = min(l1.visibility, l2.visibility, l3.visibility)
-            if debug_view:
-                draw_bold_line(frame, p1, p2, color, 4)
-                draw_bold_line(frame, p2, p3, color, 4)
-                draw_text_with_outline(frame, f"{int(angle)}°", p2, 0.8, color)
-            print(
-                f"[DEBUG] Angle between points {p1}, {p2}, {p3}: {int(angle)}° (conf: {conf:.2f})"
+    def update_posture_data():
+        global brk
+        # Capture runs on its own thread and only ever hands us the newest frame,
+        # so analysis latency no longer accumulates with processing time.
+        if multi_process:
+            # Capture and pose inference run in their own processes and hand
+            # frames over through shared memory; this thread only analyses,
+            # classifies and publishes.
+            capture = None
+            source = MultiProcessPipeline(
+                VIDEO_SOURCE,
+                pipeline,
+                model_complexity=pipeline.model_complexity,
+                roi=bool(config.get("ROI_TRACKING", 1)),
+                period=loop_delay,
+                log_level=config.get("LOG_LEVEL", "INFO"),
             )
-            return angle, conf
-        return None, 0
-
-    def ray_segment_intersection(ray_origin, ray_direction, pt1, pt2):
-        segment_vec = pt2 - pt1
-        cross_val = np.cross(ray_direction, segment_vec)
-        if abs(cross_val) < 1e-6:
-            return None
-        diff = pt1 - ray_origin
-        t = np.cross(diff, segment_vec) / cross_val
-        s = np.cross(diff, ray_direction) / cross_val
-        if t >= 0 and 0 <= s <= 1:
-            return ray_origin + t * ray_direction, t
-        return None
-
-    def calculate_curvature_and_trust(frame, results):
-        if not results.pose_landmarks:
-            return 0, 0, frame
-
-        landmarks = results.pose_landmarks.landmark
-        h, w = frame.shape[:2]
-        # Convert landmarks to pixel coordinates once.
-        coord = lambda lm: np.array([lm.x * w, lm.y * h], dtype=np.float32)
-
-        left_shoulder = coord(landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER])
-        right_shoulder = coord(landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER])
-        left_hip = coord(landmarks[mp_pose.PoseLandmark.LEFT_HIP])
-        right_hip = coord(landmarks[mp_pose.PoseLandmark.RIGHT_HIP])
-        nose = coord(landmarks[mp_pose.PoseLandmark.NOSE])
-
-        # Compute midpoints and the central line.
-        shoulder_mid = (left_shoulder + right_shoulder) / 2
-        hip_mid = (left_hip + right_hip) / 2
-        line_a_mid = (shoulder_mid + hip_mid) / 2
-
-        # Compute a unit perpendicular vector to the line.
-        dir_vector = hip_mid - shoulder_mid
-        perpendicular_vector = np.array(
-            [-dir_vector[1], dir_vector[0]], dtype=np.float32
-        )
-        norm_perp = np.linalg.norm(perpendicular_vector)
-        perpendicular_vector /= norm_perp + 1e-6
-        if np.dot(perpendicular_vector, nose - line_a_mid) > 0:
-            perpendicular_vector *= -1
-
-        # Compute trust from the torso aspect ratio.
-        torso_width = np.linalg.norm(left_shoulder - right_shoulder)
-        torso_height = np.linalg.norm(shoulder_mid - hip_mid)
-        aspect_ratio = torso_height / (torso_width + 1e-6)
-        trust = np.clip(aspect_ratio / 2.5, 0, 1)
-
-        # Use segmentation mask to compute the back contour intersection.
-        mask = (results.segmentation_mask > 0.5).astype("uint8") * 255
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        point_a, best_t = None, np.inf
-        if contours:
-            contour = contours[0][:, 0, :].astype(np.float32)
-            num_points = len(contour)
-            for i in range(num_points):
-                pt1 = contour[i]
-                pt2 = contour[
-                    (i + 1) % num_points
-                ]  # Wrap-around for cyclic processing.
-                res = ray_segment_intersection(
-                    line_a_mid, perpendicular_vector, pt1, pt2
-                )
-                if res is not None:
-                    intersection_point, t_val = res
-                    if t_val < best_t:
-                        best_t = t_val
-                        point_a = intersection_point
-
-        if point_a is not None:
-            distance = np.linalg.norm(point_a - line_a_mid)
-            spine_length = np.linalg.norm(shoulder_mid - hip_mid)
-            neck_length = np.linalg.norm(nose - shoulder_mid)
-            body_size = spine_length + neck_length
-            curvature = distance / (body_size + 1e-6)
-        else:
-            curvature = 0
+            source.start()
 
-        # If debugging, do all the drawing using cached integer conversions.
-        if debug_view:
-            debug_frame = frame.copy()
-            if contours:
-                cv2.drawContours(debug_frame, contours, -1, (0, 255, 0), 2)
-            if point_a is not None:
-                shoulder_mid_int = tuple(shoulder_mid.astype(int))
-                hip_mid_int = tuple(hip_mid.astype(int))
-                line_a_mid_int = tuple(line_a_mid.astype(int))
-                point_a_int = tuple(point_a.astype(int))
-                cv2.line(debug_frame, shoulder_mid_int, hip_mid_int, (0, 255, 0), 2)
-                perp_end = line_a_mid + perpendicular_vector * 100
-                cv2.line(
-                    debug_frame,
-                    line_a_mid_int,
-                    tuple(perp_end.astype(int)),
-                    (255, 0, 0),
-                    2,
-                )
-                cv2.line(debug_frame, line_a_mid_int, point_a_int, (0, 165, 255), 2)
-                cv2.circle(debug_frame, point_a_int, 5, (0, 0, 255), -1)
-            cv2.putText(
-                debug_frame,
-                f"Curvature: {curvature:.2f}",
-                (10, 60),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (255, 255, 0),
-                2,
-            )
-            cv2.putText(
-                debug_frame,
-                f"Trust: {trust:.2f}",
-                (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (0, 255, 0) if trust > 0.7 else (0, 0, 255),
-                2,
-            )
+            def frames_dropped():
+                return source.stats[STAT_NO_SLOT] + source.stats[STAT_STALE]
         else:
-            debug_frame = frame
-
-        print(f"[DEBUG] Curvature: {curvature:.2f}, Trust: {trust:.2f}")
-        return curvature, trust, debug_frame
-
-    def process_posture_angles(frame, results):
-        h, w = frame.shape[:2]
-        get_coords = lambda l: (int(l.x * w), int(l.y * h))
-        angles = {
-            "neckAngle": {"value": None, "confidence": None},
-            "backAngle": {"value": None, "confidence": None},
-            "hipAngle": {"value": None, "confidence": None},
-            "armAngle": {
-                1: {"value": None, "confidence": None},
-                2: {"value": None, "confidence": None},
-            },
-            "kneeAngle": {
-                1: {"value": None, "confidence": None},
-                2: {"value": None, "confidence": None},
-            },
-        }
-        if not results.pose_landmarks:
-            return angles
-
-        if debug_view:
-            mp_drawing.draw_landmarks(
-                frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS
-            )
-        landmarks = results.pose_landmarks.landmark
-
-        # Precompute all landmark pixel coordinates to avoid repeated multiplications.
-        coords = {i: get_coords(lm) for i, lm in enumerate(landmarks)}
-
-        nose = landmarks[mp_pose.PoseLandmark.NOSE]
-        left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER]
-        right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER]
-        left_hip = landmarks[mp_pose.PoseLandmark.LEFT_HIP]
-        right_hip = landmarks[mp_pose.PoseLandmark.RIGHT_HIP]
-
-        if (
-            nose.visibility > 0.5
-            and left_shoulder.visibility > 0.5
-            and right_shoulder.visibility > 0.5
-            and left_hip.visibility > 0.5
-            and right_hip.visibility > 0.5
-        ):
-            shoulder_left_coord = get_coords(left_shoulder)
-            shoulder_right_coord = get_coords(right_shoulder)
-            hip_left_coord = get_coords(left_hip)
-            hip_right_coord = get_coords(right_hip)
-            shoulder_mid_coord = get_midpoint(shoulder_left_coord, shoulder_right_coord)
-            hip_mid_coord = get_midpoint(hip_left_coord, hip_right_coord)
-            fake_shoulder = FakeLandmark(
-                shoulder_mid_coord[0] / w,
-                shoulder_mid_coord[1] / h,  # Correct normalization for y.
-                min(left_shoulder.visibility, right_shoulder.visibility),
-            )
-            fake_hip = FakeLandmark(
-                hip_mid_coord[0] / w,
-                hip_mid_coord[1] / h,       # Correct normalization for y.
-                min(left_hip.visibility, right_hip.visibility),
-            )
-
-            angle, conf = safe_draw_and_compute_angle(
-                frame, nose, fake_shoulder, fake_hip, (0, 255, 0), get_coords
-            )
-            angles["neckAngle"]["value"] = angle
-            angles["neckAngle"]["confidence"] = conf
-
-            left_knee = landmarks[mp_pose.PoseLandmark.LEFT_KNEE]
-            right_knee = landmarks[mp_pose.PoseLandmark.RIGHT_KNEE]
-            knee_candidates = []
-            if left_knee.visibility > 0.5:
-                knee_candidates.append(("left", get_coords(left_knee), left_knee))
-            if right_knee.visibility > 0.5:
-                knee_candidates.append(("right", get_coords(right_knee), right_knee))
-            if knee_candidates:
-                chosen_knee = min(
-                    knee_candidates,
-                    key=lambda candidate: math.hypot(
-                        candidate[1][0] - hip_mid_coord[0],
-                        candidate[1][1] - hip_mid_coord[1],
-                    ),
-                )[2]
-                hip_angle, hip_conf = safe_draw_and_compute_angle(
-                    frame,
-                    fake_shoulder,
-                    fake_hip,
-                    chosen_knee,
-                    (0, 255, 255),
-                    get_coords,
-                )
-                angles["hipAngle"]["value"] = hip_angle
-                angles["hipAngle"]["confidence"] = hip_conf
-
-        # Compute Back Angle (using left-side landmarks).
-        left_knee = landmarks[mp_pose.PoseLandmark.LEFT_KNEE]
-        angle, conf = safe_draw_and_compute_angle(
-            frame, left_knee, left_hip, left_shoulder, (255, 255, 0), get_coords
-        )
-        angles["backAngle"]["value"] = angle
-        angles["backAngle"]["confidence"] = conf
-
-        # Compute Left and Right Arm Angles.
-        left_elbow = landmarks[mp_pose.PoseLandmark.LEFT_ELBOW]
-        left_wrist = landmarks[mp_pose.PoseLandmark.LEFT_WRIST]
-        angle, conf = safe_draw_and_compute_angle(
-            frame, left_shoulder, left_elbow, left_wrist, (0, 0, 255), get_coords
-        )
-        angles["armAngle"][1]["value"] = angle
-        angles["armAngle"][1]["confidence"] = conf
-
-        right_elbow = landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW]
-        right_wrist = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST]
-        angle, conf = safe_draw_and_compute_angle(
-            frame, right_shoulder, right_elbow, right_wrist, (255, 0, 255), get_coords
-        )
-        angles["armAngle"][2]["value"] = angle
-        angles["armAngle"][2]["confidence"] = conf
-
-        # Compute Knee Angles.
-        left_ankle = landmarks[mp_pose.PoseLandmark.LEFT_ANKLE]
-        angle, conf = safe_draw_and_compute_angle(
-            frame, left_hip, left_knee, left_ankle, (255, 165, 0), get_coords
-        )
-        angles["kneeAngle"][1]["value"] = angle
-        angles["kneeAngle"][1]["confidence"] = conf
-
-        right_knee = landmarks[mp_pose.PoseLandmark.RIGHT_KNEE]
-        right_ankle = landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE]
-        angle, conf = safe_draw_and_compute_angle(
-            frame, right_hip, right_knee, right_ankle, (255, 165, 0), get_coords
+            capture = open_capture(VIDEO_SOURCE, 640, 480)
+            capture.start()
+
+            def frames_dropped():
+                return capture.slot.dropped
+        metrics.gauge(
+            "pogo_capture_dropped_total",
+            frames_dropped,
+            "Captured frames replaced before the detector took them.",
         )
-        angles["kneeAngle"][2]["value"] = angle
-        angles["kneeAngle"][2]["confidence"] = conf
-
-        print(f"[DEBUG] Angle Data: {angles}")
-        return angles
-
-    def update_posture_data():
-        global smoothed_curvature, brk
-        cap = cv2.VideoCapture(VIDEO_SOURCE)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Set buffer size to 1
         display_scale = 1
 
-        while cap.isOpened() and not brk:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame = cv2.resize(frame, (640, 480))
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose.process(frame_rgb)
-
-            # #REMOVE
-            # if results.pose_landmarks:
-            #     mp_drawing.draw_landmarks(
-            #         frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS
-            #     )
-
-            # #REMOVE
-            # cv2.imshow("frame", frame)
-            # cv2.waitKey(0)
-
-            curvature, trust, debug_frame = calculate_curvature_and_trust(
-                frame, results
+        if selector is not None:
+            def next_image():
+                captured = capture.slot.take(timeout=2.0)
+                return captured.image if captured is not None else None
+
+            selector.calibrate(pipeline, next_image)
+
+        # Deadline-paced loop; on a static scene drop to the idle period and
+        # reuse the last analysis instead of running pose inference.
+        # In multi-process mode the inference process does the pacing.
+        scheduler = FrameScheduler(0.0 if multi_process else loop_delay)
+        idle_period = max(config.get("IDLE_PERIOD", 2.0), loop_delay)
+        motion_gate = (
+            MotionGate(
+                threshold=config.get("MOTION_THRESHOLD", 4.0),
+                idle_after=config.get("IDLE_AFTER", 10.0),
+                refresh_every=config.get("IDLE_REFRESH", 30.0),
             )
-            # #REMOVE
-            # cv2.imshow("frame", debug_frame)
-            # cv2.waitKey(0)
-
-            angle_data = process_posture_angles(debug_frame, results)
-
-            # #REMOVE
-            # cv2.imshow("frame", debug_frame)
-            # cv2.waitKey(0)
-
-            # Exponential smoothing of curvature.
-            if smoothed_curvature is None:
-                smoothed_curvature = curvature
-            elif curvature > 0:
-                smoothed_curvature = (
-                    alpha * curvature + (1 - alpha) * smoothed_curvature
-                )
-
-            if debug_view:
-                cv2.putText(
-                    debug_frame,
-                    f"Smoothed Curvature: {smoothed_curvature:.2f}",
-                    (10, 90),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (200, 200, 0),
-                    2,
-                )
-                if trust > 0.7 and smoothed_curvature > 0.45:
-                    cv2.putText(
-                        debug_frame,
-                        "BAD POSTURE!",
-                        (50, 80),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        1,
-                        (0, 0, 255),
-                        2,
-                    )
-
-            print(f"[DEBUG] Smoothed Curvature: {smoothed_curvature:.2f}")
-            if trust > 0.7 and smoothed_curvature > 0.45:
-                print("[DEBUG] BAD POSTURE!")
+            if profile.motion_gating and not multi_process
+            else None
+        )
+        metrics.gauge("pogo_scheduler_overruns_total", lambda: scheduler.overruns,
+                      "Frames that finished after their deadline.")
+        metrics.gauge("pogo_scheduler_period_seconds", lambda: scheduler.period,
+                      "Current target frame period.")
+        analysed = None
+        inference_skipped = 0
+        metrics.gauge("pogo_inference_skipped_total", lambda: inference_skipped,
+                      "Frames answered from the previous result on a static scene.")
+        frame_dt = loop_delay
+
+        while not brk:
+            if capture is None:
+                with metrics.time("wait_frame"):
+                    analysed = source.next_result(timeout=1.0)
+                if analysed is None:
+                    if source.finished:
+                        break
+                    continue
+                frame_start = time.perf_counter()
+                cpu_start = time.thread_time()
+                frame_seq = source.last.seq
+                frame_age = time.monotonic() - source.last.captured_at
+                metrics.observe("frame_age", frame_age)
+            else:
+                with metrics.time("wait_frame"):
+                    captured = capture.slot.take(timeout=1.0)
+                if captured is None:
+                    if capture.slot.closed:
+                        break
+                    continue
+                frame_start = time.perf_counter()
+                cpu_start = time.thread_time()
+                frame_seq = captured.seq
+                frame_age = time.monotonic() - captured.captured_at
+                metrics.observe("frame_age", frame_age)
+
+                reuse = False
+                if motion_gate is not None:
+                    with metrics.time("motion"):
+                        moving = motion_gate.update(captured.image)
+                    idle = motion_gate.idle and not moving
+                    scheduler.set_period(idle_period if idle else loop_delay)
+                    reuse = idle and analysed is not None and not motion_gate.needs_refresh()
+                if reuse:
+                    inference_skipped += 1
+                else:
+                    inference_start = time.perf_counter()
+                    analysed = pipeline.process(captured.image)
+                    if selector is not None:
+                        selector.observe(pipeline, time.perf_counter() - inference_start)
+                    if motion_gate is not None:
+                        motion_gate.refreshed()
+            trust = analysed.trust
+            smoothed_curvature = analysed.smoothed_curvature
+            debug_frame = analysed.debug_frame
 
             with posture_data_lock:
                 posture_data.update(
                     {
                         "trust": trust,
-                        "timestamp": datetime.now().isoformat(),
-                        "neckAngle": {
-                            "value": angle_data["neckAngle"]["value"] or 0,
-                            "confidence": angle_data["neckAngle"]["confidence"] or 0,
-                        },
-                        "backCurvature": {
-                            "value": smoothed_curvature,
-                            "confidence": trust,
-                        },
-                        "armAngleL": {
-                            "value": (
-                                angle_data["armAngle"][1]["value"]
-                                if angle_data["armAngle"][1]["value"] is not None
-                                else 0
-                            ),
-                            "confidence": (
-                                angle_data["armAngle"][1]["confidence"]
-                                if angle_data["armAngle"][1]["confidence"] is not None
-                                else 0
-                            ),
-                        },
-                        "armAngleR": {
-                            "value": (
-                                angle_data["armAngle"][2]["value"]
-                                if angle_data["armAngle"][2]["value"] is not None
-                                else 0
-                            ),
-                            "confidence": (
-                                angle_data["armAngle"][2]["confidence"]
-                                if angle_data["armAngle"][2]["confidence"] is not None
-                                else 0
-                            ),
-                        },
-                        "hipAngle": {
-                            "value": angle_data["hipAngle"]["value"],
-                            "confidence": angle_data["hipAngle"]["confidence"],
-                        },
-                        "kneeAngleL": {
-                            "value": (
-                                angle_data["kneeAngle"][1]["value"]
-                                if angle_data["kneeAngle"][1]["value"] is not None
-                                else 0
-                            ),
-                            "confidence": (
-                                angle_data["kneeAngle"][1]["confidence"]
-                                if angle_data["kneeAngle"][1]["confidence"] is not None
-                                else 0
-                            ),
-                        },
-                        "kneeAngleR": {
-                            "value": (
-                                angle_data["kneeAngle"][2]["value"]
-                                if angle_data["kneeAngle"][2]["value"] is not None
-                                else 0
-                            ),
-                            "confidence": (
-                                angle_data["kneeAngle"][2]["confidence"]
-                                if angle_data["kneeAngle"][2]["confidence"] is not None
-                                else 0
-                            ),
-                        },
+                        "timestamp": time.time(),
+                        **posture_metrics(analysed.angles, smoothed_curvature, trust),
                         "posture": get_posture_status(trust, smoothed_curvature),
                     }
                 )
 
-            with device_id_lock, posture_data_lock:
-                message = json.dumps(
-                    {"deviceId": device_id, "action": "update", **posture_data},
-                    default=lambda x: (
-                        float(x) if isinstance(x, (np.float32, np.float64)) else x
-                    ),
-                )
-                message_queue.put(message)
+            # Queue a snapshot; the sender serialises it for the negotiated
+            # encoding, and only if it isn't superseded first.
+            if live_stream.is_set():
+                with device_id_lock, posture_data_lock:
+                    message = {"deviceId": device_id, **posture_data}
+                    message_queue.put(message, coalesce="update")
 
-            with posture_data_lock, classification_lock:
+            with posture_data_lock, classification_lock, metrics.time("classify"):
                 classification = classify_posture_metrics_seated(posture_data)
                 posture_data["posture"] = classification
-                print("[DEBUG] Seated Posture Classification:", classification)
-
-            print("[DEBUG] Posture Data:")
-            print(f"  Timestamp: {posture_data['timestamp']}")
-            print(f"  Trust: {posture_data['trust']:.2f}")
-            print(f"  Neck Angle: {posture_data['neckAngle']}")
-            print(f"  Back Curvature: {posture_data['backCurvature']}")
-            print(f"  Arm Angle L: {posture_data['armAngleL']}")
-            print(f"  Arm Angle R: {posture_data['armAngleR']}")
-            print(f"  Hip Angle: {posture_data['hipAngle']}")
-            print(f"  Knee Angle L: {posture_data['kneeAngleL']}")
-            print(f"  Knee Angle R: {posture_data['kneeAngleR']}")
-            print(f"  Posture: {posture_data['posture']}")
-            print("------------------------------------------------------")
+                log.debug("Seated Posture Classification: %s", classification)
+                if history is not None:
+                    history.append(posture_data)
+            with device_id_lock, posture_data_lock:
+                current_device_id = device_id
+                closed = rollups.add(posture_data, time.time())
+            for message in closed:
+                queue_durable({"deviceId": current_device_id, **message})
+
+            # One summary line per frame, built only when DEBUG is enabled.
+            if log.isEnabledFor(logging.DEBUG):
+                outbound = message_queue.stats()
+                log.debug(
+                    "Posture Data: trust=%.2f neck=%s back=%s armL=%s armR=%s "
+                    "hip=%s kneeL=%s kneeR=%s posture=%s | frame #%d age %.0f ms "
+                    "dropped %d | outbound depth %d/%d coalesced %d dropped %d "
+                    "last age %.0f ms",
+                    posture_data["trust"],
+                    posture_data["neckAngle"],
+                    posture_data["backCurvature"],
+                    posture_data["armAngleL"],
+                    posture_data["armAngleR"],
+                    posture_data["hipAngle"],
+                    posture_data["kneeAngleL"],
+                    posture_data["kneeAngleR"],
+                    posture_data["posture"],
+                    frame_seq,
+                    frame_age * 1000,
+                    frames_dropped(),
+                    outbound["depth"],
+                    outbound["capacity"],
+                    outbound["coalesced"],
+                    outbound["dropped"],
+                    outbound["last_age_ms"],
+                )
 
+            calibrated = None
+            if calibration_requested.is_set():
+                calibration_requested.clear()
+                # Capture current posture data
+                with posture_data_lock:
+                    current_data = posture_data.copy()
+                # Compute new thresholds
+                calibrated = compute_new_thresholds(current_data)
+                # Apply all calibrated thresholds as one config update
+                config.update(calibrated)
+                reload_threshold_table(config.get)
+                log.info("Calibration completed. New thresholds: %s", calibrated)
+
+            display_start = time.perf_counter()
             if debug_view:
                 frame_display = cv2.resize(
                     debug_frame, None, fx=display_scale, fy=display_scale
@@ -899,55 +715,424 @@ def posture_detection(stream=True, debug_view=True):
                     (0, 0, 255),
                     2,
                 )
-                # Check for 'c' key press to calibrate
-                key = cv2.waitKey(10) & 0xFF
-                if key == ord('c'):
-                    # Capture current posture data
-                    with posture_data_lock:
-                        current_data = posture_data.copy()
-                    # Compute new thresholds
-                    new_thresholds = compute_new_thresholds(current_data)
-                    # Update environment variables
-                    for key, value in new_thresholds.items():
-                        update_env(key, str(value))
-                    print("Calibration completed. New thresholds:", new_thresholds)
+                if calibrated is not None:
                     # Display calibration message
                     cv2.putText(frame_display, "Calibration Complete!", (50, 160), 
                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                # Check for 'c' key press to calibrate (applied next frame)
+                key = cv2.waitKey(10) & 0xFF
+                if key == ord('c'):
+                    request_calibration()
                 cv2.imshow("Pose Detection", frame_display)
                 if key == ord('q'):
                     brk = True
                     break
-                
-            duration_Analysis()
-            time.sleep(LOOP_DELAY)
-
-        cap.release()
+                metrics.observe("display", time.perf_counter() - display_start)
+
+            with metrics.time("duration_analysis"):
+                duration_Analysis(frame_dt)
+            metrics.observe("frame", time.perf_counter() - frame_start)
+            metrics.frame_done(time.thread_time() - cpu_start)
+            frame_dt = scheduler.wait()
+
+        with device_id_lock:
+            current_device_id = device_id
+        for message in rollups.flush():
+            queue_durable({"deviceId": current_device_id, **message})
+        if capture is None:
+            log.info("Multi-process frame stats: %s", source.stats_dict())
+            source.stop()
+        else:
+            capture.stop()
+            capture.join(timeout=2)
         if debug_view:
             cv2.destroyAllWindows()
 
     update_posture_data()
 
 
+# ------------------ Multi-Person Detection ------------------
+def multi_person_detection(profile=PROFILES[DEFAULT_PROFILE]):
+    """Analyse everyone in view and stream one "update" per person."""
+    global brk
+    loop_delay = LOOP_DELAY if profile.loop_delay is None else profile.loop_delay
+    engine = MultiPersonEngine(
+        workers=config.get("PERSON_WORKERS", 0) or None,
+        model_complexity=config.get("MODEL_COMPLEXITY", 1),
+        t_inc_rate=config.get("T_INC_RATE", 0.1),
+        t_dec_rate=config.get("T_DEC_RATE", 0.05),
+    )
+    metrics.gauge("pogo_people", lambda: engine.people, "People currently tracked.")
+    metrics.gauge("pogo_people_tracked_total", lambda: engine.tracker.created,
+                  "Person tracks created.")
+    capture = open_capture(VIDEO_SOURCE, 640, 480)
+    capture.start()
+    scheduler = FrameScheduler(loop_delay)
+    threshold = config.get("THRESHOLD", 1.0) * LOOP_DELAY
+    frame_dt = loop_delay
+    granularities = rollup_granularities()
+    rollups = {}  # person id -> RollupAggregator, for as long as the person is tracked
+    try:
+        while not brk:
+            captured = capture.slot.take(timeout=1.0)
+            if captured is None:
+                if capture.slot.closed:
+                    break
+                continue
+            frame_start = time.perf_counter()
+            people = engine.process(captured.image, frame_dt)
+            now = time.time()
+            with device_id_lock:
+                current_device_id = device_id
+            closed = []
+            for person in people:
+                aggregator = rollups.get(person.person_id)
+                if aggregator is None:
+                    aggregator = rollups[person.person_id] = RollupAggregator(
+                        granularities, extra={"personId": person.person_id}
+                    )
+                sample = {"trust": person.trust, **person.metrics, "posture": person.classification}
+                if live_stream.is_set():
+                    message = {
+                        "action": "update",
+                        "deviceId": current_device_id,
+                        "personId": person.person_id,
+                        "timestamp": now,
+                        **sample,
+                        "temperature": person.temperature,
+                    }
+                    # Coalesce per person so one busy desk can't starve the others.
+                    message_queue.put(message, coalesce=f"update:{person.person_id}")
+                if alert_gate.update(
+                    f"{current_device_id}:{person.person_id}", person.temperature > threshold
+                ):
+                    log.warning(
+                        "Person %d: bad posture for too long (temperature %.2f)",
+                        person.person_id, person.temperature,
+                    )
+                    aggregator.alert()
+                    if alert_audio is not None:
+                        alert_audio.play("alert")
+                    if alert_outbox is not None:
+                        alert_outbox.submit(
+                            {
+                                "deviceId": current_device_id,
+                                "personId": person.person_id,
+                                "timestamp": iso_timestamp(now),
+                                "posture": person.classification,
+                                "temperature": person.temperature,
+                            }
+                        )
+                closed.extend(aggregator.add(sample, now))
+            # Close the partial buckets of people the tracker has retired.
+            for person_id in [p for p in rollups if p not in engine.tracker.tracks]:
+                closed.extend(rollups.pop(person_id).flush())
+            for message in closed:
+                queue_durable({"deviceId": current_device_id, **message})
+            log.debug(
+                "People: %s",
+                ", ".join(f"{p.person_id}={p.classification['overall']}" for p in people),
+            )
+
+            if profile.debug_view:
+                preview = cv2.resize(captured.image, FRAME_SIZE)
+                for person in people:
+                    x0, y0, x1, y1 = person.box
+                    cv2.rectangle(preview, (x0, y0), (x1, y1), (0, 255, 0), 2)
+                    cv2.putText(
+                        preview,
+                        f"#{person.person_id} {person.classification['overall']}",
+                        (x0 + 4, y0 + 20),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        0.6,
+                        (0, 0, 255),
+                        2,
+                    )
+                cv2.imshow("Pose Detection", preview)
+                if cv2.waitKey(10) & 0xFF == ord('q'):
+                    brk = True
+                    break
+
+            metrics.observe("frame", time.perf_counter() - frame_start)
+            metrics.frame_done()
+            frame_dt = scheduler.wait()
+    finally:
+        capture.stop()
+        capture.join(timeout=2)
+        engine.close()
+        with device_id_lock:
+            current_device_id = device_id
+        for aggregator in rollups.values():
+            for message in aggregator.flush():
+                queue_durable({"deviceId": current_device_id, **message})
+        if profile.debug_view:
+            cv2.destroyAllWindows()
+
+
+# ------------------ Multi-Camera Detection ------------------
+def multi_camera_detection(profile, specs):
+    """One pipeline per camera, all sharing a fixed pool of inference workers."""
+    global brk
+    default_fps = 0.0
+    if profile.loop_delay is None:
+        default_fps = 1.0 / LOOP_DELAY
+    elif profile.loop_delay > 0:
+        default_fps = 1.0 / profile.loop_delay
+    specs = [spec._replace(fps=spec.fps or default_fps) for spec in specs]
+    cameras = build_cameras(
+        specs, lambda registry: build_pipeline(profile.debug_view, registry, own_pose=False)
+    )
+    # One pose graph per inference worker, not per camera.
+    uses_pose_mask = cameras[0].pipeline.silhouette.uses_pose_mask
+    runner = MultiCameraRunner(
+        cameras,
+        workers=config.get("INFERENCE_WORKERS", 2),
+        make_pose=lambda: build_pose_graph(config.get("MODEL_COMPLEXITY", 1), uses_pose_mask),
+    )
+    runner.register_metrics(metrics)
+    threshold = config.get("THRESHOLD", 1.0) * LOOP_DELAY
+    last_result = {}
+
+    def camera_device_id(camera):
+        with device_id_lock:
+            if camera.spec.device_id:
+                return camera.spec.device_id
+            # Before the server assigns an ID, the camera name is the only stable one.
+            return f"{device_id}-{camera.name}" if device_id else camera.name
+
+    granularities = rollup_granularities()
+    rollups = {
+        camera.name: RollupAggregator(granularities, extra={"cameraId": camera.name})
+        for camera in cameras
+    }
+    log.info(
+        "Multi-camera: %s on %d inference worker(s)",
+        ", ".join(f"{c.name}={c.spec.source!r}@{c.spec.fps:g}fps" for c in cameras),
+        runner.workers,
+    )
+    runner.start()
+    try:
+        while not brk and runner.running:
+            try:
+                result = runner.results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            camera, analysed = result.camera, result.analysed
+            now = time.monotonic()
+            dt = now - last_result.get(camera.name, now - camera.period)
+            last_result[camera.name] = now
+
+            person_metrics = posture_metrics(
+                analysed.angles, analysed.smoothed_curvature, analysed.trust
+            )
+            with metrics.time("classify"):
+                classification = classify_posture_metrics_seated(person_metrics)
+            camera.temperature = step_temperature(
+                camera.temperature,
+                classification["overall"],
+                dt,
+                config.get("T_INC_RATE", 0.1),
+                config.get("T_DEC_RATE", 0.05),
+            )
+            current_device_id = camera_device_id(camera)
+            if alert_gate.update(current_device_id, camera.temperature > threshold):
+                log.warning(
+                    "Camera %s: bad posture for too long (temperature %.2f)",
+                    camera.name, camera.temperature,
+                )
+                rollups[camera.name].alert()
+                if alert_audio is not None:
+                    alert_audio.play("alert")
+                if alert_outbox is not None:
+                    alert_outbox.submit(
+                        {
+                            "deviceId": current_device_id,
+                            "cameraId": camera.name,
+                            "timestamp": iso_timestamp(),
+                            "posture": classification,
+                            "temperature": camera.temperature,
+                        }
+                    )
+            sample = {"trust": analysed.trust, **person_metrics, "posture": classification}
+            sampled_at = time.time()
+            for message in rollups[camera.name].add(sample, sampled_at):
+                queue_durable({"deviceId": current_device_id, **message})
+            if live_stream.is_set():
+                message = {
+                    "action": "update",
+                    "deviceId": current_device_id,
+                    "cameraId": camera.name,
+                    "timestamp": sampled_at,
+                    **sample,
+                    "temperature": camera.temperature,
+                }
+                message_queue.put(message, coalesce=f"update:{camera.name}")
+            metrics.frame_done()
+
+            if profile.debug_view:
+                cv2.imshow(f"Pose Detection - {camera.name}", analysed.debug_frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    brk = True
+    finally:
+        runner.stop()
+        for camera in cameras:
+            for message in rollups[camera.name].flush():
+                queue_durable({"deviceId": camera_device_id(camera), **message})
+        for camera in cameras:
+            log.info("Camera %s: %s", camera.name, camera.stats())
+        if profile.debug_view:
+            cv2.destroyAllWindows()
+
+
 # ------------------ Main Entry Point ------------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Po-Go posture detection device")
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        help=f"runtime profile (default: RUNTIME_PROFILE from .env, else {DEFAULT_PROFILE})",
+    )
+    parser.add_argument(
+        "--multi-process",
+        action="store_true",
+        help="run capture and pose inference in separate processes (default: MULTI_PROCESS from .env)",
+    )
+    parser.add_argument(
+        "--multi-person",
+        action="store_true",
+        help="track and analyse everyone in view (default: MULTI_PERSON from .env)",
+    )
+    args = parser.parse_args()
+
     load_dotenv()
-    WS_SERVER = os.getenv("WS_SERVER")
-    DEVICE_ID = os.getenv("DEVICE_ID")
+    config.load()
+    setup_logging(config.get("LOG_LEVEL", "INFO"), config.get("LOG_RATE_LIMIT", 0.0))
+    if config.get("METRICS_PORT"):
+        # Local Prometheus-style endpoint for per-stage latency and FPS.
+        serve_metrics(metrics, config.get("METRICS_PORT"))
+    reload_threshold_table(config.get)
+    if config.get("LIVE_STREAM", 0):
+        live_stream.set()
+    alert_gate.min_interval = config.get("ALERT_MIN_INTERVAL", alert_gate.min_interval)
+    if config.get("API_URL"):
+        alert_outbox = AlertOutbox(
+            config.get("API_URL"), path=config.get("ALERT_OUTBOX", "alerts_pending.json")
+        )
+        metrics.gauge("pogo_alerts_pending", lambda: len(alert_outbox),
+                      "Alerts waiting for webhook delivery.")
+        metrics.gauge("pogo_alerts_delivered_total", lambda: alert_outbox.delivered,
+                      "Alerts delivered to API_URL.")
+        metrics.gauge("pogo_alerts_failed_attempts_total", lambda: alert_outbox.failures,
+                      "Alert delivery attempts that will be retried.")
+        metrics.gauge("pogo_alerts_dropped_total", lambda: alert_outbox.dropped,
+                      "Alerts rejected by the endpoint or expired undelivered.")
+    if config.get("HISTORY_DIR", "history"):
+        history = HistoryStore(
+            config.get("HISTORY_DIR", "history"),
+            retention=config.get("HISTORY_RETENTION_DAYS", 30.0) * 86400,
+        )
+        metrics.gauge("pogo_history_records_total", lambda: history.written,
+                      "Posture samples written to the local history.")
+        metrics.gauge("pogo_history_dropped_total", lambda: history.dropped,
+                      "Posture samples lost because storage fell behind or failed.")
+        metrics.gauge("pogo_history_disk_bytes", lambda: history.disk_bytes,
+                      "Size of the local history on disk.")
+    if config.get("SPOOL_DIR", "spool"):
+        spool = DiskSpool(
+            config.get("SPOOL_DIR", "spool"),
+            max_bytes=int(config.get("SPOOL_MAX_MB", 64.0) * (1 << 20)),
+            max_age=config.get("SPOOL_MAX_AGE_HOURS", 168.0) * 3600,
+            replay_rate=config.get("SPOOL_REPLAY_RATE", 10.0),
+        )
+        metrics.gauge("pogo_spool_pending", lambda: spool.pending,
+                      "Spooled messages the server has not acknowledged.")
+        metrics.gauge("pogo_spool_bytes", lambda: spool.size_bytes,
+                      "Size of the outbound spool on disk.")
+        metrics.gauge("pogo_spool_replayed_total", lambda: spool.replayed,
+                      "Spooled messages (re)sent.")
+        metrics.gauge("pogo_spool_acked_seq", lambda: spool.acked,
+                      "Highest spool sequence number acknowledged.")
+        metrics.gauge("pogo_spool_dropped_total", lambda: spool.dropped,
+                      "Unsent messages dropped by the spool size/age limits.")
+    WS_SERVER = config.get("WS_SERVER")
+    DEVICE_ID = config.get("DEVICE_ID")
+    # Webcam index, video file, or an IP camera's MJPEG/snapshot URL.
+    VIDEO_SOURCE = config.get("VIDEO_SOURCE", VIDEO_SOURCE)
+    if isinstance(VIDEO_SOURCE, str) and VIDEO_SOURCE.isdigit():
+        VIDEO_SOURCE = int(VIDEO_SOURCE)
 
     with device_id_lock:
         device_id = DEVICE_ID
 
+    profile_name = args.profile or config.get("RUNTIME_PROFILE", DEFAULT_PROFILE)
+    if profile_name not in PROFILES:
+        log.warning("Unknown RUNTIME_PROFILE %r, using %s", profile_name, DEFAULT_PROFILE)
+        profile_name = DEFAULT_PROFILE
+    profile = PROFILES[profile_name]
+    log.info(
+        "Runtime profile: %s (debug view %s, streaming %s, loop delay %s s)",
+        profile.name,
+        "on" if profile.debug_view else "off",
+        "on" if profile.stream else "off",
+        LOOP_DELAY if profile.loop_delay is None else profile.loop_delay,
+    )
+    if profile.sound:
+        # "aplay" (default), "aplay:<alsa device>", "wav:<path>" or "null".
+        alert_audio = AudioEngine(open_sink(config.get("ALERT_SOUND", "aplay")))
+        metrics.gauge("pogo_alert_sounds_total", lambda: alert_audio.played,
+                      "Alert tones played.")
+        metrics.gauge("pogo_alert_sounds_coalesced_total", lambda: alert_audio.coalesced,
+                      "Alert tones merged into one already pending or playing.")
+    if hasattr(signal, "SIGUSR1"):
+        # `kill -USR1 <pid>` recalibrates without the preview window.
+        signal.signal(signal.SIGUSR1, request_calibration)
+
     # Start threads
-    posture_thread = threading.Thread(target=posture_detection)
-    ws_thread = threading.Thread(target=run_main_ws_func, args=(WS_SERVER,))
+    multi_process = bool(args.multi_process or config.get("MULTI_PROCESS", 0))
+    if args.multi_person or config.get("MULTI_PERSON", 0):
+        mode, detection, detection_args = "multi-person", multi_person_detection, (profile,)
+    elif config.get("CAMERAS"):
+        # e.g. CAMERAS=[{"source": 0, "device_id": "desk-1", "fps": 5}, ...]
+        mode, detection = "multi-camera", multi_camera_detection
+        detection_args = (profile, parse_cameras(config.get("CAMERAS")))
+    else:
+        mode, detection, detection_args = "single-person", posture_detection, (profile, multi_process)
+    if multi_process and mode != "single-person":
+        # Only the single-person loop can take its pose results from another process.
+        log.warning("MULTI_PROCESS is not supported in %s mode; running in one process", mode)
+    posture_thread = threading.Thread(target=detection, args=detection_args)
+    if profile.stream:
+        link = LinkManager(
+            WS_SERVER,
+            ws_session,
+            should_stop=lambda: brk,
+            ping_interval=config.get("WS_PING_INTERVAL", 10.0),
+            ping_timeout=config.get("WS_PING_TIMEOUT", 5.0),
+        )
+        link.register_metrics(metrics)
+    ws_thread = threading.Thread(target=run_main_ws_func, args=(link,))
 
     posture_thread.start()
-    ws_thread.start()
+    if profile.stream:
+        ws_thread.start()
 
     # Wait for posture detection to finish
     posture_thread.join()
     brk = True  # Signal WebSocket thread to exit
-    ws_thread.join()
-
-    print("Exiting...")
+    if profile.stream:
+        ws_thread.join()
+        log.info("Link: %s", link.stats())
+    if profile.name == "benchmark":
+        log.info("Stage timings: %s", json.dumps(metrics.summary(), indent=2))
+    config.close()  # Flush any pending threshold changes to .env
+    if alert_outbox is not None:
+        alert_outbox.close()
+    if alert_audio is not None:
+        alert_audio.close()
+    if history is not None:
+        history.close()  # Write out the last partial batch
+    if spool is not None:
+        log.info("Spool: %s", spool.stats())
+        spool.close()
+
+    log.info("Exiting...")
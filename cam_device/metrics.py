@@ -0,0 +1,215 @@
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+# Latency bucket upper bounds in seconds: 0.1 ms .. ~13 s, ~19% apart.
+# Fixed at import so every histogram is a flat list of ints.
+LATENCY_BUCKETS = tuple(round(0.0001 * 1.19 ** i, 7) for i in range(68))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """Fixed-memory latency histogram with approximate quantiles."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        with self._lock:
+            counts = list(self.counts)
+            count, peak = self.count, self.max
+        if count == 0:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                low = self.bounds[i - 1] if i > 0 else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else peak
+                # Linear interpolation inside the bucket, capped at the max seen.
+                return min(low + (high - low) * (rank - seen) / n, peak)
+            seen += n
+        return peak
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.total, self.max
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms plus frame rate and CPU accounting."""
+
+    def __init__(self):
+        self.stages = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.started = time.monotonic()
+        self._fps = 0.0
+        self._last_frame = None
+        self.frame_cpu = 0.0
+
+    def histogram(self, stage):
+        hist = self.stages.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self.stages.setdefault(stage, LatencyHistogram())
+        return hist
+
+    def time(self, stage):
+        """Context manager that records the wall time of its body under `stage`."""
+        return _StageTimer(self.histogram(stage))
+
+    def observe(self, stage, seconds):
+        self.histogram(stage).observe(seconds)
+
+    def frame_done(self, cpu_seconds=0.0):
+        now = time.monotonic()
+        if self._last_frame is not None:
+            period = now - self._last_frame
+            if period > 0:
+                # Smoothed achieved frame rate.
+                self._fps = 0.9 * self._fps + 0.1 * (1.0 / period) if self._fps else 1.0 / period
+        self._last_frame = now
+        self.frames += 1
+        self.frame_cpu += cpu_seconds
+
+    @property
+    def fps(self):
+        return self._fps
+
+    def gauge(self, name, fn, help_text="", labels=None):
+        """Register a callable sampled at scrape time, optionally as one labelled series."""
+        label_text = ",".join(f'{k}="{v}"' for k, v in sorted((labels or {}).items()))
+        self.gauges[(name, label_text)] = (fn, help_text)
+
+    def summary(self):
+        return {
+            stage: {
+                "count": hist.count,
+                "p50_ms": hist.quantile(0.5) * 1000,
+                "p95_ms": hist.quantile(0.95) * 1000,
+                "p99_ms": hist.quantile(0.99) * 1000,
+                "max_ms": hist.max * 1000,
+                "mean_ms": (hist.total / hist.count * 1000) if hist.count else 0.0,
+            }
+            for stage, hist in sorted(self.stages.items())
+        }
+
+    def render_prometheus(self):
+        lines = [
+            "# HELP pogo_stage_seconds Wall time spent in each pipeline stage.",
+            "# TYPE pogo_stage_seconds histogram",
+        ]
+        for stage, hist in sorted(self.stages.items()):
+            counts, count, total, _ = hist.snapshot()
+            cumulative = 0
+            for bound, n in zip(hist.bounds, counts):
+                cumulative += n
+                lines.append(f'pogo_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'pogo_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'pogo_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'pogo_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        lines.append("# HELP pogo_stage_quantile_seconds Approximate stage latency quantiles.")
+        lines.append("# TYPE pogo_stage_quantile_seconds gauge")
+        for stage, hist in sorted(self.stages.items()):
+            for q in QUANTILES:
+                lines.append(
+                    f'pogo_stage_quantile_seconds{{stage="{stage}",quantile="{q}"}} {hist.quantile(q):.6f}'
+                )
+        lines.append("# TYPE pogo_stage_max_seconds gauge")
+        for stage, hist in sorted(self.stages.items()):
+            lines.append(f'pogo_stage_max_seconds{{stage="{stage}"}} {hist.max:.6f}')
+
+        lines += [
+            "# TYPE pogo_frames_total counter",
+            f"pogo_frames_total {self.frames}",
+            "# TYPE pogo_fps gauge",
+            f"pogo_fps {self._fps:.3f}",
+            "# TYPE pogo_frame_cpu_seconds_total counter",
+            f"pogo_frame_cpu_seconds_total {self.frame_cpu:.6f}",
+            "# TYPE pogo_process_cpu_seconds_total counter",
+            f"pogo_process_cpu_seconds_total {time.process_time():.6f}",
+            "# TYPE pogo_uptime_seconds gauge",
+            f"pogo_uptime_seconds {time.monotonic() - self.started:.3f}",
+        ]
+        family = None
+        for (name, label_text), (fn, help_text) in sorted(self.gauges.items()):
+            try:
+                value = float(fn())
+            except Exception as e:
+                log.debug("Gauge %s{%s} failed: %s", name, label_text, e)
+                continue
+            if name != family:
+                # Labelled series of one gauge share a single HELP/TYPE header.
+                family = name
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+            series = f"{name}{{{label_text}}}" if label_text else name
+            lines.append(f"{series} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(registry, port, host="127.0.0.1"):
+    """Serve registry.render_prometheus() at http://host:port/metrics on a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            log.debug("metrics %s - " + fmt, self.address_string(), *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    log.info("Serving metrics on http://%s:%d/metrics", host, server.server_address[1])
+    return server
+
+
+# Process-wide registry shared by the capture, detection and sender stages.
+metrics = MetricsRegistry()
@@ -0,0 +1,107 @@
+import logging
+import time
+from collections import deque
+
+import numpy as np
+
+log = logging.getLogger("detection")
+
+MODEL_NAMES = {0: "lite", 1: "full", 2: "heavy"}
+
+
+class ModelSelector:
+    """Picks the most accurate pose model that fits a per-frame latency budget.
+
+    calibrate() benchmarks the complexities on the real hardware, lightest
+    first, and stops at the first one whose p90 frame time exceeds the budget.
+    At runtime observe() keeps a window of recent frame times and steps down
+    one complexity when the median stays above budget * tolerance, e.g. once
+    the SoC starts thermal throttling.
+    """
+
+    def __init__(self, budget, complexities=(0, 1, 2), window=30, tolerance=1.2,
+                 bench_seconds=2.0, bench_frames=5):
+        self.budget = budget
+        self.complexities = tuple(sorted(complexities))
+        self.tolerance = tolerance
+        self.bench_seconds = bench_seconds
+        self.bench_frames = bench_frames
+        self.current = None
+        self.benchmarks = {}
+        self.step_downs = 0
+        self._recent = deque(maxlen=window)
+
+    def _benchmark(self, pipeline, next_image):
+        # The first frame pays for graph start-up and model load; not timed.
+        image = next_image()
+        if image is None:
+            return None
+        pipeline.process(image)
+        latencies = []
+        deadline = time.monotonic() + self.bench_seconds
+        while len(latencies) < self.bench_frames or time.monotonic() < deadline:
+            image = next_image()
+            if image is None:
+                break
+            start = time.perf_counter()
+            pipeline.process(image)
+            latencies.append(time.perf_counter() - start)
+            if len(latencies) >= 2 and min(latencies) > 2 * self.budget:
+                break  # Hopelessly over budget; no need to keep measuring.
+        return float(np.percentile(latencies, 90)) if latencies else None
+
+    def calibrate(self, pipeline, next_image):
+        """Benchmark each complexity on frames from next_image() and select one."""
+        chosen = None
+        lightest = None
+        for complexity in self.complexities:
+            try:
+                pipeline.set_model_complexity(complexity)
+            except Exception as e:
+                # The lite/heavy models are fetched on first use; offline
+                # devices may not have them.
+                log.warning("Pose model %s unavailable: %s", MODEL_NAMES.get(complexity), e)
+                continue
+            p90 = self._benchmark(pipeline, next_image)
+            if p90 is None:
+                log.warning("No frames to benchmark pose model %s", MODEL_NAMES.get(complexity))
+                break
+            self.benchmarks[complexity] = p90
+            if lightest is None:
+                lightest = complexity
+            log.info(
+                "Pose model %s: p90 %.0f ms (budget %.0f ms)",
+                MODEL_NAMES.get(complexity), p90 * 1000, self.budget * 1000,
+            )
+            if p90 > self.budget:
+                break  # Heavier models will not fit either.
+            chosen = complexity
+        if chosen is None:
+            # Nothing fits: run the lightest model that loaded.
+            chosen = lightest if lightest is not None else pipeline.model_complexity
+        pipeline.set_model_complexity(chosen)
+        self.current = chosen
+        self._recent.clear()
+        log.info("Selected pose model %s", MODEL_NAMES.get(chosen))
+        return chosen
+
+    def observe(self, pipeline, seconds):
+        """Record one frame's latency; step down if the budget is blown. True if changed."""
+        self._recent.append(seconds)
+        if len(self._recent) < self._recent.maxlen:
+            return False
+        median = float(np.median(self._recent))
+        if median <= self.budget * self.tolerance:
+            return False
+        lower = [c for c in self.complexities if c < self.current]
+        if not lower:
+            return False
+        log.warning(
+            "Pose latency %.0f ms over the %.0f ms budget; stepping down to %s",
+            median * 1000, self.budget * 1000, MODEL_NAMES.get(lower[-1]),
+        )
+        pipeline.set_model_complexity(lower[-1])
+        self.current = lower[-1]
+        self.step_downs += 1
+        self._recent.clear()
+        return True
@@ -0,0 +1,239 @@
+"""Several cameras in one device process.
+
+Each camera keeps its own capture thread, PosturePipeline (ROI and curvature
+smoothing) and device ID, but inference for all of them runs on one fixed
+pool of worker threads, each with its own pose graph. A dispatcher hands the
+pool whichever camera is next in round-robin order and due under its own FPS
+target, so a busy or fast camera cannot starve the others, and both
+inference concurrency and pose-graph memory stay bounded however many
+cameras are attached.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import MetricsRegistry
+from netcam import open_capture
+
+log = logging.getLogger("multicam")
+
+CameraSpec = namedtuple("CameraSpec", ["name", "source", "device_id", "fps"])
+CameraResult = namedtuple("CameraResult", ["camera", "analysed", "captured", "latency"])
+
+
+def parse_cameras(text, default_fps=0.0):
+    """CameraSpecs from a JSON list such as
+
+        [{"source": 0, "device_id": "desk-1", "fps": 5},
+         {"source": "rtsp://cam2/stream", "device_id": "desk-2"}]
+
+    Numeric sources are webcam indices. Names default to cam0, cam1, ...
+    """
+    entries = json.loads(text)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("CAMERAS must be a non-empty JSON list")
+    specs = []
+    for i, entry in enumerate(entries):
+        source = entry["source"]
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        specs.append(
+            CameraSpec(
+                name=str(entry.get("name", f"cam{i}")),
+                source=source,
+                device_id=entry.get("device_id"),
+                fps=float(entry.get("fps", default_fps)),
+            )
+        )
+    return specs
+
+
+class Camera:
+    """Per-camera state: capture stage, pipeline, pacing and counters."""
+
+    def __init__(self, spec, pipeline):
+        self.spec = spec
+        self.name = spec.name
+        self.pipeline = pipeline
+        self.metrics = pipeline.metrics
+        self.capture = open_capture(spec.source, 640, 480)
+        self.capture.name = f"capture-{spec.name}"
+        self.period = 1.0 / spec.fps if spec.fps > 0 else 0.0
+        self.next_due = 0.0
+        self.busy = False
+        self.graph = None  # Index of the worker pose graph this camera last used
+        self.processed = 0
+        self.errors = 0
+        self.temperature = 0.0
+
+    def stats(self):
+        latency = self.metrics.histogram("camera_frame")
+        return {
+            "processed": self.processed,
+            "fps": round(self.metrics.fps, 2),
+            "dropped": self.capture.slot.dropped,
+            "errors": self.errors,
+            "p95_ms": round(latency.quantile(0.95) * 1000, 1),
+        }
+
+
+class MultiCameraRunner:
+    """Round-robin dispatch of per-camera frames onto a fixed inference pool.
+
+    Results arrive on `results` (a queue of CameraResult) for the caller to
+    publish and display from its own thread.
+
+    With `make_pose`, the cameras' pipelines are built without a pose graph
+    and the runner keeps one graph per worker instead, lending one to a
+    camera for each frame. A camera gets the graph it used last whenever that
+    one is free, so with no more cameras than workers every graph only sees
+    one stream and MediaPipe's landmark tracking carries over between frames.
+    """
+
+    def __init__(self, cameras, workers=2, make_pose=None):
+        self.cameras = list(cameras)
+        self.workers = max(1, workers)
+        self.results = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._free = threading.Semaphore(self.workers)
+        self._make_pose = make_pose
+        self._graphs = [None] * self.workers  # Built lazily on the worker that first needs one
+        self._idle_graphs = list(range(self.workers))
+        self._next = 0
+        self._stop = threading.Event()
+        # Notified by new frames, closed captures, finished frames and stop().
+        self._cond = threading.Condition()
+        for camera in self.cameras:
+            camera.capture.slot.listeners.append(self._wake)
+        self._thread = threading.Thread(target=self._dispatch, name="camera-dispatch", daemon=True)
+
+    def start(self):
+        for camera in self.cameras:
+            camera.capture.start()
+        self._thread.start()
+
+    @property
+    def running(self):
+        return not self._stop.is_set() and any(
+            not camera.capture.slot.closed for camera in self.cameras
+        )
+
+    def _pick(self, now):
+        """Next due camera with a fresh frame, in round-robin order."""
+        n = len(self.cameras)
+        for offset in range(n):
+            i = (self._next + offset) % n
+            camera = self.cameras[i]
+            if camera.busy or camera.next_due > now:
+                continue
+            captured = camera.capture.slot.take(timeout=0)
+            if captured is None:
+                continue
+            self._next = (i + 1) % n
+            return camera, captured
+        return None
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _until_due(self, now):
+        """Seconds until the next idle camera falls due, at most half a second."""
+        return min([0.5] + [c.next_due - now for c in self.cameras if not c.busy and c.next_due > now])
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            if not self._free.acquire(timeout=0.5):
+                continue
+            picked = graph = None
+            with self._cond:
+                while not self._stop.is_set() and self.running:
+                    now = time.monotonic()
+                    picked = self._pick(now)
+                    if picked is not None:
+                        break
+                    self._cond.wait(self._until_due(now))
+                if picked is not None:
+                    picked[0].busy = True
+                    graph = self._lend_graph(picked[0])
+            if picked is None:
+                self._free.release()
+                break
+            camera, captured = picked
+            # Deadline pacing per camera; a late camera restarts from now.
+            camera.next_due = max(camera.next_due + camera.period, time.monotonic())
+            self._pool.submit(self._run, camera, captured, graph)
+
+    def _lend_graph(self, camera):
+        # Called with _cond held; a free worker slot means a graph is idle too.
+        if self._make_pose is None:
+            return None
+        index = camera.graph if camera.graph in self._idle_graphs else self._idle_graphs[0]
+        self._idle_graphs.remove(index)
+        return index
+
+    def _run(self, camera, captured, graph):
+        try:
+            if graph is not None:
+                if self._graphs[graph] is None:
+                    self._graphs[graph] = self._make_pose()
+                # Only this worker holds the graph, and the camera is busy, so
+                # nothing else touches either until the frame is done.
+                camera.pipeline.pose = self._graphs[graph]
+                camera.graph = graph
+            start = time.perf_counter()
+            analysed = camera.pipeline.process(captured.image)
+            latency = time.perf_counter() - start
+            camera.metrics.observe("camera_frame", latency)
+            camera.metrics.frame_done()
+            camera.processed += 1
+            self.results.put(CameraResult(camera, analysed, captured, latency))
+        except Exception:
+            camera.errors += 1
+            log.exception("Camera %s: frame failed", camera.name)
+        finally:
+            with self._cond:
+                camera.busy = False
+                if graph is not None:
+                    self._idle_graphs.append(graph)
+                self._cond.notify_all()
+            self._free.release()
+
+    def register_metrics(self, registry):
+        for camera in self.cameras:
+            labels = {"camera": camera.name}
+            registry.gauge("pogo_camera_fps", lambda c=camera: c.metrics.fps,
+                           "Achieved analysis rate per camera.", labels)
+            registry.gauge("pogo_camera_frames_total", lambda c=camera: c.processed,
+                           "Frames analysed per camera.", labels)
+            registry.gauge("pogo_camera_dropped_total", lambda c=camera: c.capture.slot.dropped,
+                           "Captured frames replaced before analysis, per camera.", labels)
+            registry.gauge("pogo_camera_latency_p95_seconds",
+                           lambda c=camera: c.metrics.histogram("camera_frame").quantile(0.95),
+                           "95th percentile analysis latency per camera.", labels)
+
+    def stop(self):
+        self._stop.set()
+        self._wake()
+        for camera in self.cameras:
+            camera.capture.stop()
+        self._thread.join(timeout=2)
+        self._pool.shutdown(wait=True)
+        for graph in self._graphs:
+            if graph is not None:
+                graph.close()
+        for camera in self.cameras:
+            camera.capture.join(timeout=2)
+
+
+def build_cameras(specs, make_pipeline):
+    """Cameras with a fresh pipeline (and metrics registry) each.
+
+    Pass make_pose to MultiCameraRunner and build these pipelines with
+    pose=False to keep one pose graph per worker rather than per camera.
+    """
+    return [Camera(spec, make_pipeline(MetricsRegistry())) for spec in specs]
@@ -0,0 +1,295 @@
+"""Multi-person posture analysis for shared desks and meeting rooms.
+
+A person segmenter finds everyone in the frame, a greedy IoU tracker gives
+each of them a stable ID, and each person's crop is analysed by a
+PosturePipeline living in a worker process. A person always goes to the same
+worker, so their pose graph and curvature smoothing see a continuous stream;
+different people run on different cores in parallel. Classification and the
+bad-posture temperature are kept per person in the main process.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from metrics import MetricsRegistry
+from metrics import metrics as default_metrics
+from pipeline import FRAME_SIZE, PosturePipeline, posture_metrics
+from posture_rules import classify_posture_metrics_seated, step_temperature
+from segmentation import selfie_segmenter
+
+log = logging.getLogger("multiperson")
+
+PersonUpdate = namedtuple(
+    "PersonUpdate",
+    ["person_id", "box", "trust", "smoothed_curvature", "metrics", "classification", "temperature"],
+)
+
+
+def box_iou(a, b):
+    ix = min(a[2], b[2]) - max(a[0], b[0])
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class PersonDetector:
+    """Person boxes from a selfie-segmentation mask at reduced resolution."""
+
+    def __init__(self, segmenter=None, scale=0.5, min_area=0.02, padding=0.1, threshold=0.5):
+        self.segmenter = segmenter if segmenter is not None else selfie_segmenter()
+        self.scale = scale
+        self.min_area = min_area
+        self.padding = padding
+        self.threshold = threshold
+        self._small = None
+        self._small_rgb = None
+        self._binary = None
+
+    def detect(self, frame):
+        """[(x0, y0, x1, y1), ...] in frame pixels, largest first."""
+        h, w = frame.shape[:2]
+        size = (max(1, int(w * self.scale)), max(1, int(h * self.scale)))
+        if self._binary is None or self._binary.shape != (size[1], size[0]):
+            self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            self._small_rgb = np.empty_like(self._small)
+            self._binary = np.empty((size[1], size[0]), dtype=np.uint8)
+        cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2RGB, dst=self._small_rgb)
+        mask = self.segmenter.process(self._small_rgb).segmentation_mask
+        cv2.compare(mask, self.threshold, cv2.CMP_GT, dst=self._binary)
+        contours, _ = cv2.findContours(self._binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        min_pixels = self.min_area * size[0] * size[1]
+        sx, sy = w / size[0], h / size[1]
+        boxes = []
+        for contour in contours:
+            x, y, bw, bh = cv2.boundingRect(contour)
+            if bw * bh < min_pixels:
+                continue
+            pad_x, pad_y = bw * self.padding, bh * self.padding
+            boxes.append(
+                (
+                    int(max(0, (x - pad_x) * sx)),
+                    int(max(0, (y - pad_y) * sy)),
+                    int(min(w, (x + bw + pad_x) * sx)),
+                    int(min(h, (y + bh + pad_y) * sy)),
+                )
+            )
+        boxes.sort(key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
+        return boxes
+
+
+class Track:
+    __slots__ = ("id", "box", "hits", "missed")
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.hits = 1
+        self.missed = 0
+
+
+class PersonTracker:
+    """Greedy IoU matching of detections to tracks with stable integer IDs.
+
+    A track survives `max_missed` frames without a match (occlusion, a missed
+    detection) before its ID is retired. Matched boxes are smoothed so crops
+    don't jitter from frame to frame.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=10, smoothing=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.smoothing = smoothing
+        self.tracks = {}
+        self.created = 0
+        self._next_id = 1
+
+    def update(self, boxes):
+        """Match this frame's boxes; return (tracks seen this frame, retired IDs)."""
+        pairs = sorted(
+            (
+                (box_iou(track.box, box), track_id, i)
+                for track_id, track in self.tracks.items()
+                for i, box in enumerate(boxes)
+            ),
+            reverse=True,
+        )
+        matched_tracks, matched_boxes = set(), set()
+        seen = []
+        for iou, track_id, i in pairs:
+            if iou < self.iou_threshold:
+                break
+            if track_id in matched_tracks or i in matched_boxes:
+                continue
+            matched_tracks.add(track_id)
+            matched_boxes.add(i)
+            track = self.tracks[track_id]
+            a = self.smoothing
+            track.box = tuple(int(a * old + (1 - a) * new) for old, new in zip(track.box, boxes[i]))
+            track.hits += 1
+            track.missed = 0
+            seen.append(track)
+
+        for i, box in enumerate(boxes):
+            if i not in matched_boxes:
+                track = Track(self._next_id, box)
+                self._next_id += 1
+                self.created += 1
+                self.tracks[track.id] = track
+                seen.append(track)
+
+        seen_ids = {track.id for track in seen}
+        retired = []
+        for track_id, track in list(self.tracks.items()):
+            if track_id not in seen_ids:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    del self.tracks[track_id]
+                    retired.append(track_id)
+        return seen, retired
+
+
+def _person_worker(inbox, outbox, model_complexity):
+    """Worker process: one PosturePipeline per person routed to this worker."""
+    pipelines = {}
+    while True:
+        job = inbox.get()
+        if job is None:
+            break
+        person_id, seq, crop = job
+        if crop is None:
+            pipeline = pipelines.pop(person_id, None)
+            if pipeline is not None:
+                pipeline.pose.close()
+            continue
+        pipeline = pipelines.get(person_id)
+        if pipeline is None:
+            pipeline = pipelines[person_id] = PosturePipeline(
+                metrics=MetricsRegistry(), model_complexity=model_complexity, frame_size=None
+            )
+        start = time.perf_counter()
+        analysed = pipeline.process(crop)
+        outbox.put(
+            (
+                person_id,
+                seq,
+                float(analysed.trust),
+                float(analysed.smoothed_curvature or 0),
+                posture_metrics(analysed.angles, analysed.smoothed_curvature, analysed.trust),
+                time.perf_counter() - start,
+            )
+        )
+    for pipeline in pipelines.values():
+        pipeline.pose.close()
+
+
+class MultiPersonEngine:
+    """Detect, track and analyse everyone in a frame across worker processes."""
+
+    def __init__(self, workers=None, detector=None, tracker=None, metrics=None,
+                 model_complexity=1, t_inc_rate=0.1, t_dec_rate=0.05, timeout=5.0):
+        self.detector = detector if detector is not None else PersonDetector()
+        self.tracker = tracker if tracker is not None else PersonTracker()
+        self.metrics = metrics if metrics is not None else default_metrics
+        self.t_inc_rate = t_inc_rate
+        self.t_dec_rate = t_dec_rate
+        self.timeout = timeout
+        self.temperatures = {}
+        self.timeouts = 0
+        self.seq = 0
+
+        workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        # MediaPipe graphs don't survive a fork; start workers from scratch.
+        ctx = multiprocessing.get_context("spawn")
+        self._results = ctx.Queue()
+        self._inboxes = []
+        self._processes = []
+        for i in range(workers):
+            inbox = ctx.Queue()
+            process = ctx.Process(
+                target=_person_worker,
+                args=(inbox, self._results, model_complexity),
+                name=f"person-worker-{i}",
+                daemon=True,
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+
+    def _inbox(self, person_id):
+        # Sticky routing keeps a person's temporal state in one worker.
+        return self._inboxes[person_id % len(self._inboxes)]
+
+    @property
+    def people(self):
+        return len(self.tracker.tracks)
+
+    def process(self, image, dt):
+        """Analyse one frame; return a PersonUpdate per person seen in it."""
+        frame = cv2.resize(image, FRAME_SIZE)
+        with self.metrics.time("person_detect"):
+            boxes = self.detector.detect(frame)
+        tracks, retired = self.tracker.update(boxes)
+        for person_id in retired:
+            self._inbox(person_id).put((person_id, self.seq, None))
+            self.temperatures.pop(person_id, None)
+            log.info("Person %d left", person_id)
+
+        self.seq += 1
+        pending = {}
+        for track in tracks:
+            x0, y0, x1, y1 = track.box
+            if x1 - x0 < 2 or y1 - y0 < 2:
+                continue
+            self._inbox(track.id).put((track.id, self.seq, frame[y0:y1, x0:x1]))
+            pending[track.id] = track
+
+        updates = []
+        deadline = time.monotonic() + self.timeout
+        with self.metrics.time("person_collect"):
+            while pending:
+                try:
+                    person_id, seq, trust, curvature, person_metrics, elapsed = self._results.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    self.timeouts += 1
+                    log.warning("No result for people %s within %.1f s", sorted(pending), self.timeout)
+                    break
+                if seq != self.seq:
+                    continue  # Late answer for a frame we already gave up on.
+                track = pending.pop(person_id, None)
+                if track is None:
+                    continue
+                self.metrics.observe("person_pose", elapsed)
+                classification = classify_posture_metrics_seated(person_metrics)
+                temperature = step_temperature(
+                    self.temperatures.get(person_id, 0.0), classification["overall"],
+                    dt, self.t_inc_rate, self.t_dec_rate,
+                )
+                self.temperatures[person_id] = temperature
+                updates.append(
+                    PersonUpdate(
+                        person_id, track.box, trust, curvature, person_metrics,
+                        classification, temperature,
+                    )
+                )
+        return updates
+
+    def close(self):
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,227 @@
+"""Capture, pose inference and analysis/publishing as separate processes.
+
+    capture process  --FrameSlot-->  inference process  --PoseSlot-->  main process
+           ^                                                               |
+           +--------------------------- free slot ------------------------+
+
+Frames are written by cv2 straight into a SharedFrameRing slot and the pose
+graph writes its segmentation mask next to it; only slot indices, timestamps
+and a (33, 4) landmark array cross the pipes. Inference always takes the
+newest ready frame and hands stale ones straight back, so with a handful of
+slots latency stays bounded while capture, MediaPipe and the Python-heavy
+geometry/classification each get their own core and GIL.
+"""
+import logging
+import multiprocessing
+import queue
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from frame_ring import SharedFrameRing
+from geometry import landmarks_to_array
+from log_setup import setup_logging
+from metrics import MetricsRegistry
+from pipeline import PosturePipeline, array_to_landmarks, mp_pose
+from roi import RoiResults, RoiTracker
+from scheduler import FrameScheduler
+
+log = logging.getLogger("multiproc")
+
+# Descriptors passed between the processes; pixels stay in the ring.
+FrameSlot = namedtuple("FrameSlot", ["slot", "seq", "captured_at"])
+PoseSlot = namedtuple("PoseSlot", ["slot", "seq", "captured_at", "landmarks", "has_mask", "pose_seconds"])
+
+# Indices into the shared counters array.
+STAT_CAPTURED, STAT_NO_SLOT, STAT_STALE, STAT_INFERRED = range(4)
+STAT_NAMES = ("captured", "no_free_slot", "stale", "inferred")
+
+
+def _capture_main(ring_spec, source, free, ready, stop, stats):
+    ring = SharedFrameRing.attach(ring_spec)
+    h, w = ring.shape[:2]
+    scratch = np.empty(ring.shape, dtype=np.uint8)
+    cap = cv2.VideoCapture(source)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, w)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    seq = 0
+    try:
+        while cap.isOpened() and not stop.is_set():
+            try:
+                slot = free.get_nowait()
+            except queue.Empty:
+                slot = None  # Everyone is busy: keep draining the camera, drop the frame.
+            target = ring.frames[slot] if slot is not None else scratch
+            ret, image = cap.read(target)
+            if not ret:
+                if slot is not None:
+                    free.put(slot)
+                break
+            captured_at = time.monotonic()
+            stats[STAT_CAPTURED] += 1
+            if slot is None:
+                stats[STAT_NO_SLOT] += 1
+                continue
+            if image.shape != target.shape:
+                cv2.resize(image, (w, h), dst=target)
+            elif not np.shares_memory(image, target):
+                target[...] = image
+            seq += 1
+            ready.put(FrameSlot(slot, seq, captured_at))
+    finally:
+        cap.release()
+        ready.put(None)
+        ring.close()
+
+
+def _inference_main(ring_spec, options, free, ready, results, stop, stats):
+    setup_logging(options["log_level"])
+    ring = SharedFrameRing.attach(ring_spec)
+    pose = mp_pose.Pose(
+        static_image_mode=False,
+        model_complexity=options["model_complexity"],
+        enable_segmentation=options["pose_mask"],
+    )
+    pipeline = PosturePipeline(
+        pose=pose,
+        metrics=MetricsRegistry(),
+        roi=RoiTracker() if options["roi"] else None,
+        frame_size=None,
+    )
+    scheduler = FrameScheduler(options["period"])
+    landmark_buffer = np.empty((33, 4), dtype=np.float32)
+    finished = False
+    try:
+        while not finished and not stop.is_set():
+            try:
+                item = ready.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            # Only the newest frame matters; hand stale ones straight back.
+            while True:
+                try:
+                    newer = ready.get_nowait()
+                except queue.Empty:
+                    break
+                if newer is None:
+                    finished = True
+                    break
+                free.put(item.slot)
+                stats[STAT_STALE] += 1
+                item = newer
+
+            start = time.perf_counter()
+            pose_results = pipeline.detect(ring.frames[item.slot])
+            landmarks = None
+            has_mask = False
+            if pose_results.pose_landmarks:
+                landmarks = landmarks_to_array(pose_results.pose_landmarks.landmark, landmark_buffer).copy()
+                if pose_results.segmentation_mask is not None:
+                    ring.masks[item.slot][...] = pose_results.segmentation_mask
+                    has_mask = True
+            stats[STAT_INFERRED] += 1
+            results.put(
+                PoseSlot(item.slot, item.seq, item.captured_at, landmarks, has_mask,
+                         time.perf_counter() - start)
+            )
+            scheduler.wait()
+    finally:
+        results.put(None)
+        pose.close()
+        ring.close()
+
+
+class MultiProcessPipeline:
+    """Parent side: owns the ring and processes, runs analyse() on each pose result.
+
+    `analyser` is a PosturePipeline built with pose=False; it keeps the
+    curvature smoothing and silhouette state in this process.
+    """
+
+    def __init__(self, source, analyser, model_complexity=1, roi=True, period=0.0,
+                 slots=4, log_level="INFO"):
+        self.analyser = analyser
+        self.finished = False
+        self.last = None
+        ctx = multiprocessing.get_context("spawn")
+        self.ring = SharedFrameRing(slots)
+        self._free = ctx.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self._ready = ctx.Queue()
+        self._results = ctx.Queue()
+        self._stop = ctx.Event()
+        self.stats = ctx.Array("q", len(STAT_NAMES))
+        self._held = None
+        options = {
+            "model_complexity": model_complexity,
+            "pose_mask": analyser.silhouette.uses_pose_mask,
+            "roi": roi,
+            "period": period,
+            "log_level": log_level,
+        }
+        spec = self.ring.spec()
+        self._processes = [
+            ctx.Process(
+                target=_capture_main,
+                args=(spec, source, self._free, self._ready, self._stop, self.stats),
+                name="capture",
+                daemon=True,
+            ),
+            ctx.Process(
+                target=_inference_main,
+                args=(spec, options, self._free, self._ready, self._results, self._stop, self.stats),
+                name="inference",
+                daemon=True,
+            ),
+        ]
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+
+    def _release(self):
+        if self._held is not None:
+            self._free.put(self._held)
+            self._held = None
+
+    def next_result(self, timeout=1.0):
+        """FrameResult for the next inferred frame, or None on timeout/end.
+
+        The frame it refers to lives in the ring and stays valid until the
+        following call.
+        """
+        self._release()
+        try:
+            item = self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is None:
+            self.finished = True
+            return None
+        self._held = item.slot
+        self.last = item
+        self.analyser.metrics.observe("pose", item.pose_seconds)
+        if item.landmarks is None:
+            results = RoiResults(None, None)
+        else:
+            mask = self.ring.masks[item.slot] if item.has_mask else None
+            results = RoiResults(array_to_landmarks(item.landmarks), mask)
+        return self.analyser.analyse(self.ring.frames[item.slot], results, item.landmarks)
+
+    def stats_dict(self):
+        return dict(zip(STAT_NAMES, self.stats[:]))
+
+    def stop(self):
+        self._stop.set()
+        for process in self._processes:
+            process.join(timeout=3)
+            if process.is_alive():
+                process.terminate()
+        self._release()
+        self.ring.close()
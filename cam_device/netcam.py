@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+import zlib
+
+import cv2
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from capture import CaptureThread, LatestFrameSlot
+from metrics import metrics
+
+log = logging.getLogger("netcam")
+
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+# Start-of-frame markers that carry the image size (not DHT/JPG/DAC).
+SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+REDUCED_DECODE = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG's SOF header without decoding, or None."""
+    i, n = 2, len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 1 if marker == 0xFF else 2
+            continue
+        if marker in SOF_MARKERS:
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def decode_jpeg(data, size):
+    """Decode a JPEG to `size` (w, h), using libjpeg's DCT scaling when it's 2-8x larger.
+
+    Returns None if the data does not decode.
+    """
+    target_w, target_h = size
+    flag = cv2.IMREAD_COLOR
+    dims = jpeg_size(data)
+    if dims is not None:
+        for factor, reduced in REDUCED_DECODE:
+            if dims[0] // factor >= target_w and dims[1] // factor >= target_h:
+                flag = reduced
+                break
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if image is None:
+        return None
+    if image.shape[1] != target_w or image.shape[0] != target_h:
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return image
+
+
+class NetworkCaptureThread(threading.Thread):
+    """Frames from an IP camera over HTTP, published into a LatestFrameSlot.
+
+    The first response decides the mode: a multipart/x-mixed-replace body is
+    read as one persistent MJPEG stream; anything else is treated as a
+    snapshot URL and polled over a keep-alive session, fetching the next
+    snapshot while the current one is being analysed. Byte-identical frames
+    are dropped before decoding, and JPEGs decode straight to the target
+    scale.
+
+    In MJPEG mode the reader only keeps the newest raw JPEG; a decoder thread
+    always jumps to it and overwrites the slot, so frames the decoder can't
+    keep up with are never decoded, and the consumer gets a frame at most
+    one decode old rather than whatever was published before it got busy.
+    """
+
+    def __init__(self, url, width=640, height=480, slot=None, timeout=5.0,
+                 retry_delay=1.0, session=None):
+        super().__init__(name="capture", daemon=True)
+        self.url = url
+        self.size = (width, height)
+        self.slot = slot if slot is not None else LatestFrameSlot()
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.mode = None
+        self.captured = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.decode_failures = 0
+        self.read_failures = 0
+        self._last_digest = None
+        self._stop_event = threading.Event()
+        self._raw = None  # (jpeg bytes, received_at) of the newest undecoded MJPEG frame
+        self._raw_cond = threading.Condition()
+        self._decoder = None
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    with self.session.get(self.url, stream=True, timeout=self.timeout) as response:
+                        response.raise_for_status()
+                        content_type = response.headers.get("Content-Type", "")
+                        if content_type.startswith("multipart/"):
+                            self.mode = "mjpeg"
+                            self._read_stream(response)
+                        else:
+                            self.mode = "snapshot"
+                            self._publish(response.content, time.monotonic())
+                            self._poll_snapshots()
+                except requests.RequestException as e:
+                    self.read_failures += 1
+                    log.warning("Camera %s: %s; retrying in %.1f s", self.url, e, self.retry_delay)
+                    self._stop_event.wait(self.retry_delay)
+        finally:
+            self.stop()
+            if self._decoder is not None:
+                self._decoder.join(timeout=2)
+            self.session.close()
+            self.slot.close()
+
+    def _read_stream(self, response):
+        if self._decoder is None:
+            self._decoder = threading.Thread(target=self._decode_latest, name="capture-decode", daemon=True)
+            self._decoder.start()
+        buffer = bytearray()
+        for chunk in response.iter_content(chunk_size=32768):
+            if self._stop_event.is_set():
+                return
+            buffer += chunk
+            while True:
+                start = buffer.find(SOI)
+                if start < 0:
+                    del buffer[:-1]  # Keep a trailing 0xFF that may start the next SOI.
+                    break
+                end = buffer.find(EOI, start + 2)
+                if end < 0:
+                    del buffer[:start]
+                    break
+                self._offer(bytes(buffer[start:end + 2]), time.monotonic())
+                del buffer[:end + 2]
+        log.info("Camera %s: stream ended, reconnecting", self.url)
+
+    def _offer(self, data, received_at):
+        with self._raw_cond:
+            if self._raw is not None:
+                self.skipped += 1  # Superseded before the decoder got to it
+            self._raw = (data, received_at)
+            self._raw_cond.notify()
+
+    def _decode_latest(self):
+        while True:
+            with self._raw_cond:
+                self._raw_cond.wait_for(lambda: self._raw is not None or self._stop_event.is_set())
+                if self._stop_event.is_set():
+                    return
+                data, received_at = self._raw
+                self._raw = None
+            self._publish(data, received_at)
+
+    def _poll_snapshots(self):
+        while not self._stop_event.is_set():
+            # Stay exactly one snapshot ahead of the consumer.
+            if not self.slot.wait_taken(timeout=0.5):
+                continue
+            with metrics.time("net_fetch"):
+                response = self.session.get(self.url, timeout=self.timeout)
+            response.raise_for_status()
+            if not self._publish(response.content, time.monotonic()):
+                # Same picture again: give the camera a moment to produce a new one.
+                self._stop_event.wait(0.05)
+
+    def _publish(self, data, received_at):
+        digest = (len(data), zlib.crc32(data))
+        if digest == self._last_digest:
+            self.duplicates += 1
+            return False
+        self._last_digest = digest
+        with metrics.time("jpeg_decode"):
+            image = decode_jpeg(data, self.size)
+        if image is None:
+            self.decode_failures += 1
+            return False
+        self.captured += 1
+        self.slot.publish(image, received_at)
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        with self._raw_cond:
+            self._raw_cond.notify_all()
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "captured": self.captured,
+            "consumed": self.slot.consumed,
+            "dropped": self.slot.dropped,
+            "duplicates": self.duplicates,
+            "skipped": self.skipped,
+            "decode_failures": self.decode_failures,
+            "read_failures": self.read_failures,
+        }
+
+
+def open_capture(source, width=640, height=480):
+    """A capture thread for a webcam index, video path or http(s) camera URL."""
+    if isinstance(source, str) and source.startswith(("http://", "https://")):
+        return NetworkCaptureThread(source, width, height)
+    return CaptureThread(source, width, height)
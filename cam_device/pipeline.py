@@ -0,0 +1,426 @@
+import logging
+from collections import namedtuple
+
+import cv2
+import mediapipe as mp
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+from geometry import (
+    HIP_MID,
+    JOINT_SLOT,
+    JOINT_TRIPLETS,
+    LEFT_HIP,
+    LEFT_KNEE,
+    LEFT_SHOULDER,
+    NOSE,
+    NUM_LANDMARKS,
+    RIGHT_HIP,
+    RIGHT_KNEE,
+    RIGHT_SHOULDER,
+    compute_joint_angles,
+    joint_points,
+    landmarks_to_array,
+    ray_contour_intersection,
+)
+from metrics import metrics as default_metrics
+from segmentation import SilhouetteTracker
+
+log = logging.getLogger("detection")
+
+mp_pose = mp.solutions.pose
+mp_drawing = mp.solutions.drawing_utils
+
+FRAME_SIZE = (640, 480)
+
+
+def array_to_landmarks(landmark_array):
+    """Rebuild a NormalizedLandmarkList from a (33, 4) array, e.g. in another process."""
+    landmarks = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in landmark_array.tolist():
+        landmarks.landmark.add(x=x, y=y, z=z, visibility=visibility)
+    return landmarks
+
+# Everything the detection loop needs from one analysed frame.
+FrameResult = namedtuple(
+    "FrameResult",
+    ["frame", "debug_frame", "results", "curvature", "smoothed_curvature", "trust", "angles"],
+)
+
+
+def draw_bold_line(frame, point1, point2, color, thickness):
+    cv2.line(frame, point1, point2, color, thickness)
+
+
+def draw_text_with_outline(frame, text, position, scale, color, thickness=2):
+    cv2.putText(
+        frame,
+        text,
+        position,
+        cv2.FONT_HERSHEY_SIMPLEX,
+        scale,
+        (0, 0, 0),
+        thickness + 2,
+    )
+    cv2.putText(
+        frame, text, position, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness
+    )
+
+
+def draw_joint_angle(frame, points, triplet, angle, color):
+    p1, p2, p3 = (tuple(int(v) for v in points[i, :2]) for i in triplet)
+    draw_bold_line(frame, p1, p2, color, 4)
+    draw_bold_line(frame, p2, p3, color, 4)
+    draw_text_with_outline(frame, f"{int(angle)}°", p2, 0.8, color)
+
+
+def _metric(entry, zero_missing=True):
+    value, conf = entry["value"], entry["confidence"]
+    if zero_missing:
+        value = value if value is not None else 0
+        conf = conf if conf is not None else 0
+    return {"value": value, "confidence": conf}
+
+
+def posture_metrics(angle_data, smoothed_curvature, trust):
+    """The seven metric entries of a posture update, in the wire/classifier shape."""
+    return {
+        "neckAngle": {
+            "value": angle_data["neckAngle"]["value"] or 0,
+            "confidence": angle_data["neckAngle"]["confidence"] or 0,
+        },
+        "backCurvature": {
+            "value": smoothed_curvature,
+            "confidence": trust,
+        },
+        "armAngleL": _metric(angle_data["armAngle"][1]),
+        "armAngleR": _metric(angle_data["armAngle"][2]),
+        # Hip keeps None so the classifier can tell "not measured" apart.
+        "hipAngle": _metric(angle_data["hipAngle"], zero_missing=False),
+        "kneeAngleL": _metric(angle_data["kneeAngle"][1]),
+        "kneeAngleR": _metric(angle_data["kneeAngle"][2]),
+    }
+
+
+def build_pose_graph(model_complexity=1, segmentation=False):
+    """A video-mode MediaPipe Pose graph, segmenting only when asked to."""
+    return mp_pose.Pose(
+        static_image_mode=False,
+        model_complexity=model_complexity,
+        enable_segmentation=segmentation,
+    )
+
+
+class PosturePipeline:
+    """pose.process -> curvature -> joint angles for one camera stream.
+
+    Holds the MediaPipe Pose graph and the curvature smoothing state, so the
+    live loop, the replay harness and any additional streams can each run
+    their own instance.
+    """
+
+    def __init__(self, pose=None, debug_view=False, alpha=0.1, metrics=None, roi=None,
+                 silhouette=None, model_complexity=1, frame_size=FRAME_SIZE):
+        # Source of the back contours; the pose graph only segments when the
+        # silhouette takes its mask from there rather than a separate model.
+        self.silhouette = silhouette if silhouette is not None else SilhouetteTracker()
+        self.model_complexity = model_complexity
+        # None analyses images at their own size (e.g. per-person crops).
+        self.frame_size = frame_size
+        # pose=False builds no graph: only analyse() is used, with pose run elsewhere.
+        if pose is None:
+            pose = self._build_pose(model_complexity)
+        self.pose = pose or None
+        self.debug_view = debug_view
+        self.alpha = alpha
+        self.metrics = metrics if metrics is not None else default_metrics
+        # Optional RoiTracker: run pose on a crop around the previous landmarks.
+        self.roi = roi
+        self.smoothed_curvature = None
+        self.landmark_buffer = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+
+    def process(self, image):
+        timer = self.metrics
+        if self.frame_size is None:
+            frame = image
+        else:
+            with timer.time("resize"):
+                frame = cv2.resize(image, self.frame_size)
+        results = self.detect(frame)
+        return self.analyse(frame, results)
+
+    def analyse(self, frame, results, landmark_array=None):
+        """Curvature, angles and smoothing for a frame whose pose is already known."""
+        timer = self.metrics
+        # Convert the 33 landmarks once and share them between stages.
+        if landmark_array is None and results.pose_landmarks:
+            landmark_array = landmarks_to_array(
+                results.pose_landmarks.landmark, self.landmark_buffer
+            )
+        with timer.time("curvature"):
+            curvature, trust, debug_frame = self.calculate_curvature_and_trust(
+                frame, results, landmark_array
+            )
+        with timer.time("angles"):
+            angle_data = self.process_posture_angles(debug_frame, results, landmark_array)
+
+        # Exponential smoothing of curvature.
+        if self.smoothed_curvature is None:
+            self.smoothed_curvature = curvature
+        elif curvature > 0:
+            self.smoothed_curvature = (
+                self.alpha * curvature + (1 - self.alpha) * self.smoothed_curvature
+            )
+        smoothed_curvature = self.smoothed_curvature
+
+        if self.debug_view:
+            cv2.putText(
+                debug_frame,
+                f"Smoothed Curvature: {smoothed_curvature:.2f}",
+                (10, 90),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.7,
+                (200, 200, 0),
+                2,
+            )
+            if trust > 0.7 and smoothed_curvature > 0.45:
+                cv2.putText(
+                    debug_frame,
+                    "BAD POSTURE!",
+                    (50, 80),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    1,
+                    (0, 0, 255),
+                    2,
+                )
+
+        log.debug("Smoothed Curvature: %.2f", smoothed_curvature)
+        if trust > 0.7 and smoothed_curvature > 0.45:
+            log.debug("BAD POSTURE!")
+
+        return FrameResult(
+            frame, debug_frame, results, curvature, smoothed_curvature, trust, angle_data
+        )
+
+    def _build_pose(self, model_complexity):
+        return build_pose_graph(model_complexity, self.silhouette.uses_pose_mask)
+
+    def set_model_complexity(self, model_complexity):
+        """Swap the pose graph for one of another complexity (0 lite, 1 full, 2 heavy)."""
+        if model_complexity == self.model_complexity:
+            return
+        pose = self._build_pose(model_complexity)
+        self.pose.close()
+        self.pose = pose
+        self.model_complexity = model_complexity
+        # Tracked crops and contours came from the old graph's landmarks.
+        if self.roi is not None:
+            self.roi.reset()
+        self.silhouette.reset()
+
+    def _pose_full_frame(self, frame):
+        with self.metrics.time("cvt_color"):
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with self.metrics.time("pose"):
+            return self.pose.process(frame_rgb)
+
+    def detect(self, frame):
+        """Pose (and segmentation) for one frame, in full-frame coordinates.
+
+        With an ROI tracker, pose runs on the crop around the previous frame's
+        landmarks and falls back to the full frame when the crop loses the person.
+        """
+        roi = self.roi
+        if roi is None:
+            return self._pose_full_frame(frame)
+
+        results = None
+        if roi.box is not None:
+            x0, y0, x1, y1 = roi.box
+            with self.metrics.time("cvt_color"):
+                crop_rgb = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+            with self.metrics.time("pose_roi"):
+                crop_results = self.pose.process(crop_rgb)
+            if roi.accept(crop_results):
+                roi.crops += 1
+                results = roi.to_full_frame(crop_results, frame.shape)
+            else:
+                roi.fallbacks += 1
+                log.debug("ROI %s lost the person; retrying on the full frame", roi.box)
+        if results is None:
+            results = self._pose_full_frame(frame)
+        roi.update(results, frame.shape)
+        return results
+
+    def calculate_curvature_and_trust(self, frame, results, landmark_array=None):
+        if not results.pose_landmarks:
+            return 0, 0, frame
+
+        if landmark_array is None:
+            landmark_array = landmarks_to_array(results.pose_landmarks.landmark)
+        h, w = frame.shape[:2]
+        # Convert landmarks to pixel coordinates once.
+        pixels = landmark_array[:, :2] * np.array([w, h], dtype=np.float32)
+
+        left_shoulder = pixels[LEFT_SHOULDER]
+        right_shoulder = pixels[RIGHT_SHOULDER]
+        left_hip = pixels[LEFT_HIP]
+        right_hip = pixels[RIGHT_HIP]
+        nose = pixels[NOSE]
+
+        # Compute midpoints and the central line.
+        shoulder_mid = (left_shoulder + right_shoulder) / 2
+        hip_mid = (left_hip + right_hip) / 2
+        line_a_mid = (shoulder_mid + hip_mid) / 2
+
+        # Compute a unit perpendicular vector to the line.
+        dir_vector = hip_mid - shoulder_mid
+        perpendicular_vector = np.array(
+            [-dir_vector[1], dir_vector[0]], dtype=np.float32
+        )
+        norm_perp = np.linalg.norm(perpendicular_vector)
+        perpendicular_vector /= norm_perp + 1e-6
+        if np.dot(perpendicular_vector, nose - line_a_mid) > 0:
+            perpendicular_vector *= -1
+
+        # Compute trust from the torso aspect ratio.
+        torso_width = np.linalg.norm(left_shoulder - right_shoulder)
+        torso_height = np.linalg.norm(shoulder_mid - hip_mid)
+        aspect_ratio = torso_height / (torso_width + 1e-6)
+        trust = np.clip(aspect_ratio / 2.5, 0, 1)
+
+        # Use the person silhouette to compute the back contour intersection.
+        with self.metrics.time("segmentation"):
+            contours = self.silhouette.contours(frame, results, landmark_array)
+        # Test the perpendicular ray against every contour edge in one batch.
+        point_a, best_t = ray_contour_intersection(
+            line_a_mid, perpendicular_vector, contours
+        )
+
+        if point_a is not None:
+            distance = np.linalg.norm(point_a - line_a_mid)
+            spine_length = np.linalg.norm(shoulder_mid - hip_mid)
+            neck_length = np.linalg.norm(nose - shoulder_mid)
+            body_size = spine_length + neck_length
+            curvature = distance / (body_size + 1e-6)
+        else:
+            curvature = 0
+
+        # If debugging, do all the drawing using cached integer conversions.
+        if self.debug_view:
+            debug_frame = frame.copy()
+            if contours:
+                cv2.drawContours(
+                    debug_frame,
+                    [c.astype(np.int32, copy=False) for c in contours],
+                    -1,
+                    (0, 255, 0),
+                    2,
+                )
+            if point_a is not None:
+                shoulder_mid_int = tuple(shoulder_mid.astype(int))
+                hip_mid_int = tuple(hip_mid.astype(int))
+                line_a_mid_int = tuple(line_a_mid.astype(int))
+                point_a_int = tuple(point_a.astype(int))
+                cv2.line(debug_frame, shoulder_mid_int, hip_mid_int, (0, 255, 0), 2)
+                perp_end = line_a_mid + perpendicular_vector * 100
+                cv2.line(
+                    debug_frame,
+                    line_a_mid_int,
+                    tuple(perp_end.astype(int)),
+                    (255, 0, 0),
+                    2,
+                )
+                cv2.line(debug_frame, line_a_mid_int, point_a_int, (0, 165, 255), 2)
+                cv2.circle(debug_frame, point_a_int, 5, (0, 0, 255), -1)
+            cv2.putText(
+                debug_frame,
+                f"Curvature: {curvature:.2f}",
+                (10, 60),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.7,
+                (255, 255, 0),
+                2,
+            )
+            cv2.putText(
+                debug_frame,
+                f"Trust: {trust:.2f}",
+                (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.7,
+                (0, 255, 0) if trust > 0.7 else (0, 0, 255),
+                2,
+            )
+        else:
+            debug_frame = frame
+
+        log.debug("Curvature: %.2f, Trust: %.2f", curvature, trust)
+        return curvature, trust, debug_frame
+
+    def process_posture_angles(self, frame, results, landmark_array=None):
+        angles = {
+            "neckAngle": {"value": None, "confidence": None},
+            "backAngle": {"value": None, "confidence": None},
+            "hipAngle": {"value": None, "confidence": None},
+            "armAngle": {
+                1: {"value": None, "confidence": None},
+                2: {"value": None, "confidence": None},
+            },
+            "kneeAngle": {
+                1: {"value": None, "confidence": None},
+                2: {"value": None, "confidence": None},
+            },
+        }
+        if not results.pose_landmarks:
+            return angles
+
+        if self.debug_view:
+            mp_drawing.draw_landmarks(
+                frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS
+            )
+        if landmark_array is None:
+            landmark_array = landmarks_to_array(results.pose_landmarks.landmark)
+
+        h, w = frame.shape[:2]
+        points = joint_points(landmark_array, w, h)
+        values, confs, valid = compute_joint_angles(points)
+
+        # The hip angle is measured towards whichever visible knee is nearest
+        # the hip midpoint, and only when the whole neck chain is visible.
+        hip_candidates = [
+            (slot, knee)
+            for slot, knee in (
+                (JOINT_SLOT["hipAngleL"], LEFT_KNEE),
+                (JOINT_SLOT["hipAngleR"], RIGHT_KNEE),
+            )
+            if valid[JOINT_SLOT["neckAngle"]] and valid[slot]
+        ]
+        valid[JOINT_SLOT["hipAngleL"]] = valid[JOINT_SLOT["hipAngleR"]] = False
+        if hip_candidates:
+            hip_slot, _ = min(
+                hip_candidates,
+                key=lambda c: np.linalg.norm(points[c[1], :2] - points[HIP_MID, :2]),
+            )
+            valid[hip_slot] = True
+
+        targets = {
+            "neckAngle": angles["neckAngle"],
+            "hipAngleL": angles["hipAngle"],
+            "hipAngleR": angles["hipAngle"],
+            "backAngle": angles["backAngle"],
+            "armAngleL": angles["armAngle"][1],
+            "armAngleR": angles["armAngle"][2],
+            "kneeAngleL": angles["kneeAngle"][1],
+            "kneeAngleR": angles["kneeAngle"][2],
+        }
+        for slot in np.flatnonzero(valid):
+            name, triplet, color = JOINT_TRIPLETS[slot]
+            angle, conf = float(values[slot]), float(confs[slot])
+            targets[name]["value"] = angle
+            targets[name]["confidence"] = conf
+            if self.debug_view:
+                draw_joint_angle(frame, points, triplet, angle, color)
+            log.debug("%s: %d° (conf: %.2f)", name, angle, conf)
+
+        log.debug("Angle Data: %s", angles)
+        return angles
@@ -0,0 +1,175 @@
+import math
+import os
+from collections import namedtuple
+
+# ISO11226 based thresholds for seated posture, keyed by their .env names.
+THRESHOLD_DEFAULTS = {
+    "TRUNK_ACCEPTABLE_THRESHOLD": 0.15,
+    "TRUNK_WARNING_THRESHOLD": 0.30,
+    "NECK_DEVIATION_ACCEPTABLE": 5.0,
+    "NECK_DEVIATION_WARNING": 15.0,
+    "ARM_ACCEPTABLE_MIN": 80.0,
+    "ARM_ACCEPTABLE_MAX": 110.0,
+    "ARM_WARNING_LOWER": 70.0,
+    "ARM_WARNING_UPPER": 120.0,
+    "HIP_ACCEPTABLE_MIN": 80.0,
+    "HIP_ACCEPTABLE_MAX": 100.0,
+    "HIP_WARNING_LOWER": 70.0,
+    "HIP_WARNING_UPPER": 110.0,
+    "KNEE_ACCEPTABLE_MIN": 90.0,
+    "KNEE_ACCEPTABLE_MAX": 135.0,
+    "KNEE_WARNING_LOWER": 85.0,
+    "KNEE_WARNING_UPPER": 140.0,
+}
+
+SEGMENTS = ("trunk", "neck", "arm_left", "arm_right", "hip", "knee")
+MIN_CONFIDENCE = 0.5
+
+# [low, high] when closed, [low, high) otherwise.
+Band = namedtuple("Band", ["low", "high", "closed"])
+
+# One compiled rule per segment. `metrics` are averaged; `reference` (when set)
+# turns the value into an absolute deviation from that angle first.
+SegmentRule = namedtuple(
+    "SegmentRule", ["segment", "metrics", "reference", "acceptable", "warning", "weight"]
+)
+
+
+def band_contains(band, value):
+    if value < band.low:
+        return False
+    return value <= band.high if band.closed else value < band.high
+
+
+def compile_threshold_table(get=os.getenv):
+    """Parse the threshold keys once into an immutable tuple of SegmentRules.
+
+    `get` is any key -> string-or-None lookup (os.getenv, dict.get, ...).
+    """
+    t = {}
+    for key, default in THRESHOLD_DEFAULTS.items():
+        raw = get(key)
+        t[key] = default if raw in (None, "") else float(raw)
+
+    def band_rule(segment, metrics, prefix):
+        return SegmentRule(
+            segment,
+            metrics,
+            None,
+            Band(t[f"{prefix}_ACCEPTABLE_MIN"], t[f"{prefix}_ACCEPTABLE_MAX"], True),
+            Band(t[f"{prefix}_WARNING_LOWER"], t[f"{prefix}_WARNING_UPPER"], True),
+            1.0,
+        )
+
+    return (
+        SegmentRule(
+            "trunk",
+            ("backCurvature",),
+            None,
+            Band(-math.inf, t["TRUNK_ACCEPTABLE_THRESHOLD"], False),
+            Band(-math.inf, t["TRUNK_WARNING_THRESHOLD"], True),
+            1.0,
+        ),
+        SegmentRule(
+            "neck",
+            ("neckAngle",),
+            180.0,
+            Band(-math.inf, t["NECK_DEVIATION_ACCEPTABLE"], False),
+            Band(-math.inf, t["NECK_DEVIATION_WARNING"], False),
+            1.0,
+        ),
+        band_rule("arm_left", ("armAngleL",), "ARM"),
+        band_rule("arm_right", ("armAngleR",), "ARM"),
+        band_rule("hip", ("hipAngle",), "HIP"),
+        band_rule("knee", ("kneeAngleL", "kneeAngleR"), "KNEE"),
+    )
+
+
+# The active table is replaced wholesale, never mutated, so a classifier that
+# grabbed a reference always sees one consistent set of thresholds.
+_active_table = compile_threshold_table(dict().get)
+
+
+def install_threshold_table(table):
+    global _active_table
+    _active_table = table
+
+
+def active_threshold_table():
+    return _active_table
+
+
+def reload_threshold_table(get=os.getenv):
+    table = compile_threshold_table(get)
+    install_threshold_table(table)
+    return table
+
+
+def classify_segment(rule, metrics):
+    total = 0.0
+    for key in rule.metrics:
+        data = metrics.get(key, {})
+        value = data.get("value", 0)
+        conf = data.get("confidence", 0)
+        if value is None or conf is None or conf < MIN_CONFIDENCE:
+            return "unknown"
+        total += value
+    value = total / len(rule.metrics)
+    if rule.reference is not None:
+        value = abs(value - rule.reference)
+
+    if band_contains(rule.acceptable, value):
+        return "acceptable"
+    if band_contains(rule.warning, value):
+        return "warning"
+    return "not recommended"
+
+
+# ISO11226 based classification for seated posture
+def classify_posture_metrics_seated(metrics, table=None):
+    if table is None:
+        table = _active_table
+
+    classification = {}
+    known_weight = 0.0
+    acceptable_weight = 0.0
+    any_warning = False
+    for rule in table:
+        status = classify_segment(rule, metrics)
+        classification[rule.segment] = status
+        if status == "unknown":
+            continue
+        known_weight += rule.weight
+        if status == "acceptable":
+            acceptable_weight += rule.weight
+        elif status == "warning":
+            any_warning = True
+
+    if known_weight == 0:
+        overall = "unknown"
+    elif any_warning:
+        overall = "WARNING"
+    elif acceptable_weight > known_weight / 2:
+        overall = "GOOD"
+    else:
+        overall = "MEH"
+
+    classification["overall"] = overall
+    return classification
+
+
+# Overall classifications that count as bad posture for alerting. The seated
+# classifier tops out at WARNING; BAD is kept for stricter classifiers.
+BAD_OVERALL = ("WARNING", "BAD")
+
+
+def is_bad(overall):
+    """Whether an overall classification heats up the bad-posture temperature."""
+    return overall in BAD_OVERALL
+
+
+def step_temperature(temperature, overall, dt, inc_rate, dec_rate):
+    """Temperature after dt seconds in `overall` posture; rates are per second."""
+    if is_bad(overall):
+        return temperature + inc_rate * dt
+    return max(0.0, temperature - dec_rate * dt)
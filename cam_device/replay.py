@@ -0,0 +1,222 @@
+"""Replay recorded footage through the posture pipeline and report on it.
+
+Feeds a video file or a directory of images through the same
+pose -> curvature -> angles -> classification path as the live device,
+headless, and writes a JSON report with throughput, per-stage timings and the
+per-frame classification sequence.
+
+    python replay.py session.mp4 --report report.json
+    python replay.py frames/ --fps 10 --realtime
+    python replay.py session.mp4 --write-golden golden.json
+    python replay.py session.mp4 --golden golden.json   # exit 1 on mismatch
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+
+import cv2
+from dotenv import dotenv_values
+
+from log_setup import setup_logging
+from metrics import MetricsRegistry
+from pipeline import PosturePipeline, posture_metrics
+from posture_rules import SEGMENTS, classify_posture_metrics_seated, compile_threshold_table
+from roi import RoiTracker
+from segmentation import SEGMENT_EVERY_DEFAULT, SEGMENT_SCALE_DEFAULT, SEGMENTER_DEFAULT, silhouette_from_config
+
+log = logging.getLogger("replay")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def video_frames(path):
+    """Yield (index, timestamp_seconds, image) for every frame of a video."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open video {path}")
+    try:
+        index = 0
+        while True:
+            ret, image = cap.read()
+            if not ret:
+                break
+            yield index, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, image
+            index += 1
+    finally:
+        cap.release()
+
+
+def image_frames(directory, fps):
+    """Yield (index, timestamp_seconds, image) for sorted images in a directory."""
+    paths = sorted(
+        p
+        for p in glob.glob(os.path.join(directory, "*"))
+        if p.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        raise SystemExit(f"No images found in {directory}")
+    for index, path in enumerate(paths):
+        image = cv2.imread(path)
+        if image is None:
+            log.warning("Skipping unreadable image %s", path)
+            continue
+        yield index, index / fps, image
+
+
+def open_source(source, fps):
+    if os.path.isdir(source):
+        return image_frames(source, fps)
+    return video_frames(source)
+
+
+def replay(frames, pipeline, table, realtime=False, max_frames=None):
+    """Run frames through the pipeline; return (sequence, wall_seconds)."""
+    sequence = []
+    started = time.monotonic()
+    first_ts = None
+    for index, timestamp, image in frames:
+        if max_frames is not None and len(sequence) >= max_frames:
+            break
+        if realtime:
+            # Pace to the recorded timestamps instead of running flat out.
+            if first_ts is None:
+                first_ts = timestamp
+            delay = (timestamp - first_ts) - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        analysed = pipeline.process(image)
+        metrics = posture_metrics(analysed.angles, analysed.smoothed_curvature, analysed.trust)
+        with pipeline.metrics.time("classify"):
+            classification = classify_posture_metrics_seated(metrics, table)
+        pipeline.metrics.frame_done()
+
+        sequence.append(
+            {
+                "frame": index,
+                "t": round(timestamp, 3),
+                "trust": round(float(analysed.trust), 4),
+                "curvature": round(float(analysed.smoothed_curvature or 0), 4),
+                "overall": classification["overall"],
+                "segments": [classification[seg] for seg in SEGMENTS],
+            }
+        )
+    return sequence, time.monotonic() - started
+
+
+def compare_golden(sequence, golden):
+    """Frames whose classification differs from a stored golden run."""
+    expected = {entry["frame"]: entry for entry in golden["sequence"]}
+    mismatches = []
+    for entry in sequence:
+        ref = expected.get(entry["frame"])
+        if ref is None:
+            continue
+        if ref["overall"] != entry["overall"] or ref["segments"] != entry["segments"]:
+            mismatches.append({"frame": entry["frame"], "expected": ref, "actual": entry})
+    missing = len(expected) - len({e["frame"] for e in sequence} & expected.keys())
+    return mismatches, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("--fps", type=float, default=10.0, help="frame rate assumed for image directories")
+    parser.add_argument("--realtime", action="store_true", help="pace frames at their recorded timestamps")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--env", help=".env file to take thresholds, ROI_TRACKING, MODEL_COMPLEXITY and "
+                        "SEGMENT_* settings from "
+                        "(default: built-in defaults)")
+    parser.add_argument("--report", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--golden", help="compare the classification sequence against this report")
+    parser.add_argument("--write-golden", help="save this run as a golden report")
+    parser.add_argument("--roi", action=argparse.BooleanOptionalAction,
+                        help="run pose on a crop tracked from the previous landmarks (default: .env or on)")
+    parser.add_argument("--segmenter", choices=("pose", "selfie"),
+                        help=f"where the curvature silhouette comes from (default: .env or {SEGMENTER_DEFAULT})")
+    parser.add_argument("--segment-every", type=int,
+                        help=f"re-extract the silhouette every N frames (default: .env or {SEGMENT_EVERY_DEFAULT})")
+    parser.add_argument("--segment-scale", type=float,
+                        help=f"resolution scale for the contour search (default: .env or {SEGMENT_SCALE_DEFAULT})")
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2),
+                        help="pose model: 0 lite, 1 full, 2 heavy (default: .env or 1)")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    setup_logging(args.log_level)
+    env = dotenv_values(args.env) if args.env else {}
+    table = compile_threshold_table(env.get)
+
+    registry = MetricsRegistry()
+    # Flags override the .env, which overrides the device defaults.
+    overrides = {"SEGMENTER": args.segmenter, "SEGMENT_EVERY": args.segment_every,
+                 "SEGMENT_SCALE": args.segment_scale, "ROI_TRACKING": args.roi,
+                 "MODEL_COMPLEXITY": args.model_complexity}
+    settings = {**env, **{key: value for key, value in overrides.items() if value is not None}}
+    roi = RoiTracker() if int(settings.get("ROI_TRACKING", 1)) else None
+    model_complexity = int(settings.get("MODEL_COMPLEXITY", 1))
+    silhouette = silhouette_from_config(settings.get)
+    pipeline = PosturePipeline(
+        debug_view=False,
+        metrics=registry,
+        roi=roi,
+        silhouette=silhouette,
+        model_complexity=model_complexity,
+    )
+    frames = open_source(args.source, args.fps)
+    sequence, wall = replay(frames, pipeline, table, args.realtime, args.max_frames)
+
+    counts = {}
+    for entry in sequence:
+        counts[entry["overall"]] = counts.get(entry["overall"], 0) + 1
+    report = {
+        "source": args.source,
+        "mode": "realtime" if args.realtime else "max",
+        "frames": len(sequence),
+        "wall_seconds": round(wall, 3),
+        "throughput_fps": round(len(sequence) / wall, 2) if wall > 0 else 0.0,
+        "model_complexity": model_complexity,
+        "stages": registry.summary(),
+        "roi": {"crops": roi.crops, "fallbacks": roi.fallbacks} if roi else None,
+        "silhouette": {"updates": silhouette.updates, "reused": silhouette.reused},
+        "overall_counts": counts,
+        "sequence": sequence,
+    }
+
+    status = 0
+    if args.golden:
+        with open(args.golden) as file:
+            golden = json.load(file)
+        mismatches, missing = compare_golden(sequence, golden)
+        report["golden"] = {
+            "file": args.golden,
+            "mismatches": len(mismatches),
+            "missing_frames": missing,
+            "first_mismatches": mismatches[:10],
+        }
+        if mismatches or missing:
+            status = 1
+
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+    if args.write_golden:
+        with open(args.write_golden, "w") as file:
+            file.write(text)
+
+    print(
+        f"{len(sequence)} frames in {wall:.2f} s ({report['throughput_fps']} fps)",
+        file=sys.stderr,
+    )
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+from collections import namedtuple
+
+import numpy as np
+
+from geometry import LEFT_HIP, LEFT_SHOULDER, NOSE, RIGHT_HIP, RIGHT_SHOULDER
+
+# Stand-in for MediaPipe's SolutionOutputs after mapping a crop back to the
+# full frame; only the fields the posture stages read.
+RoiResults = namedtuple("RoiResults", ["pose_landmarks", "segmentation_mask"])
+
+# Landmarks that must stay inside the crop for it to be trusted.
+ANCHOR_LANDMARKS = (NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP)
+
+
+class RoiTracker:
+    """Tracks a padded box around the user from the previous frame's landmarks.
+
+    The box only moves when the person approaches its edge or shrinks well
+    inside it, so the pose graph sees a stable crop from frame to frame.
+    Returns None (full-frame detection) until a confident pose has been seen,
+    and again whenever the crop loses the person.
+    """
+
+    def __init__(self, padding=0.2, min_fraction=0.35, edge_margin=0.03, min_visibility=0.5):
+        self.padding = padding
+        self.min_fraction = min_fraction
+        self.edge_margin = edge_margin
+        self.min_visibility = min_visibility
+        self.box = None
+        self.crops = 0
+        self.fallbacks = 0
+        self._mask = None
+
+    def reset(self):
+        self.box = None
+
+    def accept(self, results):
+        """Whether landmarks found in the crop can be used as-is."""
+        if not results.pose_landmarks:
+            return False
+        landmarks = results.pose_landmarks.landmark
+        low, high = self.edge_margin, 1.0 - self.edge_margin
+        for i in ANCHOR_LANDMARKS:
+            lm = landmarks[i]
+            if lm.visibility < self.min_visibility:
+                return False
+            if not (low <= lm.x <= high and low <= lm.y <= high):
+                return False  # The person is leaving the crop.
+        return True
+
+    def to_full_frame(self, results, frame_shape):
+        """Map crop-normalised landmarks and mask back onto the full frame in place."""
+        h, w = frame_shape[:2]
+        x0, y0, x1, y1 = self.box
+        sx, sy = (x1 - x0) / w, (y1 - y0) / h
+        ox, oy = x0 / w, y0 / h
+        for lm in results.pose_landmarks.landmark:
+            lm.x = ox + lm.x * sx
+            lm.y = oy + lm.y * sy
+            lm.z = lm.z * sx
+
+        mask = results.segmentation_mask
+        if mask is not None:
+            if self._mask is None or self._mask.shape != (h, w):
+                self._mask = np.zeros((h, w), dtype=np.float32)
+            else:
+                self._mask.fill(0)
+            self._mask[y0:y1, x0:x1] = mask
+            mask = self._mask
+        return RoiResults(results.pose_landmarks, mask)
+
+    def update(self, results, frame_shape):
+        """Re-centre the box on this frame's (full-frame) landmarks."""
+        if not results.pose_landmarks:
+            self.box = None
+            return
+        landmarks = results.pose_landmarks.landmark
+        if any(landmarks[i].visibility < self.min_visibility for i in ANCHOR_LANDMARKS):
+            # Without the head and torso there is nothing reliable to centre on.
+            self.box = None
+            return
+        h, w = frame_shape[:2]
+        points = np.array(
+            [(lm.x * w, lm.y * h) for lm in landmarks if lm.visibility >= self.min_visibility],
+            dtype=np.float32,
+        )
+
+        (bx0, by0), (bx1, by1) = points.min(axis=0), points.max(axis=0)
+        pad = self.padding * max(bx1 - bx0, by1 - by0)
+        bx0, by0, bx1, by1 = bx0 - pad, by0 - pad, bx1 + pad, by1 + pad
+
+        if self.box is not None:
+            x0, y0, x1, y1 = self.box
+            inside = bx0 >= x0 and by0 >= y0 and bx1 <= x1 and by1 <= y1
+            area_ratio = ((bx1 - bx0) * (by1 - by0)) / max((x1 - x0) * (y1 - y0), 1)
+            if inside and area_ratio > 0.5:
+                return  # Still a good fit; keep the crop stable.
+
+        # Enforce a minimum crop size around the centre, then clamp to the frame.
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        half_w = max(bx1 - bx0, self.min_fraction * w) / 2
+        half_h = max(by1 - by0, self.min_fraction * h) / 2
+        x0 = int(max(0, cx - half_w))
+        y0 = int(max(0, cy - half_h))
+        x1 = int(min(w, cx + half_w))
+        y1 = int(min(h, cy + half_h))
+        if x1 - x0 >= w and y1 - y0 >= h:
+            self.box = None  # Crop would be the whole frame anyway.
+        else:
+            self.box = (x0, y0, x1, y1)
@@ -0,0 +1,192 @@
+"""Incremental posture rollups.
+
+Instead of one update per frame, the device keeps a running bucket per
+granularity (10 s, 1 min and 1 h by default) and uploads each bucket once,
+when it closes, as a single "rollup" message:
+
+    {"action": "rollup", "granularity": 60,
+     "start": "...", "end": "...", "samples": 1800, "seconds": 59.9,
+     "trust": 0.93,
+     "metrics": {"neckAngle": {"mean": 171.2, "min": 160.4, "max": 178.9}, ...},
+     "segments": {"trunk": {"acceptable": 51.3, "warning": 8.6,
+                            "not recommended": 0.0}, ...},
+     "overall": {"GOOD": 40.2, "MEH": 11.1, "WARNING": 8.6, "BAD": 0.0},
+     "alerts": 0}
+
+Times are seconds spent in each status. Adding a sample is O(1): a few
+vector updates per open bucket, however many frames the bucket covers.
+"""
+import math
+
+import numpy as np
+
+from posture_rules import MIN_CONFIDENCE, SEGMENTS
+from wire_format import METRIC_KEYS, OVERALL_CODES, STATUS_CODES, iso_timestamp
+
+DEFAULT_GRANULARITIES = (10, 60, 3600)
+SEGMENT_STATUSES = ("acceptable", "warning", "not recommended")
+OVERALL_STATUSES = ("GOOD", "MEH", "WARNING", "BAD")
+_SEGMENT_ROWS = np.arange(len(SEGMENTS))
+
+
+def parse_granularities(text):
+    """Granularities in seconds from a string such as "10,60,3600"."""
+    values = sorted({int(part) for part in str(text).split(",") if part.strip()})
+    if not values or values[0] <= 0:
+        raise ValueError(f"Bad rollup granularities {text!r}")
+    return tuple(values)
+
+
+class RollupBucket:
+    """Running aggregates for one [start, start + granularity) window."""
+
+    __slots__ = ("granularity", "start", "end", "samples", "seconds", "trust_sum",
+                 "sums", "counts", "mins", "maxs", "segment_time", "overall_time", "alerts")
+
+    def __init__(self, granularity, start):
+        self.granularity = granularity
+        self.start = start
+        self.end = start
+        self.samples = 0
+        self.seconds = 0.0
+        self.trust_sum = 0.0
+        n = len(METRIC_KEYS)
+        self.sums = np.zeros(n)
+        self.counts = np.zeros(n, dtype=np.int64)
+        self.mins = np.full(n, np.nan)
+        self.maxs = np.full(n, np.nan)
+        # [segment, status code] and [overall code], in seconds.
+        self.segment_time = np.zeros((len(SEGMENTS), len(STATUS_CODES)))
+        self.overall_time = np.zeros(len(OVERALL_CODES))
+        self.alerts = 0
+
+    def add(self, ts, values, valid, trust, segment_codes, overall_code, dt):
+        self.end = ts
+        self.samples += 1
+        self.trust_sum += trust
+        self.sums += np.where(valid, values, 0.0)
+        self.counts += valid
+        np.fmin(self.mins, values, out=self.mins)
+        np.fmax(self.maxs, values, out=self.maxs)
+        self.add_time(segment_codes, overall_code, dt)
+
+    def add_time(self, segment_codes, overall_code, dt):
+        """Book dt seconds to the given statuses without adding a sample."""
+        self.seconds += dt
+        self.segment_time[_SEGMENT_ROWS, segment_codes] += dt
+        self.overall_time[overall_code] += dt
+
+    def to_message(self):
+        metrics = {}
+        for i, key in enumerate(METRIC_KEYS):
+            if self.counts[i]:
+                metrics[key] = {
+                    "mean": self.sums[i] / self.counts[i],
+                    "min": self.mins[i],
+                    "max": self.maxs[i],
+                }
+            else:
+                metrics[key] = {"mean": None, "min": None, "max": None}
+        return {
+            "action": "rollup",
+            "granularity": self.granularity,
+            "start": iso_timestamp(self.start),
+            "end": iso_timestamp(self.end),
+            "samples": self.samples,
+            "seconds": round(self.seconds, 3),
+            "trust": self.trust_sum / self.samples if self.samples else None,
+            "metrics": metrics,
+            "segments": {
+                segment: {
+                    status: round(float(self.segment_time[i, STATUS_CODES[status]]), 3)
+                    for status in SEGMENT_STATUSES
+                }
+                for i, segment in enumerate(SEGMENTS)
+            },
+            "overall": {
+                status: round(float(self.overall_time[OVERALL_CODES[status]]), 3)
+                for status in OVERALL_STATUSES
+            },
+            "alerts": self.alerts,
+        }
+
+
+class RollupAggregator:
+    """Keeps one open bucket per granularity and returns each as it closes.
+
+    add() and flush() return the rollup dicts of the buckets they closed, so
+    the caller can send them after releasing whatever locks it held while
+    adding; `extra` fields (e.g. a cameraId) are merged into every message.
+    The time since the previous sample is split at bucket boundaries. Gaps
+    longer than `max_gap` seconds (the device was off or idle) count as
+    `max_gap`, so downtime isn't booked to the last posture seen.
+    """
+
+    def __init__(self, granularities=DEFAULT_GRANULARITIES, extra=None, max_gap=5.0):
+        self.granularities = tuple(granularities)
+        self.extra = extra or {}
+        self.max_gap = max_gap
+        self.buckets = {g: None for g in self.granularities}
+        self.emitted = 0
+        self._last_ts = None
+        self._values = np.empty(len(METRIC_KEYS))
+
+    def add(self, sample, timestamp):
+        """Fold in one posture sample (the update dict shape, classified).
+
+        Returns the messages of the buckets this sample closed, oldest first.
+        """
+        dt = 0.0 if self._last_ts is None else min(max(timestamp - self._last_ts, 0.0), self.max_gap)
+        self._last_ts = timestamp
+        values = self._values
+        for i, key in enumerate(METRIC_KEYS):
+            metric = sample.get(key) or {}
+            value, conf = metric.get("value"), metric.get("confidence", 0)
+            # Unmeasured angles arrive as value 0, confidence 0; gate them as
+            # classify_segment does so they don't drag the means and minimums.
+            if value is None or conf is None or conf < MIN_CONFIDENCE:
+                values[i] = math.nan
+            else:
+                values[i] = value
+        valid = ~np.isnan(values)
+        posture = sample.get("posture")
+        if not isinstance(posture, dict):
+            posture = {"overall": posture}
+        segment_codes = [STATUS_CODES.get(posture.get(segment), 0) for segment in SEGMENTS]
+        overall_code = OVERALL_CODES.get(posture.get("overall"), 0)
+        trust = sample.get("trust") or 0.0
+
+        closed = []
+        for g in self.granularities:
+            bucket = self.buckets[g]
+            start = math.floor(timestamp / g) * g
+            own = dt
+            if bucket is None or start != bucket.start:
+                if bucket is not None:
+                    # The part of dt before the boundary belongs to the old bucket.
+                    before = min(dt, max(0.0, bucket.start + g - (timestamp - dt)))
+                    bucket.add_time(segment_codes, overall_code, before)
+                    closed.append(self._close(bucket))
+                    own = min(dt, timestamp - start)
+                bucket = self.buckets[g] = RollupBucket(g, start)
+            bucket.add(timestamp, values, valid, trust, segment_codes, overall_code, own)
+        return closed
+
+    def alert(self):
+        """Count an alert in every open bucket."""
+        for bucket in self.buckets.values():
+            if bucket is not None:
+                bucket.alerts += 1
+
+    def flush(self):
+        """Close the open, partial buckets (e.g. at shutdown); returns their messages."""
+        closed = []
+        for g, bucket in self.buckets.items():
+            if bucket is not None and bucket.samples:
+                closed.append(self._close(bucket))
+            self.buckets[g] = None
+        return closed
+
+    def _close(self, bucket):
+        self.emitted += 1
+        return {**bucket.to_message(), **self.extra}
@@ -0,0 +1,90 @@
+import time
+
+import cv2
+
+
+class FrameScheduler:
+    """Deadline-based frame pacing.
+
+    Instead of sleeping a fixed delay after each frame (which stretches the
+    period by however long the work took), wait() sleeps until the next
+    absolute deadline. A frame that finishes after its deadline counts as an
+    overrun and the schedule restarts from now rather than trying to catch up.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.overruns = 0
+        self.frames = 0
+        self._deadline = None
+        self._last_tick = None
+
+    def set_period(self, period):
+        if period != self.period:
+            self.period = period
+            # Re-anchor so a switch to a faster rate takes effect immediately.
+            if self._last_tick is not None:
+                self._deadline = self._last_tick + period
+
+    def wait(self):
+        """Sleep until the next deadline; return seconds since the previous tick."""
+        now = time.monotonic()
+        if self._deadline is None:
+            self._deadline = now + self.period
+        if now > self._deadline:
+            if self.period > 0:
+                self.overruns += 1
+            self._deadline = now
+        else:
+            time.sleep(self._deadline - now)
+        tick = time.monotonic()
+        elapsed = tick - self._last_tick if self._last_tick is not None else self.period
+        self._last_tick = tick
+        self._deadline += self.period
+        self.frames += 1
+        return elapsed
+
+
+class MotionGate:
+    """Cheap scene-change detector on a downscaled grayscale copy of the frame.
+
+    update() returns True while the scene is changing. After `idle_after`
+    seconds without motion the gate reports idle, and the caller can drop to a
+    low frame rate and reuse its last result. `refresh_every` still forces a
+    full analysis periodically so slow drifts (lighting, a slumping user) are
+    not missed.
+    """
+
+    def __init__(self, threshold=4.0, idle_after=10.0, refresh_every=30.0, size=(64, 48)):
+        self.threshold = threshold
+        self.idle_after = idle_after
+        self.refresh_every = refresh_every
+        self.size = size
+        self.last_diff = 0.0
+        self._previous = None
+        self._last_motion = time.monotonic()
+        self._last_refresh = 0.0
+
+    def update(self, image):
+        small = cv2.resize(image, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        if self._previous is None:
+            moving = True
+        else:
+            self.last_diff = float(cv2.absdiff(gray, self._previous).mean())
+            moving = self.last_diff > self.threshold
+        self._previous = gray
+        if moving:
+            self._last_motion = time.monotonic()
+        return moving
+
+    @property
+    def idle(self):
+        return time.monotonic() - self._last_motion > self.idle_after
+
+    def needs_refresh(self):
+        """True when an idle scene is due a full analysis anyway."""
+        return time.monotonic() - self._last_refresh >= self.refresh_every
+
+    def refreshed(self):
+        self._last_refresh = time.monotonic()
@@ -0,0 +1,134 @@
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from geometry import LEFT_HIP, LEFT_SHOULDER, RIGHT_HIP, RIGHT_SHOULDER
+
+
+# Shared by the device (.env) and the replay harness, so a replay measures
+# what the device runs. "selfie" keeps segmentation out of the pose graph and
+# only computes a mask when a refresh is due; "pose" has the graph segment
+# every frame, so SEGMENT_EVERY then only saves the contour search.
+SEGMENTER_DEFAULT = "selfie"
+SEGMENT_EVERY_DEFAULT = 3
+SEGMENT_SCALE_DEFAULT = 0.5
+
+
+def selfie_segmenter(model_selection=1):
+    """A standalone person segmenter (1 = the lighter 144x256 landscape model)."""
+    return mp.solutions.selfie_segmentation.SelfieSegmentation(model_selection=model_selection)
+
+
+def silhouette_from_config(get):
+    """SilhouetteTracker from SEGMENTER, SEGMENT_EVERY and SEGMENT_SCALE, read via get(key, default)."""
+    return SilhouetteTracker(
+        segmenter=selfie_segmenter() if get("SEGMENTER", SEGMENTER_DEFAULT) == "selfie" else None,
+        every=int(get("SEGMENT_EVERY", SEGMENT_EVERY_DEFAULT)),
+        scale=float(get("SEGMENT_SCALE", SEGMENT_SCALE_DEFAULT)),
+    )
+
+
+class SilhouetteTracker:
+    """Back contours for the curvature stage, decoupled from landmark cadence.
+
+    The silhouette is re-extracted every `every` frames, or sooner when the
+    torso midline has moved more than `torso_motion` (normalised frame units)
+    since the last extraction; in between the previous contours are reused
+    against the current landmarks, so curvature keeps updating.
+
+    Masks come from `segmenter` run on a `scale`-sized copy of the frame, and
+    only on the frames where a refresh is due. Without one they come from the
+    pose graph's own segmentation_mask, which the graph computes on every
+    frame; the frame itself is then never resized or converted. Either way the threshold
+    and contour search run at the reduced size into preallocated buffers and
+    the contours are scaled back to full-frame pixels.
+    """
+
+    def __init__(self, segmenter=None, every=1, scale=1.0, torso_motion=0.03, threshold=0.5):
+        self.segmenter = segmenter
+        self.every = max(1, int(every))
+        self.scale = scale
+        self.torso_motion = torso_motion
+        self.threshold = threshold
+        self.updates = 0
+        self.reused = 0
+        self._contours = None
+        self._since = 0
+        self._torso = None
+        self._small = None  # BGR frame at reduced size
+        self._small_rgb = None
+        self._mask_small = None  # float mask at reduced size
+        self._binary = None  # uint8 0/255 mask at reduced size
+
+    @property
+    def uses_pose_mask(self):
+        return self.segmenter is None
+
+    def reset(self):
+        self._contours = None
+        self._torso = None
+
+    def _torso_midline(self, landmark_array):
+        shoulders = (landmark_array[LEFT_SHOULDER, :2] + landmark_array[RIGHT_SHOULDER, :2]) / 2
+        hips = (landmark_array[LEFT_HIP, :2] + landmark_array[RIGHT_HIP, :2]) / 2
+        return np.concatenate([shoulders, hips])
+
+    def _due(self, torso):
+        if self._contours is None or self._since >= self.every:
+            return True
+        if self._torso is None:
+            return True
+        return float(np.abs(torso - self._torso).max()) > self.torso_motion
+
+    def _buffers(self, h, w):
+        size = (max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale))))
+        if self._binary is None or self._binary.shape != (size[1], size[0]):
+            if self.segmenter is not None:
+                self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+                self._small_rgb = np.empty_like(self._small)
+            self._mask_small = np.empty((size[1], size[0]), dtype=np.float32)
+            self._binary = np.empty((size[1], size[0]), dtype=np.uint8)
+        return size
+
+    def _reduced_mask(self, frame, results, size):
+        """The person mask at reduced size, or None if there is none this frame."""
+        if self.segmenter is not None:
+            cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self._small, cv2.COLOR_BGR2RGB, dst=self._small_rgb)
+            mask = self.segmenter.process(self._small_rgb).segmentation_mask
+        else:
+            mask = results.segmentation_mask
+        if mask is None:
+            return None
+        if mask.shape != self._mask_small.shape:
+            cv2.resize(mask, size, dst=self._mask_small, interpolation=cv2.INTER_LINEAR)
+            mask = self._mask_small
+        return mask
+
+    def contours(self, frame, results, landmark_array):
+        """Contours of the person in full-frame pixel coordinates."""
+        torso = self._torso_midline(landmark_array)
+        self._since += 1
+        if not self._due(torso):
+            self.reused += 1
+            return self._contours
+
+        if self.uses_pose_mask and results.segmentation_mask is None:
+            return self._contours or []  # Nothing to extract from this frame
+        h, w = frame.shape[:2]
+        size = self._buffers(h, w)
+        mask = self._reduced_mask(frame, results, size)
+        if mask is None:
+            return self._contours or []
+        cv2.compare(mask, self.threshold, cv2.CMP_GT, dst=self._binary)
+        contours, _ = cv2.findContours(self._binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        if size != (w, h):
+            factor = np.array([w / size[0], h / size[1]], dtype=np.float32)
+            # Pixel centres, not corners, scale between resolutions.
+            contours = [(c.astype(np.float32) + 0.5) * factor - 0.5 for c in contours]
+        self._contours = contours
+        self._torso = torso
+        self._since = 0
+        self.updates += 1
+        return contours
@@ -0,0 +1,403 @@
+"""Disk-backed store-and-forward spool for outbound messages.
+
+Messages that must survive an outage (rollups) are appended to the spool
+instead of the in-memory TelemetryQueue. Each gets a sequence number, is
+written as one framed record
+
+    offset  size  field
+    0       4     payload length
+    4       4     crc32 of seq + payload
+    8       8     sequence number
+    16      n     JSON payload, with "spoolSeq" set
+
+to the newest append-only segment file (named after its first sequence
+number), and stays there until the server acknowledges it. The sender
+replays unacknowledged records in order after every (re)connect, throttled
+so live updates still go first. A record torn by a crash fails its CRC and
+is cut off when the spool is reopened; the acknowledged sequence number is
+kept in a small side file, so at worst a few records are sent twice.
+
+append() only encodes the record and queues it, and ack() only records the
+acknowledgement; a writer thread does the file I/O (appends, dropping acked
+segments, persisting the ack, and an fsync at most every `sync_interval`),
+so neither the detection loop nor the event loop waits on the card. read()
+does read segment files; the sender runs it in an executor. Records still queued at a crash are
+lost along with the unsynced ones.
+
+The spool is bounded by bytes and by age: whole segments are dropped oldest
+first, and what they held unacknowledged is counted in `dropped`.
+"""
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+from wire_format import encode_json
+
+log = logging.getLogger("spool")
+
+RECORD_HEADER = struct.Struct("<IIQ")
+SEQ = struct.Struct("<Q")
+SUFFIX = ".spool"
+ACK_FILE = "acked"
+
+
+class Segment:
+    __slots__ = ("first_seq", "path", "size")
+
+    def __init__(self, first_seq, path, size=0):
+        self.first_seq = first_seq
+        self.path = path
+        self.size = size
+
+
+class DiskSpool:
+    """Segmented, append-only message spool acknowledged by sequence number."""
+
+    def __init__(self, directory="spool", segment_bytes=1 << 20, max_bytes=64 << 20,
+                 max_age=7 * 86400.0, replay_rate=10.0, sync_interval=1.0, max_queued=4096):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.replay_rate = replay_rate
+        self.sync_interval = sync_interval
+        self.max_queued = max_queued
+        self.appended = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.acked = 0
+        self._segments = []
+        self._file = None
+        self._queued = []  # (seq, framed record) waiting for the writer thread
+        self._unsynced = False
+        self._last_sync = 0.0
+        self._last_ack_save = 0.0
+        self._ack_dirty = False
+        self._cursor = None  # (segment first_seq, byte offset) of the next record to replay
+        self._tokens = 0.0
+        self._tokens_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name="spool-writer", daemon=True)
+        self._thread.start()
+
+    # ------------------ Recovery ------------------
+
+    def _recover(self):
+        self.acked = self._load_ack()
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(SUFFIX) and name[: -len(SUFFIX)].isdigit():
+                path = os.path.join(self.directory, name)
+                self._segments.append(Segment(int(name[: -len(SUFFIX)]), path, os.path.getsize(path)))
+        self.next_seq = self.acked + 1
+        if self._segments:
+            last = self._segments[-1]
+            last_seq, good = self._scan_tail(last)
+            if good < last.size:
+                log.warning("Spool %s: cutting %d byte(s) of torn record", last.path, last.size - good)
+                with open(last.path, "r+b") as file:
+                    file.truncate(good)
+                last.size = good
+            self.next_seq = max(self.next_seq, last_seq + 1, last.first_seq)
+        self._drop_acked()
+        if self.pending:
+            log.info("Spool holds %d unsent message(s) in %d segment(s)", self.pending, len(self._segments))
+
+    def _scan_tail(self, segment):
+        """(last good seq, end offset of the last good record) of a segment."""
+        last_seq, offset = segment.first_seq - 1, 0
+        with open(segment.path, "rb") as file:
+            while True:
+                record = self._read_record(file)
+                if record is None:
+                    return last_seq, offset
+                last_seq = record[0]
+                offset = file.tell()
+
+    @staticmethod
+    def _read_record(file):
+        header = file.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        length, crc, seq = RECORD_HEADER.unpack(header)
+        payload = file.read(length)
+        if len(payload) < length or zlib.crc32(payload, zlib.crc32(SEQ.pack(seq))) != crc:
+            return None
+        return seq, payload
+
+    def _load_ack(self):
+        try:
+            with open(os.path.join(self.directory, ACK_FILE)) as file:
+                return int(json.load(file)["seq"])
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning("Ignoring unreadable spool ack file: %s", e)
+            return 0
+
+    def _save_ack(self, seq):
+        # Writer side, without _lock held; returns whether the file was replaced.
+        fd, tmp_path = tempfile.mkstemp(prefix=".acked-", dir=self.directory)
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump({"seq": seq}, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, os.path.join(self.directory, ACK_FILE))
+            self._last_ack_save = time.monotonic()
+            return True
+        except OSError as e:
+            log.warning("Could not persist spool ack: %s", e)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    # ------------------ Writing ------------------
+
+    def append(self, message):
+        """Queue one message dict for the writer; returns its sequence number.
+
+        Never touches disk, so it is safe to call from the detection loop.
+        """
+        with self._lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            payload = encode_json({**message, "spoolSeq": seq}).encode()
+            header = RECORD_HEADER.pack(len(payload), zlib.crc32(payload, zlib.crc32(SEQ.pack(seq))), seq)
+            if len(self._queued) >= self.max_queued:
+                # The card is not keeping up; shed the oldest rather than grow.
+                log.warning("Spool writer behind; dropped queued message %d", self._queued.pop(0)[0])
+                self.dropped += 1
+            self._queued.append((seq, header + payload))
+            self.appended += 1
+        self._wake.set()
+        return seq
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self, sync=False):
+        """Write the queued records and the ack; fsync at most every sync_interval unless sync."""
+        with self._write_lock:
+            with self._lock:
+                records, self._queued = self._queued, []
+            for seq, record in records:
+                self._write(seq, record)
+            now = time.monotonic()
+            if self._file is not None and self._unsynced and (sync or now - self._last_sync >= self.sync_interval):
+                try:
+                    os.fsync(self._file.fileno())
+                except OSError as e:
+                    log.warning("Could not sync spool: %s", e)
+                self._unsynced = False
+                self._last_sync = now
+            with self._lock:
+                self._drop_acked()
+                save_ack = self._ack_dirty and (sync or now - self._last_ack_save >= self.sync_interval)
+                if save_ack:
+                    self._ack_dirty = False
+                acked = self.acked
+            if save_ack and not self._save_ack(acked):
+                with self._lock:
+                    self._ack_dirty = True
+
+    def _write(self, seq, record):
+        # Writer side, with _write_lock held; _lock only guards the segment list.
+        try:
+            with self._lock:
+                segment = self._segments[-1] if self._segments else None
+                if segment is None or self._file is None or segment.size >= self.segment_bytes:
+                    segment = self._rotate(seq)
+            self._file.write(record)
+            self._file.flush()
+        except OSError as e:
+            log.warning("Could not spool message %d: %s", seq, e)
+            with self._lock:
+                self.dropped += 1
+            # A partial write may be on disk; start a fresh segment after it.
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            return
+        self._unsynced = True
+        with self._lock:
+            # Readers only look up to segment.size, so the record appears whole.
+            segment.size += len(record)
+            self._enforce_limits()
+
+    def _rotate(self, first_seq):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._segments and self._segments[-1].size == 0:
+            segment = self._segments[-1]  # Reuse an empty tail left by recovery
+        else:
+            path = os.path.join(self.directory, f"{first_seq:016d}{SUFFIX}")
+            segment = Segment(first_seq, path)
+            self._segments.append(segment)
+        self._file = open(segment.path, "ab")
+        return segment
+
+    def _enforce_limits(self):
+        # Called with the lock held; never drops the segment being written.
+        now = time.time()
+        total = sum(segment.size for segment in self._segments)
+        while len(self._segments) > 1:
+            oldest = self._segments[0]
+            try:
+                expired = self.max_age and now - os.path.getmtime(oldest.path) > self.max_age
+            except OSError:
+                expired = True
+            if not expired and total <= self.max_bytes:
+                break
+            lost = max(0, self._segments[1].first_seq - max(oldest.first_seq, self.acked + 1))
+            self.dropped += lost
+            total -= oldest.size
+            self._remove_oldest()
+            # What was in it is gone; don't wait for acks that can't come.
+            if self._segments[0].first_seq - 1 > self.acked:
+                self.acked = self._segments[0].first_seq - 1
+                self._ack_dirty = True
+            log.warning("Spool over its %s limit; dropped %d unsent message(s)",
+                        "age" if expired else "size", lost)
+
+    def _remove_oldest(self):
+        oldest = self._segments.pop(0)
+        try:
+            os.unlink(oldest.path)
+        except OSError as e:
+            log.warning("Could not remove spool segment %s: %s", oldest.path, e)
+        if self._cursor is not None and self._cursor[0] == oldest.first_seq:
+            self._cursor = None
+
+    # ------------------ Replay ------------------
+
+    def rewind(self):
+        """Replay from the first unacknowledged record (call on every connect)."""
+        with self._lock:
+            self._cursor = None
+
+    def _position(self):
+        # Start of the segment holding acked + 1; read() skips the acked ones.
+        for segment in reversed(self._segments):
+            if segment.first_seq <= self.acked + 1:
+                return segment.first_seq, 0
+        return (self._segments[0].first_seq, 0) if self._segments else None
+
+    def replay_budget(self):
+        """Records the sender may replay now, at replay_rate with a 1 s burst."""
+        now = time.monotonic()
+        with self._lock:
+            self._tokens = min(self.replay_rate, self._tokens + (now - self._tokens_at) * self.replay_rate)
+            self._tokens_at = now
+            return int(self._tokens)
+
+    def read(self, max_items):
+        """Up to max_items (seq, payload text) not yet replayed this connection, in order."""
+        out = []
+        with self._lock:
+            if self._cursor is None:
+                self._cursor = self._position()
+            while self._cursor is not None and len(out) < max_items:
+                first_seq, offset = self._cursor
+                index = next((i for i, s in enumerate(self._segments) if s.first_seq == first_seq), None)
+                if index is None:
+                    self._cursor = self._position()
+                    continue
+                segment = self._segments[index]
+                if offset >= segment.size:
+                    if index + 1 == len(self._segments):
+                        break  # Caught up with the writer
+                    self._cursor = (self._segments[index + 1].first_seq, 0)
+                    continue
+                with open(segment.path, "rb") as file:
+                    file.seek(offset)
+                    while len(out) < max_items and file.tell() < segment.size:
+                        record = self._read_record(file)
+                        if record is None:
+                            log.warning("Spool %s: unreadable record at %d; skipping rest",
+                                        segment.path, file.tell())
+                            file.seek(segment.size)
+                            break
+                        if record[0] > self.acked:
+                            out.append((record[0], record[1].decode()))
+                    self._cursor = (first_seq, file.tell())
+            self._tokens = max(0.0, self._tokens - len(out))
+            self.replayed += len(out)
+        return out
+
+    def ack(self, seq):
+        """Everything up to and including seq has reached the server.
+
+        Only updates the count; the writer thread removes the segments and
+        persists the ack, so this is safe to call on the event loop.
+        """
+        with self._lock:
+            if seq <= self.acked:
+                return
+            self.acked = min(seq, self.next_seq - 1)
+            self._ack_dirty = True
+        self._wake.set()
+
+    def _drop_acked(self):
+        # Whole segments before the active one whose records are all acked.
+        while len(self._segments) > 1 and self._segments[1].first_seq - 1 <= self.acked:
+            self._remove_oldest()
+
+    # ------------------ Reporting ------------------
+
+    @property
+    def pending(self):
+        return max(0, self.next_seq - 1 - self.acked)
+
+    @property
+    def size_bytes(self):
+        return sum(segment.size for segment in self._segments)
+
+    @property
+    def backlog(self):
+        """Whether records remain to replay on this connection."""
+        with self._lock:
+            if self._cursor is None:
+                return self.pending > 0
+            first_seq, offset = self._cursor
+            last = self._segments[-1] if self._segments else None
+            return last is not None and (first_seq != last.first_seq or offset < last.size)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self.pending,
+                "bytes": self.size_bytes,
+                "segments": len(self._segments),
+                "appended": self.appended,
+                "queued": len(self._queued),
+                "replayed": self.replayed,
+                "acked_seq": self.acked,
+                "next_seq": self.next_seq,
+                "dropped": self.dropped,
+            }
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush(sync=True)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
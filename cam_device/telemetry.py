@@ -0,0 +1,117 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A queued outbound message and the time.monotonic() at which it was produced.
+Outbound = namedtuple("Outbound", ["key", "payload", "enqueued_at"])
+
+
+class TelemetryQueue:
+    """Bounded outbound channel between the detection thread and the WebSocket.
+
+    Messages put with a `coalesce` key replace any not-yet-sent message with
+    the same key (latest wins), so a slow link only ever holds one pending
+    posture update instead of a growing backlog. When the queue is full the
+    oldest message is dropped. The asyncio consumer is woken on arrival rather
+    than polling.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._loop = None
+        self._ready = None
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.sent = 0
+        self.last_age = 0.0
+        self.max_age = 0.0
+
+    def bind(self, loop):
+        """Attach the event loop whose consumer should be woken on put()."""
+        self._loop = loop
+        self._ready = asyncio.Event()
+        if self._items:
+            self._ready.set()
+
+    def put(self, payload, coalesce=None, enqueued_at=None):
+        if enqueued_at is None:
+            enqueued_at = time.monotonic()
+        key = coalesce if coalesce is not None else ("seq", next(self._seq))
+        with self._lock:
+            self.enqueued += 1
+            if key in self._items:
+                # Keep the slot's position so ordering with other messages holds.
+                self._items[key] = Outbound(key, payload, enqueued_at)
+                self.coalesced += 1
+            else:
+                if len(self._items) >= self.maxsize:
+                    self._items.popitem(last=False)
+                    self.dropped += 1
+                self._items[key] = Outbound(key, payload, enqueued_at)
+        self._wake()
+
+    def requeue(self, items):
+        """Put unsent items back at the front, unless superseded meanwhile."""
+        with self._lock:
+            for item in reversed(items):
+                if item.key in self._items:
+                    continue
+                if len(self._items) >= self.maxsize:
+                    self.dropped += 1
+                    continue
+                self._items[item.key] = item
+                self._items.move_to_end(item.key, last=False)
+        self._wake()
+
+    def _wake(self):
+        loop, ready = self._loop, self._ready
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(ready.set)
+
+    def drain(self, max_items):
+        with self._lock:
+            count = min(max_items, len(self._items))
+            batch = [self._items.popitem(last=False)[1] for _ in range(count)]
+            if not self._items and self._ready is not None:
+                self._ready.clear()
+        return batch
+
+    async def get_batch(self, max_items=16, timeout=None):
+        """Wait until something is queued, then take up to max_items in order."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return self.drain(max_items)
+
+    def mark_sent(self, items):
+        now = time.monotonic()
+        for item in items:
+            age = now - item.enqueued_at
+            self.last_age = age
+            self.max_age = max(self.max_age, age)
+        self.sent += len(items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        with self._lock:
+            oldest = next(iter(self._items.values()), None)
+        return {
+            "depth": len(self._items),
+            "capacity": self.maxsize,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "oldest_age_ms": (time.monotonic() - oldest.enqueued_at) * 1000 if oldest else 0.0,
+            "last_age_ms": self.last_age * 1000,
+            "max_age_ms": self.max_age * 1000,
+        }
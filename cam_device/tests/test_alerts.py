@@ -0,0 +1,96 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from alerts import AlertGate, AlertOutbox
+from metrics import MetricsRegistry
+from posture_rules import is_bad, step_temperature
+
+
+@pytest.fixture
+def webhook():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append(json.loads(body))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/alert", received
+    server.shutdown()
+    server.server_close()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_warning_is_bad_posture():
+    # The seated classifier never returns BAD, so WARNING has to count.
+    assert is_bad("WARNING")
+    assert is_bad("BAD")
+    assert not any(is_bad(overall) for overall in ("GOOD", "MEH", "unknown"))
+
+
+def test_sustained_warning_reaches_outbox(webhook, tmp_path):
+    url, received = webhook
+    outbox = AlertOutbox(url, path=str(tmp_path / "pending.json"), metrics=MetricsRegistry())
+    gate = AlertGate(min_interval=0.0)
+    temperature, threshold, dt = 0.0, 1.0, 0.1
+    try:
+        for _ in range(300):  # 30 s of WARNING at 10 fps
+            temperature = step_temperature(temperature, "WARNING", dt, 0.1, 0.05)
+            if gate.update("desk", temperature > threshold):
+                outbox.submit({"deviceId": "desk", "temperature": temperature})
+        assert wait_for(lambda: outbox.delivered == 1)
+    finally:
+        outbox.close()
+    assert len(received) == 1  # One alert for the whole episode
+    assert received[0]["deviceId"] == "desk" and received[0]["alertId"]
+    assert gate.suppressed > 0
+
+
+def test_good_posture_cools_down():
+    temperature = step_temperature(2.0, "WARNING", 1.0, 0.1, 0.05)
+    assert temperature == pytest.approx(2.1)
+    for _ in range(100):
+        temperature = step_temperature(temperature, "GOOD", 1.0, 0.1, 0.05)
+    assert temperature == 0.0
+
+
+def test_submit_does_not_wait_for_disk(tmp_path, monkeypatch):
+    import alerts
+
+    def slow_fsync(fd):
+        time.sleep(0.5)
+
+    monkeypatch.setattr(alerts.os, "fsync", slow_fsync)
+    path = tmp_path / "pending.json"
+    # Nothing listens on port 9: every attempt fails and the alert stays pending.
+    outbox = AlertOutbox("http://127.0.0.1:9/alert", path=str(path), base_delay=60.0,
+                         metrics=MetricsRegistry())
+    try:
+        start = time.perf_counter()
+        for i in range(5):
+            outbox.submit({"deviceId": "desk", "n": i})
+        assert time.perf_counter() - start < 0.1
+        assert wait_for(lambda: path.exists() and len(json.loads(path.read_text())) == 5)
+    finally:
+        outbox.close()
+    assert len(json.loads(path.read_text())) == 5  # Survives for the next start
@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+
+import pytest
+
+from history import HistoryStore
+
+SAMPLE = {
+    "trust": 0.8,
+    "neckAngle": {"value": 12.5, "confidence": 0.9},
+    "posture": {"neck": "warning", "overall": "WARNING"},
+}
+
+
+def write_history(directory, start, count, step=0.5):
+    # No compaction or retention here, so the files hold exactly what was written.
+    store = HistoryStore(str(directory), segment_seconds=60, flush_interval=3600.0,
+                         retention=0, compact_resolution=0)
+    for i in range(count):
+        store.append(SAMPLE, timestamp=start + i * step)
+    store.close()
+
+
+def snapshot(directory):
+    return {name: os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)}
+
+
+def test_read_only_store_never_touches_segments(tmp_path):
+    old = time.time() - 40 * 86400  # Past default retention and compaction age
+    write_history(tmp_path, old, 400)
+    before = snapshot(tmp_path)
+    threads = threading.active_count()
+
+    reader = HistoryStore(str(tmp_path), segment_seconds=60, retention=86400.0, writer=False)
+    records = reader.scan(old, old + 100)
+    assert threading.active_count() == threads
+    with pytest.raises(RuntimeError):
+        reader.append(SAMPLE)
+    with pytest.raises(RuntimeError):
+        reader.maintain()
+    reader.close()
+
+    assert len(records) == 200
+    assert records["value"][0][0] == pytest.approx(12.5)
+    assert snapshot(tmp_path) == before
+
+
+def test_read_only_store_on_missing_directory(tmp_path):
+    reader = HistoryStore(str(tmp_path / "absent"), writer=False)
+    assert len(reader.scan()) == 0
+    assert not (tmp_path / "absent").exists()
+
+
+def test_torn_tail_is_ignored_and_realigned(tmp_path):
+    start = time.time()
+    write_history(tmp_path, start, 10, step=0.01)
+    (segment,) = [name for name in os.listdir(tmp_path)]
+    with open(tmp_path / segment, "ab") as file:
+        file.write(b"torn")
+    assert len(HistoryStore(str(tmp_path), segment_seconds=60, writer=False).scan()) == 10
+
+    write_history(tmp_path, start + 0.5, 1)
+    records = HistoryStore(str(tmp_path), segment_seconds=60, writer=False).scan()
+    assert len(records) == 11
+    assert records["ts"][-1] == pytest.approx(start + 0.5)
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import random
+import time
+
+import pytest
+import websockets
+
+from link import DEGRADED, UP, Backoff, LinkManager
+from metrics import MetricsRegistry
+
+logging.getLogger("websockets").setLevel(logging.CRITICAL)
+
+
+class Ceiling:
+    """rng stand-in that always picks the top of the jitter range."""
+
+    def uniform(self, low, high):
+        return high
+
+
+async def echo(ws):
+    async for message in ws:
+        await ws.send(message)
+
+
+async def chatty_session(ws):
+    while True:
+        await ws.send("hello")
+        await ws.recv()
+        await asyncio.sleep(0.1)
+
+
+async def wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.02)
+    return True
+
+
+def test_backoff_doubles_up_to_the_cap_and_resets():
+    backoff = Backoff(base=1.0, cap=10.0, rng=Ceiling())
+    assert [backoff.next_delay() for _ in range(6)] == [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+    assert backoff.attempt == 6
+    backoff.reset()
+    assert backoff.next_delay() == 1.0
+
+
+def test_backoff_is_fully_jittered():
+    backoff = Backoff(base=1.0, cap=60.0, rng=random.Random(7))
+    delays = [backoff.next_delay() for _ in range(12)]
+    assert all(0.0 <= d <= min(60.0, 2 ** n) for n, d in enumerate(delays))
+    assert len(set(delays)) == len(delays)
+
+
+def test_send_delay_only_on_a_degraded_link():
+    link = LinkManager("ws://unused", chatty_session, degraded_rtt=0.2, metrics=MetricsRegistry())
+    link.state = UP
+    link._rtts.extend([0.05] * 20)
+    link._update_state()
+    assert link.state == UP and link.send_delay() == 0.0
+
+    link._rtts.extend([0.4] * 20)
+    link._update_state()
+    assert link.state == DEGRADED
+    assert link.send_delay() == pytest.approx(0.4)
+
+    link._rtts.extend([3.0] * 64)
+    assert link.send_delay() == 1.0  # Capped
+
+
+def test_dead_peer_is_dropped_within_ping_interval_plus_timeout():
+    ping_interval, ping_timeout = 0.2, 0.5
+
+    async def scenario():
+        server = await websockets.serve(echo, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        stop = False
+        link = LinkManager(f"ws://127.0.0.1:{port}", chatty_session, should_stop=lambda: stop,
+                           ping_interval=ping_interval, ping_timeout=ping_timeout,
+                           backoff=Backoff(0.05, 0.2), metrics=MetricsRegistry())
+        runner = asyncio.create_task(link.run())
+        try:
+            assert await wait_for(lambda: link.pings >= 2, 5.0)
+            # Half-open peer: the server stops reading, so pongs never come back.
+            silent = list(server.connections)
+            for connection in silent:
+                connection.transport.pause_reading()
+            started = time.monotonic()
+            assert await wait_for(lambda: link.dead_peers == 1, 5.0)
+            detected = time.monotonic() - started
+            for connection in silent:
+                connection.transport.abort()  # Don't wait out its closing handshake
+            # ...and the link reconnects once the server answers again.
+            assert await wait_for(lambda: link.connects >= 2 and link.state in (UP, DEGRADED), 5.0)
+        finally:
+            stop = True
+            await runner
+            server.close()
+            await server.wait_closed()
+        return detected, link
+
+    detected, link = asyncio.run(scenario())
+    assert detected <= ping_interval + ping_timeout + 0.3
+    assert link.missed_pongs == 1
+    assert link.disconnects >= 1
+
+
+def test_backoff_resets_only_after_a_stable_connection():
+    async def hang_up(ws):
+        await ws.close()
+
+    async def attempts(stable_after):
+        server = await websockets.serve(hang_up, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        stop = False
+        link = LinkManager(f"ws://127.0.0.1:{port}", chatty_session, should_stop=lambda: stop,
+                           stable_after=stable_after, backoff=Backoff(0.01, 0.02),
+                           metrics=MetricsRegistry())
+        runner = asyncio.create_task(link.run())
+        try:
+            assert await wait_for(lambda: link.connects >= 4, 5.0)
+        finally:
+            stop = True
+            await runner
+            server.close()
+            await server.wait_closed()
+        return link.backoff.attempt, link.connects
+
+    # Connections that drop straight away keep growing the backoff...
+    attempt, connects = asyncio.run(attempts(stable_after=60.0))
+    assert attempt >= connects - 1
+    # ...while ones that count as stable start it over each time.
+    attempt, _ = asyncio.run(attempts(stable_after=0.0))
+    assert attempt <= 1
@@ -0,0 +1,55 @@
+import io
+import logging
+import threading
+
+import pytest
+
+from log_setup import parse_level, setup_logging, shutdown_logging
+
+
+@pytest.fixture
+def output():
+    stream = io.StringIO()
+    yield stream
+    shutdown_logging()
+
+
+def test_unknown_level_falls_back_to_info(output):
+    setup_logging("LOUD", stream=output)
+    logging.getLogger("test").debug("hidden")
+    logging.getLogger("test").info("shown")
+    shutdown_logging()
+
+    assert logging.getLogger().level == logging.INFO
+    assert "Unknown log level 'LOUD'" in output.getvalue()
+    assert "shown" in output.getvalue() and "hidden" not in output.getvalue()
+
+
+def test_parse_level():
+    assert parse_level("debug") == logging.DEBUG
+    assert parse_level(" Warning ") == logging.WARNING
+    assert parse_level("15") == 15
+    assert parse_level("nope") is None
+
+
+def test_records_are_formatted_on_the_listener(output):
+    formatted_on = []
+
+    class Probe:
+        def __str__(self):
+            formatted_on.append(threading.current_thread().name)
+            return "probe"
+
+    setup_logging("INFO", stream=output)
+    # Immutable arguments are formatted later, by the listener thread.
+    logging.getLogger("test").info("value %s", 42)
+    # Other arguments are resolved now, so later mutation can't change the message.
+    state = {"n": 1}
+    logging.getLogger("test").info("state %s", state)
+    state["n"] = 2
+    logging.getLogger("test").info("%s", Probe())
+    shutdown_logging()
+
+    text = output.getvalue()
+    assert "value 42" in text and "state {'n': 1}" in text
+    assert formatted_on == [threading.main_thread().name]
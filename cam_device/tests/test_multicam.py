@@ -0,0 +1,81 @@
+import threading
+
+from capture import LatestFrameSlot
+from metrics import MetricsRegistry
+from multicam import Camera, CameraSpec, MultiCameraRunner
+
+
+class FakeCapture:
+    def __init__(self):
+        self.slot = LatestFrameSlot()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.slot.close()
+
+    def join(self, timeout=None):
+        pass
+
+
+class FakePose:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakePipeline:
+    """Records which pose graph analysed each frame."""
+
+    def __init__(self):
+        self.metrics = MetricsRegistry()
+        self.pose = None
+        self.used = []
+
+    def process(self, image):
+        self.used.append(self.pose)
+        return image
+
+
+def make_camera(name):
+    camera = Camera(CameraSpec(name, 0, None, 0.0), FakePipeline())
+    camera.capture = FakeCapture()
+    return camera
+
+
+def test_cameras_share_one_graph_per_worker():
+    cameras = [make_camera("cam0"), make_camera("cam1"), make_camera("cam2")]
+    graphs = []
+    lock = threading.Lock()
+
+    def make_pose():
+        with lock:
+            graphs.append(FakePose())
+            return graphs[-1]
+
+    runner = MultiCameraRunner(cameras, workers=1, make_pose=make_pose)
+    runner.start()
+    try:
+        for round_ in range(3):
+            for camera in cameras:
+                camera.capture.slot.publish(f"{camera.name}-{round_}")
+                # The dispatcher is woken by the publish rather than polling.
+                result = runner.results.get(timeout=1)
+                assert result.camera is camera
+                assert result.analysed == f"{camera.name}-{round_}"
+    finally:
+        runner.stop()
+
+    assert len(graphs) == 1
+    assert all(camera.pipeline.used == graphs * 3 for camera in cameras)
+    assert graphs[0].closed
+
+
+def test_stop_wakes_an_idle_dispatcher():
+    runner = MultiCameraRunner([make_camera("cam0")], workers=2)
+    runner.start()
+    runner.stop()
+    assert not runner._thread.is_alive()
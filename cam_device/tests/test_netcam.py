@@ -0,0 +1,76 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from netcam import NetworkCaptureThread
+
+
+def jpeg(shade):
+    ok, data = cv2.imencode(".jpg", np.full((48, 64, 3), shade, dtype=np.uint8))
+    assert ok
+    return data.tobytes()
+
+
+class FakeStream:
+    """A multipart response that serves `frames` and then idles until released."""
+
+    headers = {"Content-Type": "multipart/x-mixed-replace; boundary=frame"}
+
+    def __init__(self, frames, done):
+        self.frames = frames
+        self.done = done
+        self.sent = threading.Event()
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for data in self.frames:
+            yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + data + b"\r\n"
+            time.sleep(0.01)
+        self.sent.set()
+        while not self.done.is_set():
+            yield b""
+            time.sleep(0.01)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def get(self, url, **kwargs):
+        return self.stream
+
+    def close(self):
+        pass
+
+
+def test_busy_consumer_gets_the_newest_mjpeg_frame():
+    shades = [20, 60, 100, 140, 180, 220]
+    done = threading.Event()
+    stream = FakeStream([jpeg(shade) for shade in shades], done)
+    camera = NetworkCaptureThread("http://camera/stream", 64, 48, session=FakeSession(stream))
+    camera.start()
+    try:
+        first = camera.slot.take(timeout=2)
+        assert first is not None
+        # The consumer is busy while the rest of the stream arrives.
+        assert stream.sent.wait(2)
+        time.sleep(0.2)
+        latest = camera.slot.take(timeout=1)
+    finally:
+        done.set()
+        camera.stop()
+        camera.join(timeout=2)
+
+    assert latest is not None
+    assert abs(int(latest.image.mean()) - shades[-1]) <= 2
+    assert camera.mode == "mjpeg"
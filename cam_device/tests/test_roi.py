@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from geometry import LEFT_HIP, NOSE
+from roi import RoiTracker
+
+FRAME = (480, 640, 3)
+
+
+def results(hidden=(), count=33):
+    # A person in the middle third of the frame, every landmark visible unless hidden.
+    landmarks = [
+        SimpleNamespace(x=0.4 + 0.2 * (i % 2), y=0.3 + 0.4 * (i / count), z=0.0,
+                        visibility=0.0 if i in hidden else 0.9)
+        for i in range(count)
+    ]
+    return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=landmarks))
+
+
+def test_box_follows_a_visible_person():
+    roi = RoiTracker()
+    roi.update(results(), FRAME)
+    assert roi.box is not None
+
+
+def test_no_box_when_an_anchor_is_hidden():
+    # Plenty of other landmarks are visible, but the nose is not.
+    roi = RoiTracker()
+    roi.update(results(hidden=(NOSE,)), FRAME)
+    assert roi.box is None
+
+    roi.update(results(), FRAME)
+    roi.update(results(hidden=(LEFT_HIP,)), FRAME)
+    assert roi.box is None
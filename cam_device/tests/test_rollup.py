@@ -0,0 +1,56 @@
+import pytest
+
+from rollup import RollupAggregator
+
+
+def sample(overall):
+    return {
+        "trust": 1.0,
+        "neckAngle": {"value": 170.0, "confidence": 0.9},
+        # Not measured this frame: the pipeline reports it as 0 with no confidence.
+        "kneeAngleL": {"value": 0, "confidence": 0},
+        "posture": {"overall": overall},
+    }
+
+
+def test_interval_is_split_at_the_bucket_boundary():
+    rollups = RollupAggregator(granularities=(10,), max_gap=60.0)
+    assert rollups.add(sample("GOOD"), 1000.0) == []
+    assert rollups.add(sample("GOOD"), 1008.0) == []
+    closed = rollups.add(sample("WARNING"), 1012.0)
+
+    assert len(closed) == 1
+    first = closed[0]
+    # 8 s of GOOD, then 2 of the 4 s up to the WARNING sample before 1010.
+    assert first["seconds"] == pytest.approx(10.0)
+    assert first["overall"]["WARNING"] == pytest.approx(2.0)
+    assert first["samples"] == 2
+
+    (second,) = rollups.flush()
+    assert second["seconds"] == pytest.approx(2.0)
+    assert second["overall"]["WARNING"] == pytest.approx(2.0)
+    assert second["samples"] == 1
+    assert rollups.emitted == 2
+
+
+def test_add_returns_closed_buckets_instead_of_sending():
+    rollups = RollupAggregator(granularities=(10, 60), extra={"cameraId": "desk"})
+    rollups.add(sample("GOOD"), 3000.0)
+    closed = rollups.add(sample("GOOD"), 3011.0)
+
+    assert [m["granularity"] for m in closed] == [10]
+    assert closed[0]["cameraId"] == "desk"
+    assert [m["granularity"] for m in rollups.flush()] == [10, 60]
+    assert rollups.flush() == []
+
+
+def test_unmeasured_metrics_are_left_out():
+    rollups = RollupAggregator(granularities=(10,))
+    rollups.add(sample("GOOD"), 1000.0)
+    measured = dict(sample("GOOD"), kneeAngleL={"value": 95.0, "confidence": 0.8})
+    rollups.add(measured, 1001.0)
+    (message,) = rollups.flush()
+
+    assert message["metrics"]["neckAngle"] == {"mean": 170.0, "min": 170.0, "max": 170.0}
+    assert message["metrics"]["kneeAngleL"] == {"mean": 95.0, "min": 95.0, "max": 95.0}
+    assert message["metrics"]["kneeAngleR"] == {"mean": None, "min": None, "max": None}
@@ -0,0 +1,104 @@
+import json
+import os
+import time
+
+import spool as spool_module
+from spool import ACK_FILE, DiskSpool
+
+
+def fill(directory, count, **kwargs):
+    spool = DiskSpool(str(directory), **kwargs)
+    seqs = [spool.append({"action": "rollup", "n": i}) for i in range(count)]
+    spool.close()
+    return seqs
+
+
+def replay_all(spool):
+    spool.rewind()
+    out = []
+    while True:
+        batch = spool.read(100)
+        if not batch:
+            return out
+        out.extend(batch)
+
+
+def test_append_does_not_wait_for_disk(tmp_path, monkeypatch):
+    real_fsync = os.fsync
+
+    def slow_fsync(fd):
+        time.sleep(0.5)
+        real_fsync(fd)
+
+    monkeypatch.setattr(spool_module.os, "fsync", slow_fsync)
+    spool = DiskSpool(str(tmp_path), sync_interval=0.0)
+    started = time.perf_counter()
+    seqs = [spool.append({"n": i}) for i in range(5)]
+    assert time.perf_counter() - started < 0.1
+    spool.close()
+
+    assert seqs == [1, 2, 3, 4, 5]
+    assert [json.loads(p)["n"] for _, p in replay_all(DiskSpool(str(tmp_path)))] == [0, 1, 2, 3, 4]
+
+
+def test_torn_tail_is_cut_on_reopen(tmp_path):
+    fill(tmp_path, 3)
+    (segment,) = [name for name in os.listdir(tmp_path) if name.endswith(".spool")]
+    path = tmp_path / segment
+    with open(path, "ab") as file:
+        file.write(b"\x40\x00\x00\x00torn")
+    torn_size = path.stat().st_size
+
+    spool = DiskSpool(str(tmp_path))
+    assert path.stat().st_size == torn_size - 8
+    assert [seq for seq, _ in replay_all(spool)] == [1, 2, 3]
+    # New records follow the good ones and stay readable.
+    assert spool.append({"n": 3}) == 4
+    spool.close()
+    assert [seq for seq, _ in replay_all(DiskSpool(str(tmp_path)))] == [1, 2, 3, 4]
+
+
+def test_ack_survives_reopen_and_replay_resumes_after_it(tmp_path):
+    fill(tmp_path, 5)
+    spool = DiskSpool(str(tmp_path))
+    assert [seq for seq, _ in spool.read(2)] == [1, 2]
+    spool.ack(2)
+    spool.close()
+
+    assert json.loads((tmp_path / ACK_FILE).read_text()) == {"seq": 2}
+    spool = DiskSpool(str(tmp_path))
+    assert spool.acked == 2
+    assert spool.pending == 3
+    assert [seq for seq, _ in replay_all(spool)] == [3, 4, 5]
+    # An ack past the last record is clamped to it.
+    spool.ack(99)
+    assert spool.acked == 5 and spool.pending == 0
+    spool.close()
+
+
+def test_fully_acked_segments_are_removed(tmp_path):
+    fill(tmp_path, 20, segment_bytes=200)
+    spool = DiskSpool(str(tmp_path), segment_bytes=200)
+    before = spool.stats()["segments"]
+    assert before > 2
+    spool.ack(spool.next_seq - 1)
+    spool.flush()  # What the writer thread does on its next wake-up
+    assert spool.stats()["segments"] == 1
+    spool.close()
+
+
+def test_ack_leaves_the_disk_to_the_writer(tmp_path, monkeypatch):
+    fill(tmp_path, 3)
+    spool = DiskSpool(str(tmp_path), sync_interval=0.0)
+    real_fsync = os.fsync
+
+    def slow_fsync(fd):
+        time.sleep(0.5)
+        real_fsync(fd)
+
+    monkeypatch.setattr(spool_module.os, "fsync", slow_fsync)
+    started = time.perf_counter()
+    spool.ack(2)
+    assert time.perf_counter() - started < 0.1
+    spool.close()
+    assert json.loads((tmp_path / ACK_FILE).read_text()) == {"seq": 2}
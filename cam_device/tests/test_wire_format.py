@@ -0,0 +1,22 @@
+import json
+
+from wire_format import decode_update, encode_json, encode_update, iso_timestamp, parse_timestamp
+
+
+def test_timestamps_are_utc_like_the_server_decoder():
+    # Same string JS gives for new Date(1700000000250).toISOString().
+    assert iso_timestamp(1700000000.25) == "2023-11-14T22:13:20.250Z"
+
+
+def test_binary_and_json_agree_on_the_timestamp():
+    message = {"action": "update", "timestamp": 1700000000.25, "trust": 0.5,
+               "posture": {"overall": "GOOD"}}
+    as_json = json.loads(encode_json(message))["timestamp"]
+    assert as_json == "2023-11-14T22:13:20.250Z"
+    assert decode_update(encode_update(message, 7))["timestamp"] == as_json
+    # Older queued messages may still carry the ISO string.
+    assert decode_update(encode_update({**message, "timestamp": as_json}, 8))["timestamp"] == as_json
+
+
+def test_parse_timestamp_accepts_z():
+    assert parse_timestamp("2023-11-14T22:13:20.250Z") == 1700000000.25
@@ -13,6 +13,8 @@ import websockets
 from queue import Queue
 import requests
 
+from netcam import NetworkCaptureThread
+
 # ------------------ Global Data and Locks ------------------
 posture_data = {
     "action": "update",
@@ -683,31 +685,21 @@ def posture_detection(stream=True, debug_view=True):
     def update_posture_data():
         global smoothed_curvature, brk
         display_scale = 1
-        url = "http://192.168.79.74:8080/photo.jpg"
+        url = os.getenv("CAMERA_URL", "http://192.168.79.74:8080/photo.jpg")
+        # Persistent session, one snapshot prefetched (or the MJPEG /video
+        # stream), duplicates skipped and JPEGs decoded straight to 640x480.
+        camera = NetworkCaptureThread(url, 640, 480)
+        camera.start()
 
         while not brk:
-            try:
-                # Fetch the image from the URL
-                response = requests.get(url, timeout=5)
-                if response.status_code != 200:
-                    print(f"[ERROR] Failed to fetch image. Status code: {response.status_code}")
-                    time.sleep(LOOP_DELAY)
-                    continue
-
-                # Convert the byte data to a NumPy array and decode the image
-                image_array = np.asarray(bytearray(response.content), dtype=np.uint8)
-                frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-                if frame is None:
-                    print("[ERROR] Failed to decode image.")
-                    time.sleep(LOOP_DELAY)
-                    continue
-            except Exception as e:
-                print(f"[ERROR] Exception while fetching image: {e}")
-                time.sleep(LOOP_DELAY)
+            captured = camera.slot.take(timeout=5)
+            if captured is None:
+                if camera.slot.closed:
+                    break
+                print("[ERROR] No new frame from camera.")
                 continue
+            frame = captured.image
 
-            # Resize and convert color space as needed
-            frame = cv2.resize(frame, (640, 480))
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
             # Process the image through your pose estimator
@@ -865,6 +857,7 @@ def posture_detection(stream=True, debug_view=True):
             duration_Analysis()
             time.sleep(LOOP_DELAY)
 
+        camera.stop()
         if debug_view:
             cv2.destroyAllWindows()
     update_posture_data()
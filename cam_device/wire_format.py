@@ -0,0 +1,173 @@
+"""Device -> server encodings for posture updates.
+
+JSON stays the default and the fallback. When the server accepts it in the
+connect-time handshake, updates are sent as a fixed 60-byte little-endian
+record instead:
+
+    offset  size  field
+    0       1     version (= 1)
+    1       1     flags (reserved, 0)
+    2       2     status bits: 2 bits per segment in SEGMENTS order, then
+                  3 bits of overall status at bit 12
+    4       4     sequence number (per connection)
+    8       8     timestamp, unix seconds (float64)
+    16      2     trust (float16)
+    18      42    7 x (value float32, confidence float16) in METRIC_KEYS order;
+                  a missing value is NaN
+
+The device id is not repeated per message; it is sent once in the handshake.
+Queued messages carry "timestamp" as unix seconds, which the binary record
+takes as is; encode_json turns it into a UTC ISO 8601 string with a "Z"
+suffix (see iso_timestamp), the same form the server's decoder produces.
+"""
+import json
+import math
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+
+from posture_rules import SEGMENTS
+
+ENCODING_JSON = "json"
+ENCODING_BINARY = "posture-bin-1"
+SUPPORTED_ENCODINGS = (ENCODING_BINARY, ENCODING_JSON)
+
+VERSION = 1
+METRIC_KEYS = (
+    "neckAngle",
+    "backCurvature",
+    "armAngleL",
+    "armAngleR",
+    "hipAngle",
+    "kneeAngleL",
+    "kneeAngleR",
+)
+UPDATE_STRUCT = struct.Struct("<BBHIde" + "fe" * len(METRIC_KEYS))
+
+STATUS_CODES = {"unknown": 0, "acceptable": 1, "warning": 2, "not recommended": 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+OVERALL_CODES = {"unknown": 0, "GOOD": 1, "MEH": 2, "WARNING": 3, "BAD": 4}
+OVERALL_NAMES = {code: name for name, code in OVERALL_CODES.items()}
+OVERALL_SHIFT = 2 * len(SEGMENTS)
+
+
+def _json_default(x):
+    if isinstance(x, (np.floating, np.integer)):
+        return x.item()
+    return x
+
+
+def encode_json(message):
+    timestamp = message.get("timestamp")
+    if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+        message = {**message, "timestamp": iso_timestamp(timestamp)}
+    return json.dumps(message, default=_json_default)
+
+
+def _number(value):
+    return math.nan if value is None else float(value)
+
+
+def pack_status(posture):
+    # `posture` is the classification dict, or a bare overall string before
+    # the first classification has run.
+    if not isinstance(posture, dict):
+        posture = {"overall": posture}
+    bits = 0
+    for i, segment in enumerate(SEGMENTS):
+        bits |= STATUS_CODES.get(posture.get(segment, "unknown"), 0) << (2 * i)
+    bits |= OVERALL_CODES.get(posture.get("overall", "unknown"), 0) << OVERALL_SHIFT
+    return bits
+
+
+def unpack_status(bits):
+    posture = {
+        segment: STATUS_NAMES[(bits >> (2 * i)) & 0b11]
+        for i, segment in enumerate(SEGMENTS)
+    }
+    posture["overall"] = OVERALL_NAMES.get((bits >> OVERALL_SHIFT) & 0b111, "unknown")
+    return posture
+
+
+def iso_timestamp(unix_ts=None):
+    """UTC ISO 8601 with millisecond precision and a "Z" suffix, like JS toISOString()."""
+    moment = datetime.now(timezone.utc) if unix_ts is None else datetime.fromtimestamp(unix_ts, timezone.utc)
+    return moment.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def parse_timestamp(text):
+    """Unix seconds from an ISO 8601 string; accepts the "Z" suffix on any Python."""
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    return datetime.fromisoformat(text).timestamp()
+
+
+def encode_update(message, seq):
+    timestamp = message.get("timestamp")
+    if isinstance(timestamp, str):
+        unix_ts = parse_timestamp(timestamp) if timestamp else 0.0
+    else:
+        unix_ts = float(timestamp or 0.0)
+    fields = [
+        VERSION,
+        0,
+        pack_status(message.get("posture")),
+        seq & 0xFFFFFFFF,
+        unix_ts,
+        _number(message.get("trust")),
+    ]
+    for key in METRIC_KEYS:
+        metric = message.get(key) or {}
+        fields.append(_number(metric.get("value")))
+        fields.append(_number(metric.get("confidence")))
+    return UPDATE_STRUCT.pack(*fields)
+
+
+def decode_update(data):
+    """Inverse of encode_update, producing the JSON message shape."""
+    fields = UPDATE_STRUCT.unpack(data)
+    version, _flags, status, seq, unix_ts, trust = fields[:6]
+    if version != VERSION:
+        raise ValueError(f"unsupported posture update version {version}")
+    message = {
+        "action": "update",
+        "seq": seq,
+        "timestamp": iso_timestamp(unix_ts),
+        "trust": trust,
+    }
+    values = fields[6:]
+    for i, key in enumerate(METRIC_KEYS):
+        value, conf = values[2 * i], values[2 * i + 1]
+        message[key] = {
+            "value": None if math.isnan(value) else value,
+            "confidence": None if math.isnan(conf) else conf,
+        }
+    message["posture"] = unpack_status(status)
+    return message
+
+
+# Update fields that force the JSON encoding.
+JSON_ONLY_KEYS = ("personId", "cameraId")
+
+
+def encode_message(message, encoding, seq=0):
+    """Serialise a queued message for the negotiated link encoding.
+
+    Per-person and per-camera updates carry ids the binary layout has no
+    field for (it relies on the link's deviceId), so they stay JSON.
+    """
+    if (
+        encoding == ENCODING_BINARY
+        and message.get("action") == "update"
+        and not any(key in message for key in JSON_ONLY_KEYS)
+    ):
+        return encode_update(message, seq)
+    return encode_json(message)
+
+
+def choose_encoding(offered):
+    for encoding in offered:
+        if encoding in SUPPORTED_ENCODINGS:
+            return encoding
+    return ENCODING_JSON
@@ -5,6 +5,7 @@ require("dotenv").config();
 const http = require("http");
 const app = express();
 const User = require("./user.model.js");
+const { chooseEncoding, decodePostureUpdate } = require("./wire_format.js");
 const mongoose = require("mongoose");
 
 const server = http.createServer(app);
@@ -19,6 +20,15 @@ const consumerEmails = new Map();
 const clients = new Map();
 const devices = new Map();
 
+function broadcastUpdate(data) {
+  // Forward the update message to all clients
+  for (const [email, clientWs] of clients.entries()) {
+    if (clientWs.readyState === WebSocket.OPEN) {
+      clientWs.send(JSON.stringify(data));
+    }
+  }
+}
+
 function sendToClient(email, payload) {
   const clientWs = clients.get(email);
   if (clientWs && clientWs.readyState === WebSocket.OPEN) {
@@ -73,8 +83,16 @@ wss.on("connection", (ws) => {
     })
   );
 
-  ws.on("message", async (message) => {
+  ws.on("message", async (message, isBinary) => {
     try {
+      // Compact posture updates negotiated via "hello"; clients still get JSON.
+      if (isBinary) {
+        const update = decodePostureUpdate(message);
+        update.deviceId = ws.deviceId;
+        broadcastUpdate(update);
+        return;
+      }
+
       const data = JSON.parse(message);
 
       // Check for registration as a client or device
@@ -91,13 +109,26 @@ wss.on("connection", (ws) => {
 
       console.log("Received:\n" + JSON.stringify(data, null, 2));
       switch (data.action) {
+        case "hello": {
+          ws.deviceId = data.deviceId;
+          ws.send(
+            JSON.stringify({
+              action: "hello_response",
+              encoding: chooseEncoding(data.encodings),
+              spoolAck: true,
+            })
+          );
+          break;
+        }
+
         case "update": {
-          // Forward the update message to all clients
-          for (const [email, clientWs] of clients.entries()) {
-            if (clientWs.readyState === WebSocket.OPEN) {
-              clientWs.send(JSON.stringify(data));
-            }
-          }
+          broadcastUpdate(data);
+          break;
+        }
+        // Closed per-granularity summary buckets; the device sends these
+        // instead of per-frame updates unless live mode is on.
+        case "rollup": {
+          broadcastUpdate(data);
           break;
         }
         case "register":
@@ -174,6 +205,11 @@ wss.on("connection", (ws) => {
         default:
           console.log("Unknown action");
       }
+
+      // Spooled messages are replayed until acknowledged; acks are cumulative.
+      if (data.spoolSeq !== undefined) {
+        ws.send(JSON.stringify({ action: "spool_ack", seq: data.spoolSeq }));
+      }
     } catch (error) {
       console.error("Error processing message:", error);
       ws.send(
@@ -0,0 +1,80 @@
+// Decoder for the compact binary posture updates sent by cam_device
+// (see cam_device/wire_format.py for the record layout).
+
+const ENCODING_JSON = "json";
+const ENCODING_BINARY = "posture-bin-1";
+const SUPPORTED_ENCODINGS = [ENCODING_BINARY, ENCODING_JSON];
+
+const VERSION = 1;
+const RECORD_SIZE = 60;
+const METRIC_KEYS = [
+  "neckAngle",
+  "backCurvature",
+  "armAngleL",
+  "armAngleR",
+  "hipAngle",
+  "kneeAngleL",
+  "kneeAngleR",
+];
+const SEGMENTS = ["trunk", "neck", "arm_left", "arm_right", "hip", "knee"];
+const STATUS_NAMES = ["unknown", "acceptable", "warning", "not recommended"];
+const OVERALL_NAMES = ["unknown", "GOOD", "MEH", "WARNING", "BAD"];
+
+function halfToFloat(bits) {
+  const sign = bits & 0x8000 ? -1 : 1;
+  const exponent = (bits >> 10) & 0x1f;
+  const fraction = bits & 0x03ff;
+  if (exponent === 0) return sign * Math.pow(2, -14) * (fraction / 1024);
+  if (exponent === 0x1f) return fraction ? NaN : sign * Infinity;
+  return sign * Math.pow(2, exponent - 15) * (1 + fraction / 1024);
+}
+
+function orNull(value) {
+  return Number.isNaN(value) ? null : value;
+}
+
+function chooseEncoding(offered) {
+  for (const encoding of offered || []) {
+    if (SUPPORTED_ENCODINGS.includes(encoding)) return encoding;
+  }
+  return ENCODING_JSON;
+}
+
+function decodePostureUpdate(buffer) {
+  if (buffer.length !== RECORD_SIZE) {
+    throw new Error(`Bad posture update size ${buffer.length}`);
+  }
+  const view = new DataView(buffer.buffer, buffer.byteOffset, buffer.byteLength);
+  const version = view.getUint8(0);
+  if (version !== VERSION) {
+    throw new Error(`Unsupported posture update version ${version}`);
+  }
+  const status = view.getUint16(2, true);
+  const message = {
+    action: "update",
+    seq: view.getUint32(4, true),
+    timestamp: new Date(view.getFloat64(8, true) * 1000).toISOString(),
+    trust: halfToFloat(view.getUint16(16, true)),
+  };
+  METRIC_KEYS.forEach((key, i) => {
+    const offset = 18 + i * 6;
+    message[key] = {
+      value: orNull(view.getFloat32(offset, true)),
+      confidence: orNull(halfToFloat(view.getUint16(offset + 4, true))),
+    };
+  });
+  const posture = {};
+  SEGMENTS.forEach((segment, i) => {
+    posture[segment] = STATUS_NAMES[(status >> (2 * i)) & 0b11];
+  });
+  posture.overall = OVERALL_NAMES[(status >> 12) & 0b111] || "unknown";
+  message.posture = posture;
+  return message;
+}
+
+module.exports = {
+  ENCODING_BINARY,
+  ENCODING_JSON,
+  chooseEncoding,
+  decodePostureUpdate,
+};